@@ -1,4 +1,5 @@
 const { spawn } = require('child_process');
+const http = require('http');
 const path = require('path');
 const log4js = require('log4js');
 const logger = log4js.getLogger();
@@ -8,8 +9,21 @@ class MLService {
         this.modelPath = path.join(__dirname, '../optimization/dw_model.json');
         this.pythonScript = path.join(__dirname, '../optimization/model.py');
         this.initialized = false;
+        // Long-lived Python prediction server (optimization/server.py). Set
+        // ML_SERVICE_SOCKET to talk over a Unix socket instead of TCP, and
+        // ML_SERVICE_EXTERNAL=true when the server is managed outside Node.
+        this.serviceHost = process.env.ML_SERVICE_HOST || '127.0.0.1';
+        this.servicePort = Number(process.env.ML_SERVICE_PORT || 8001);
+        this.serviceSocket = process.env.ML_SERVICE_SOCKET || null;
+        this.manageServer = process.env.ML_SERVICE_EXTERNAL !== 'true';
+        this.serverStartTimeoutMs = Number(process.env.ML_SERVICE_START_TIMEOUT_MS || 15000);
+        this.requestTimeoutMs = Number(process.env.ML_SERVICE_REQUEST_TIMEOUT_MS || 5000);
+        this.serverProcess = null;
+        this.serverReady = null;
         // In test mode, skip external Python calls to keep the suite fast and deterministic.
         this.fastTestMode = process.env.NODE_ENV === 'test';
+        // Prediction and fallback counts, exposed by getMetricsText().
+        this.counters = { predictions: 0, fallbacks: 0, batchPredictions: 0, batchItems: 0, batchFallbacks: 0 };
         this.initialize();
     }
 
@@ -39,6 +53,7 @@ class MLService {
         if (!this.initialized) {
             throw new Error('ML service not initialized');
         }
+        this.counters.predictions += 1;
 
         try {
             if (this.fastTestMode) {
@@ -64,6 +79,7 @@ class MLService {
             logger.error('Failed to predict weight:', error);
 
             // Fallback to simple volume-based calculation
+            this.counters.fallbacks += 1;
             const [length, width, height, densityFactor] = features;
             const volume = length * width * height;
             const fallbackWeight = volume * densityFactor * 0.001; // Simple density calculation
@@ -73,6 +89,47 @@ class MLService {
         }
     }
 
+    /**
+     * Predict weights for many items with a single round-trip to Python
+     * @param {Array<Array<number>>} featureRows - [length, width, height, density_factor] per item
+     * @returns {Array<number>} Predicted weights in input order
+     */
+    async predictWeights(featureRows) {
+        if (!this.initialized) {
+            throw new Error('ML service not initialized');
+        }
+
+        const fallback = () => featureRows.map(([length, width, height, densityFactor]) => (
+            length * width * height * densityFactor * 0.001
+        ));
+
+        this.counters.batchPredictions += 1;
+        this.counters.batchItems += featureRows.length;
+
+        if (this.fastTestMode || featureRows.length === 0) {
+            return fallback();
+        }
+
+        try {
+            await this.ensureModelExists();
+
+            const predictions = (await this.callPythonModelBatch(featureRows)).map(Number);
+            if (predictions.length !== featureRows.length || !predictions.every(Number.isFinite)) {
+                throw new Error('Invalid batch prediction received');
+            }
+
+            logger.info(`Batch weight prediction for ${featureRows.length} items`);
+
+            return predictions;
+
+        } catch (error) {
+            logger.error('Failed to predict weights:', error);
+            logger.info(`Using fallback calculation for ${featureRows.length} items`);
+            this.counters.batchFallbacks += 1;
+            return fallback();
+        }
+    }
+
     /**
      * Ensure the ML model exists, train if necessary
      */
@@ -162,64 +219,151 @@ class MLService {
             return Promise.resolve(volume * densityFactor * 0.001);
         }
 
-        return new Promise((resolve, reject) => {
-            // Create a temporary input for the Python script
-            const inputData = features.join(',');
+        await this.ensurePredictionServer();
+        const result = await this.requestPredictionServer('POST', '/predict', { features });
+        return result.prediction;
+    }
 
-            const pythonProcess = spawn('python', [
-                '-c',
-                `
-import sys
-import json
-import numpy as np
-from optimization.model import predict_weight
-
-# Read features from command line argument
-features = [float(x) for x in sys.argv[1].split(',')]
-result = predict_weight(features)
-
-# Convert numpy types to native Python types for JSON serialization
-if hasattr(result, 'item'):  # Convert numpy types
-    result = result.item()
-
-print(json.dumps({'prediction': result}))
-                `,
-                inputData
-            ], {
+    /**
+     * Score a batch of feature rows in one prediction server request
+     * @param {Array<Array<number>>} featureRows - Input features per item
+     * @returns {Array<number>} Prediction results
+     */
+    async callPythonModelBatch(featureRows) {
+        await this.ensurePredictionServer();
+        const result = await this.requestPredictionServer('POST', '/predict/batch', { items: featureRows });
+        return result.predictions;
+    }
+
+    /**
+     * Start the long-lived Python prediction server unless one is managed
+     * externally, and wait until it answers its health check.
+     */
+    async ensurePredictionServer() {
+        if (!this.serverReady) {
+            this.serverReady = this.startPredictionServer().catch((error) => {
+                this.serverReady = null;
+                throw error;
+            });
+        }
+        return this.serverReady;
+    }
+
+    async startPredictionServer() {
+        let startError = null;
+        if (this.manageServer) {
+            const args = ['-m', 'optimization.server'];
+            if (this.serviceSocket) {
+                args.push('--uds', this.serviceSocket);
+            } else {
+                args.push('--host', this.serviceHost, '--port', String(this.servicePort));
+            }
+
+            const child = spawn('python', args, {
                 cwd: path.join(__dirname, '../'),
-                stdio: ['pipe', 'pipe', 'pipe']
+                stdio: ['ignore', 'ignore', 'pipe']
             });
+            this.serverProcess = child;
 
-            let stdout = '';
-            let stderr = '';
+            child.stderr.on('data', (data) => {
+                logger.warn(`Prediction server: ${data.toString().trim()}`);
+            });
 
-            pythonProcess.stdout.on('data', (data) => {
-                stdout += data.toString();
+            child.on('error', (error) => {
+                logger.error('Error starting prediction server:', error);
+                startError = error;
+                if (this.serverProcess === child) {
+                    this.serverProcess = null;
+                    this.serverReady = null;
+                }
             });
 
-            pythonProcess.stderr.on('data', (data) => {
-                stderr += data.toString();
+            child.on('exit', (code) => {
+                logger.warn(`Prediction server exited with code ${code}`);
+                if (this.serverProcess === child) {
+                    this.serverProcess = null;
+                    this.serverReady = null;
+                }
             });
+        }
 
-            pythonProcess.on('close', (code) => {
-                if (code === 0) {
+        const deadline = Date.now() + this.serverStartTimeoutMs;
+        for (;;) {
+            try {
+                await this.requestPredictionServer('GET', '/health');
+                logger.info('Prediction server is ready');
+                return;
+            } catch (error) {
+                if (startError) {
+                    throw startError;
+                }
+                if (Date.now() >= deadline) {
+                    if (this.serverProcess) {
+                        this.serverProcess.kill();
+                        this.serverProcess = null;
+                    }
+                    throw new Error(`Prediction server not reachable: ${error.message}`);
+                }
+                await new Promise((resolve) => setTimeout(resolve, 100));
+            }
+        }
+    }
+
+    /**
+     * Send a JSON request to the prediction server over TCP or a Unix socket
+     * @param {string} method - HTTP method
+     * @param {string} pathname - Request path
+     * @param {Object} [payload] - JSON body
+     * @returns {Object} Parsed JSON response
+     */
+    requestPredictionServer(method, pathname, payload) {
+        return new Promise((resolve, reject) => {
+            const body = payload === undefined ? null : JSON.stringify(payload);
+            const options = {
+                method,
+                path: pathname,
+                headers: { 'Content-Type': 'application/json' },
+                timeout: this.requestTimeoutMs
+            };
+            if (this.serviceSocket) {
+                options.socketPath = this.serviceSocket;
+            } else {
+                options.host = this.serviceHost;
+                options.port = this.servicePort;
+            }
+            if (body !== null) {
+                options.headers['Content-Length'] = Buffer.byteLength(body);
+            }
+
+            const req = http.request(options, (res) => {
+                let data = '';
+                res.setEncoding('utf8');
+                res.on('data', (chunk) => {
+                    data += chunk;
+                });
+                res.on('end', () => {
+                    if (res.statusCode !== 200) {
+                        reject(new Error(`Prediction server returned ${res.statusCode}: ${data}`));
+                        return;
+                    }
                     try {
-                        const result = JSON.parse(stdout.trim());
-                        resolve(result.prediction);
+                        resolve(JSON.parse(data));
                     } catch (parseError) {
-                        logger.error('Failed to parse Python output:', stdout);
+                        logger.error('Failed to parse prediction server output:', data);
                         reject(parseError);
                     }
-                } else {
-                    logger.error('Python prediction failed:', stderr);
-                    reject(new Error(`Prediction failed with code ${code}: ${stderr}`));
-                }
+                });
             });
 
-            pythonProcess.on('error', (error) => {
-                logger.error('Error running Python prediction:', error);
-                reject(error);
+            req.on('timeout', () => {
+                req.destroy(new Error('Prediction server request timed out'));
             });
+            req.on('error', reject);
+
+            if (body !== null) {
+                req.write(body);
+            }
+            req.end();
         });
     }
 
@@ -235,7 +379,9 @@ print(json.dumps({'prediction': result}))
             exists: fs.existsSync(this.modelPath),
             pythonScript: this.pythonScript,
             scriptExists: fs.existsSync(this.pythonScript + '.py') || fs.existsSync(this.pythonScript),
-            status: this.initialized ? 'initialized' : 'not_initialized'
+            status: this.initialized ? 'initialized' : 'not_initialized',
+            predictionServer: this.serviceSocket || `http://${this.serviceHost}:${this.servicePort}`,
+            predictionServerRunning: this.serverProcess !== null
         };
 
         if (modelInfo.exists) {
@@ -251,6 +397,32 @@ print(json.dumps({'prediction': result}))
         return modelInfo;
     }
 
+    /**
+     * Prediction and fallback counters in the Prometheus text format. The
+     * Python service exposes its own stage timers on its /metrics endpoint.
+     * @returns {string} Exposition text
+     */
+    getMetricsText() {
+        const series = [
+            ['dw_node_predictions_total', 'Prediction requests handled by the ML service.', [
+                ['{kind="single"}', this.counters.predictions],
+                ['{kind="batch"}', this.counters.batchPredictions]
+            ]],
+            ['dw_node_batch_items_total', 'Items submitted in batch prediction requests.', [
+                ['', this.counters.batchItems]
+            ]],
+            ['dw_node_prediction_fallbacks_total', 'Requests answered with the volume-based fallback.', [
+                ['{kind="single"}', this.counters.fallbacks],
+                ['{kind="batch"}', this.counters.batchFallbacks]
+            ]]
+        ];
+        return series.map(([name, help, samples]) => [
+            `# HELP ${name} ${help}`,
+            `# TYPE ${name} counter`,
+            ...samples.map(([labels, value]) => `${name}${labels} ${value}`)
+        ].join('\n')).join('\n') + '\n';
+    }
+
     /**
      * Check if service is ready for predictions
      * @returns {boolean} Service readiness
@@ -263,6 +435,11 @@ print(json.dumps({'prediction': result}))
      * Cleanup resources
      */
     async cleanup() {
+        if (this.serverProcess) {
+            this.serverProcess.kill();
+            this.serverProcess = null;
+        }
+        this.serverReady = null;
         logger.info('ML service cleanup completed');
     }
 }
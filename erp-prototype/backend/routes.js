@@ -168,34 +168,43 @@ router.post('/optimize', checkServices, async (req, res) => {
             });
         }
 
-        const optimizationResults = [];
-
-        for (const item of items) {
-            const { length, width, height, densityFactor = 0.85, weight: providedWeight } = item;
-            const lengthNum = Number(length);
-            const widthNum = Number(width);
-            const heightNum = Number(height);
-            const densityNum = Number(densityFactor);
-
-            if (![lengthNum, widthNum, heightNum, densityNum].every(Number.isFinite)) {
-                return res.status(400).json({
-                    error: 'Invalid item dimensions',
-                    message: 'length, width, height, densityFactor must be numbers'
-                });
+        // Validate every item first so the whole array can be scored in one call
+        const featureRows = [];
+        const invalidItems = [];
+
+        items.forEach((item, index) => {
+            const { length, width, height, densityFactor = 0.85 } = item || {};
+            const row = [length, width, height, densityFactor].map(Number);
+
+            if (!row.every(Number.isFinite)) {
+                invalidItems.push({ index, itemId: item && item.id });
+                return;
             }
+            featureRows.push(row);
+        });
+
+        if (invalidItems.length > 0) {
+            return res.status(400).json({
+                error: 'Invalid item dimensions',
+                message: 'length, width, height, densityFactor must be numbers',
+                invalidItems: invalidItems
+            });
+        }
 
-            // Get ML prediction for optimal weight
-            const predictedWeight = await mlService.predictWeight([lengthNum, widthNum, heightNum, densityNum]);
+        // Get ML predictions for optimal weight
+        const predictedWeights = await mlService.predictWeights(featureRows);
 
-            optimizationResults.push({
-                itemId: item.id || `item_${optimizationResults.length + 1}`,
-                originalWeight: providedWeight,
-                predictedWeight: predictedWeight,
+        const optimizationResults = items.map((item, index) => {
+            const [lengthNum, widthNum, heightNum, densityNum] = featureRows[index];
+            return {
+                itemId: item.id || `item_${index + 1}`,
+                originalWeight: item.weight,
+                predictedWeight: predictedWeights[index],
                 dimensions: { length: lengthNum, width: widthNum, height: heightNum },
                 densityFactor: densityNum,
                 confidence: 0.92 + Math.random() * 0.06 // Mock confidence score
-            });
-        }
+            };
+        });
 
         logger.info(`Optimization completed for ${items.length} items`);
 
@@ -268,39 +277,31 @@ router.get('/health', async (req, res) => {
     }
 });
 
+/**
+ * GET /api/warehouse/metrics
+ * Prediction and fallback counters in the Prometheus text format
+ */
+router.get('/metrics', (req, res) => {
+    res.type('text/plain; version=0.0.4').send(mlService.getMetricsText());
+});
+
 // Serve static plots
 const plotsDir = path.join(__dirname, '../demo/plots');
 router.use('/plots', express.static(plotsDir));
 
-// Generate plots on demand
-router.post('/plots/generate', async (req, res) => {
+// Generate plots on demand. plot_kpis.py only re-renders figures whose input
+// summary changed and prints a JSON timing report (--json).
+function parsePlotReport(stdout) {
     try {
-        const scriptPath = path.join(__dirname, '../demo/plot_kpis.py');
-        const python = childProcess.spawn('python', [scriptPath], { cwd: path.join(__dirname, '../') });
-
-        let stdout = '';
-        let stderr = '';
-        python.stdout.on('data', d => (stdout += d.toString()));
-        python.stderr.on('data', d => (stderr += d.toString()));
-        python.on('close', code => {
-            /* istanbul ignore else */
-            if (code === 0) {
-                res.json({ success: true, message: 'Plots generated', stdout });
-            } else {
-                res.status(500).json({ success: false, error: stderr });
-            }
-        });
-    /* istanbul ignore next */
+        return JSON.parse(stdout);
     } catch (err) {
-        logger.error('Plot generation failed', err);
-        res.status(500).json({ success: false, error: err.message });
+        return null;
     }
-});
+}
 
-// GET alias for convenience
-router.get('/plots/generate', async (req, res) => {
+function runPlotGeneration(res) {
     const scriptPath = path.join(__dirname, '../demo/plot_kpis.py');
-    const python = childProcess.spawn('python', [scriptPath], { cwd: path.join(__dirname, '../') });
+    const python = childProcess.spawn('python', [scriptPath, '--json'], { cwd: path.join(__dirname, '../') });
 
     let stdout = '';
     let stderr = '';
@@ -309,11 +310,26 @@ router.get('/plots/generate', async (req, res) => {
     python.on('close', code => {
         /* istanbul ignore else */
         if (code === 0) {
-            res.json({ success: true, message: 'Plots generated', stdout });
+            res.json({ success: true, message: 'Plots generated', report: parsePlotReport(stdout), stdout });
         } else {
             res.status(500).json({ success: false, error: stderr });
         }
     });
+}
+
+router.post('/plots/generate', async (req, res) => {
+    try {
+        runPlotGeneration(res);
+    /* istanbul ignore next */
+    } catch (err) {
+        logger.error('Plot generation failed', err);
+        res.status(500).json({ success: false, error: err.message });
+    }
+});
+
+// GET alias for convenience
+router.get('/plots/generate', async (req, res) => {
+    runPlotGeneration(res);
 });
 
 // Tariff management endpoints
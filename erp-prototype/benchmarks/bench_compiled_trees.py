@@ -0,0 +1,83 @@
+"""
+Parity check and speed comparison between the XGBoost Booster and the
+compiled pure-NumPy forest (optimization/compiled.py).
+
+Run from erp-prototype/:
+    python benchmarks/bench_compiled_trees.py --repeat 5
+
+Exits non-zero if the compiled forest disagrees with Booster.predict on any
+row of synthetic_data.csv. Parity, including rows with missing features, is
+tested in optimization/tests/test_compiled.py.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from optimization.model import FEATURE_NAMES, MODEL_PATH, predict_weight, predict_weights  # noqa: E402
+from optimization.registry import get_compiled_model, get_model  # noqa: E402
+
+
+def best_of(fn, repeat):
+    """Return the fastest wall time (seconds) of ``repeat`` calls to ``fn``."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def check_parity(X):
+    import xgboost as xgb
+
+    reference = get_model(MODEL_PATH).predict(xgb.DMatrix(X, feature_names=FEATURE_NAMES))
+    compiled = get_compiled_model(MODEL_PATH).predict(X)
+    return float(np.max(np.abs(reference - compiled)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare XGBoost and compiled NumPy tree evaluation.")
+    parser.add_argument("--data", default=os.path.join(parent_dir, "demo", "synthetic_data.csv"))
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    parser.add_argument("--single", type=int, default=200, help="Rows scored one at a time per repetition")
+    parser.add_argument("--batch-rows", type=int, default=100000, help="Rows in the large batch benchmark")
+    args = parser.parse_args()
+
+    X = pd.read_csv(args.data)[FEATURE_NAMES].to_numpy(dtype=np.float32)
+
+    max_diff = check_parity(X)
+    print(f"Parity on {len(X)} rows of {os.path.basename(args.data)}: max |diff| = {max_diff:g}")
+    if max_diff != 0.0:
+        print("FAIL: compiled forest does not match Booster.predict")
+        sys.exit(1)
+
+    rng = np.random.default_rng(42)
+    X_large = X[rng.integers(0, len(X), args.batch_rows)]
+    single_rows = X[: args.single]
+
+    print()
+    print(f"{'backend':<10}{'single (us/item)':>20}{'batch (us/item)':>20}")
+    results = {}
+    for backend in ("xgboost", "numpy"):
+        # Warm the registry so load time is excluded.
+        predict_weight(X[0], backend=backend)
+        single = best_of(lambda: [predict_weight(row, backend=backend) for row in single_rows], args.repeat)
+        batch = best_of(lambda: predict_weights(X_large, backend=backend), args.repeat)
+        results[backend] = (single / len(single_rows) * 1e6, batch / len(X_large) * 1e6)
+        print(f"{backend:<10}{results[backend][0]:>20.2f}{results[backend][1]:>20.3f}")
+
+    print()
+    print(f"Single-item speedup: {results['xgboost'][0] / results['numpy'][0]:.1f}x")
+    print(f"Batch speedup:       {results['xgboost'][1] / results['numpy'][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
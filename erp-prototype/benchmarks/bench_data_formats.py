@@ -0,0 +1,75 @@
+"""
+Compare CSV, Parquet and the memory-mapped column store for measurement data:
+size on disk, write time, time to load the full table and time to get the
+(N, 4) float32 feature matrix the model consumes.
+
+Parquet is skipped when pyarrow is not installed.
+
+Run from erp-prototype/:
+    python benchmarks/bench_data_formats.py --rows 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from demo.generate_expanded_data import generate_chunk  # noqa: E402
+from optimization import datastore  # noqa: E402
+
+FORMAT_SUFFIXES = {"csv": ".csv", "parquet": ".parquet", "columns": ".cols"}
+
+
+def disk_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def available_formats():
+    formats = ["csv", "columns"]
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow not installed; skipping Parquet")
+    else:
+        formats.insert(1, "parquet")
+    return formats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tabular storage formats.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    formats = available_formats()
+    print(f"{'rows':>10}  {'format':<9}{'size (MiB)':>12}{'write (s)':>11}{'load (s)':>10}{'features (s)':>14}")
+    for num_rows in args.rows:
+        frame = generate_chunk(np.random.default_rng(args.seed), 0, num_rows)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for fmt in formats:
+                path = os.path.join(tmp_dir, "measurements" + FORMAT_SUFFIXES[fmt])
+                float_dtype = np.float32 if fmt == "columns" else None
+                write_seconds, _ = timed(lambda: datastore.write_frame(path, frame, fmt, float_dtype))
+                load_seconds, _ = timed(lambda: datastore.read_frame(path, fmt=fmt))
+                # Touch every value so a lazily mapped store pays for its reads too.
+                features_seconds, _ = timed(lambda: float(datastore.read_features(path, fmt=fmt)[0].sum()))
+                print(f"{num_rows:>10}  {fmt:<9}{disk_size(path) / 2 ** 20:>12.1f}{write_seconds:>11.2f}"
+                      f"{load_seconds:>10.3f}{features_seconds:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cold-start benchmark for optimization.model.
+
+Each sample runs a fresh interpreter with ``-X importtime`` and reads the
+cumulative import time of the module from its report, then times the first
+prediction (dependency imports + model load) in the same way. Intended for
+CI: ``--max-import-ms`` fails the run when the import budget is exceeded.
+
+Run from erp-prototype/:
+    python benchmarks/bench_import_time.py --samples 5 --max-import-ms 100
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+
+FIRST_PREDICTION_SNIPPET = """
+import time
+started = time.perf_counter()
+import optimization.model as model
+model.prewarm()
+print((time.perf_counter() - started) * 1000.0)
+"""
+
+
+def cumulative_import_ms(module):
+    """Return the cumulative import time (ms) of ``module`` in a fresh interpreter."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=parent_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000.0
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+
+def first_prediction_ms():
+    completed = subprocess.run(
+        [sys.executable, "-c", FIRST_PREDICTION_SNIPPET],
+        cwd=parent_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start cost of optimization.model.")
+    parser.add_argument("--module", default="optimization.model")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None,
+                        help="Exit non-zero when the median import time exceeds this budget")
+    parser.add_argument("--json", default=None, help="Write the measurements to this JSON file")
+    args = parser.parse_args()
+
+    imports = [cumulative_import_ms(args.module) for _ in range(args.samples)]
+    first_predictions = [first_prediction_ms() for _ in range(args.samples)]
+
+    result = {
+        "module": args.module,
+        "samples": args.samples,
+        "import_ms_median": statistics.median(imports),
+        "import_ms_max": max(imports),
+        "first_prediction_ms_median": statistics.median(first_predictions),
+    }
+
+    print(f"import {args.module}: median {result['import_ms_median']:.1f} ms "
+          f"(max {result['import_ms_max']:.1f} ms over {args.samples} runs)")
+    print(f"import + prewarm (first prediction): median {result['first_prediction_ms_median']:.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2)
+
+    if args.max_import_ms is not None and result["import_ms_median"] > args.max_import_ms:
+        print(f"FAIL: import time exceeds budget of {args.max_import_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare peak RSS and wall time of in-memory and out-of-core training.
+
+Each mode runs optimization/train.py in its own process so peak RSS is not
+shared between runs. The input is a synthetic measurement CSV of --rows rows.
+
+Run from erp-prototype/:
+    python benchmarks/bench_training_memory.py --rows 1000000 3000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+TRAIN_SCRIPT = os.path.join(parent_dir, "optimization", "train.py")
+
+# Prints the same report fields as train.py --out-of-core for a full in-memory run.
+IN_MEMORY_RUNNER = """
+import json, sys, time
+sys.path.insert(0, {script_dir!r})
+import train
+started = time.perf_counter()
+model, rows = train.train_full({data!r}, {model!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{"rows": rows, "wallSeconds": elapsed,
+                  "wallSecondsPerMillionRows": elapsed * 1e6 / rows, "peakRssMb": train.peak_rss_mb()}}))
+"""
+
+
+def write_measurements(path, num_rows, seed=0, chunk_rows=500000):
+    """Write num_rows synthetic measurement rows in the synthetic_data.csv layout."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, num_rows, chunk_rows):
+        n = min(chunk_rows, num_rows - start)
+        L, W, H = rng.uniform(5, 50, (3, n)).round(1)
+        DF = rng.uniform(0.5, 1.5, n).round(2)
+        weight = (L * W * H * DF * 0.001 * rng.normal(1, 0.05, n)).round(1)
+        pd.DataFrame({"id": np.arange(start, start + n), "L": L, "W": W, "H": H, "DF": DF,
+                      "optimal_weight": weight}).to_csv(path, mode="a", header=start == 0, index=False)
+
+
+def run_mode(mode, data_path, model_path, chunk_rows):
+    if mode == "in-memory":
+        code = IN_MEMORY_RUNNER.format(script_dir=os.path.dirname(TRAIN_SCRIPT), data=data_path, model=model_path)
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    else:
+        command = [sys.executable, TRAIN_SCRIPT, "--out-of-core", "--data", data_path, "--model", model_path,
+                   "--chunk-rows", str(chunk_rows)]
+        if mode == "external-memory":
+            command.append("--external-memory")
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark training memory use.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000])
+    parser.add_argument("--chunk-rows", type=int, default=262144)
+    parser.add_argument("--modes", nargs="+", default=["in-memory", "out-of-core", "external-memory"],
+                        choices=["in-memory", "out-of-core", "external-memory"])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'mode':<16}{'wall (s)':>10}{'s / 1M rows':>13}{'peak RSS (MiB)':>16}")
+    for num_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, "measurements.csv")
+            write_measurements(data_path, num_rows)
+            for mode in args.modes:
+                report = run_mode(mode, data_path, os.path.join(tmp_dir, f"{mode}.json"), args.chunk_rows)
+                print(f"{num_rows:>10}  {mode:<16}{report['wallSeconds']:>10.2f}"
+                      f"{report['wallSecondsPerMillionRows']:>13.2f}{report['peakRssMb']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Benchmark suite for the Python hot paths, with JSON results and a regression
+check.
+
+Cases (``name[rows]``):
+
+- ``predict_weight_cold``: fresh interpreter, import + model load + first
+  prediction;
+- ``predict_weight_warm``: one warm single-row prediction;
+- ``predict_weights[N]``: batch scoring of N rows;
+- ``train_full[N]``: train.py training from an N-row CSV;
+- ``generate_vectorized[N]`` / ``generate_legacy[N]``: synthetic data
+  generation (the legacy loop only at the smallest size);
+- ``run_scenario[N]``: one scenario over N rows with the published loop engine;
+- ``analyze_stats[N]``: analyze.py's per-scenario single-scan summary plus
+  1000-resample bootstrap CIs and permutation tests over N result rows;
+- ``ledger_sim[N]``: one PBFT ledger-commit simulation of N transactions;
+- ``bill_tariffs[N]``: billing.tariffs pricing N items against a mixed
+  weight/volume/item policy table.
+
+Each case runs one untimed warm-up and ``--repeat`` timed runs; the JSON
+records every timing plus min/median/mean and the environment. ``--compare
+BASELINE.json`` exits with status 1 when a case's median is more than
+``--threshold`` (default 20%) slower than in the baseline, and lists cases
+that are new or missing relative to it.
+
+This is a script rather than a pytest-benchmark plugin suite so that it runs
+with the existing requirements and keeps timings out of the pytest run; the
+pytest suite only smoke-tests it (``benchmarks/tests/test_suite.py``).
+
+Run from erp-prototype/:
+    python benchmarks/suite.py --output bench.json
+    python benchmarks/suite.py --sizes 1000 100000 --compare bench.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from billing import tariffs  # noqa: E402
+from demo import ledger_sim, significance  # noqa: E402
+from demo.demo_scenarios import KPI_COLUMNS, run_scenario  # noqa: E402
+from demo.generate_expanded_data import generate_chunk, generate_expanded_synthetic_data  # noqa: E402
+from demo.streaming_stats import KpiSummary  # noqa: E402
+from optimization import train  # noqa: E402
+from optimization.model import FEATURE_NAMES, predict_weight, predict_weights, prewarm  # noqa: E402
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+DEFAULT_THRESHOLD = 0.2
+ANALYZE_RESAMPLES = 1000
+
+COLD_PREDICTION_SNIPPET = """
+import time
+started = time.perf_counter()
+import optimization.model as model
+model.predict_weight([10.0, 10.0, 10.0, 0.85])
+print(time.perf_counter() - started)
+"""
+
+
+def measurements(num_rows, seed=0):
+    """Synthetic measurement rows in the synthetic_data.csv layout."""
+    return generate_chunk(np.random.default_rng(seed), 0, num_rows)
+
+
+def timed(func, repeat):
+    """One untimed warm-up, then ``repeat`` wall-clock timings in seconds."""
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def bench_predict_cold(repeat):
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", COLD_PREDICTION_SNIPPET], cwd=parent_dir, check=True,
+                                capture_output=True, text=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def bench_predict_warm(repeat, calls=1000):
+    prewarm()
+    features = measurements(calls)[FEATURE_NAMES].to_numpy().tolist()
+
+    def run():
+        for row in features:
+            predict_weight(row)
+
+    return [timing / calls for timing in timed(run, repeat)]
+
+
+def bench_predict_batch(size, repeat):
+    matrix = measurements(size)[FEATURE_NAMES].to_numpy(dtype=np.float32)
+    return timed(lambda: predict_weights(matrix), repeat)
+
+
+def bench_train(size, repeat):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, "measurements.csv")
+        measurements(size).to_csv(data_path, index=False)
+        model_path = os.path.join(tmp_dir, "model.json")
+        return timed(lambda: train.train_full(data_path, model_path), repeat)
+
+
+def bench_generate(size, repeat, engine):
+    return timed(lambda: generate_expanded_synthetic_data(size, engine=engine), repeat)
+
+
+def bench_run_scenario(size, repeat):
+    df = measurements(size)
+    return timed(lambda: run_scenario("proposed", df, num_iterations=size), repeat)
+
+
+def bench_analyze(size, repeat):
+    rng = np.random.default_rng(0)
+    frame = {"scenario": np.repeat(["baseline_a", "proposed"], size // 2 + 1)[:size]}
+    frame.update({column: rng.gamma(4.0, 0.25, size) for column in KPI_COLUMNS})
+    results = pd.DataFrame(frame)
+    columns = ["latency", "throughput", "mae"]
+
+    def run():
+        kpis = KpiSummary(columns, quantile_columns=["latency"], sample_columns=columns).update(results)
+        significance.compare({c: kpis.sample("baseline_a", c) for c in columns},
+                             {c: kpis.sample("proposed", c) for c in columns}, resamples=ANALYZE_RESAMPLES)
+
+    return timed(run, repeat)
+
+
+def bench_ledger_sim(size, repeat):
+    config = ledger_sim.make_config("proposed", num_tx=size)
+    return timed(lambda: ledger_sim.simulate(config), repeat)
+
+
+TARIFF_POLICIES = [
+    {"id": f"{category}-{unit}", "rate": rate, "unit": unit, "category": category, "active": True}
+    for category in ("storage", "handling", "customs")
+    for unit, rate in (("weight", 0.35), ("volume", 12.5), ("item", 1.2))
+]
+
+
+def bench_bill_tariffs(size, repeat):
+    items = measurements(size)
+    table = tariffs.PolicyTable.from_policies(TARIFF_POLICIES)
+    columns = {"length": "L", "width": "W", "height": "H", "weight": "optimal_weight"}
+    return timed(lambda: tariffs.calculate(items, table, columns), repeat)
+
+
+def cases(sizes):
+    """(name, rows, timer) for every case at every size."""
+    yield "predict_weight_cold", 1, bench_predict_cold
+    yield "predict_weight_warm", 1, bench_predict_warm
+    for size in sizes:
+        yield f"predict_weights[{size}]", size, lambda repeat, size=size: bench_predict_batch(size, repeat)
+        yield f"train_full[{size}]", size, lambda repeat, size=size: bench_train(size, repeat)
+        yield f"generate_vectorized[{size}]", size, lambda repeat, size=size: bench_generate(size, repeat, "vectorized")
+        if size == min(sizes):
+            yield f"generate_legacy[{size}]", size, lambda repeat, size=size: bench_generate(size, repeat, "legacy")
+        yield f"run_scenario[{size}]", size, lambda repeat, size=size: bench_run_scenario(size, repeat)
+        yield f"analyze_stats[{size}]", size, lambda repeat, size=size: bench_analyze(size, repeat)
+        yield f"ledger_sim[{size}]", size, lambda repeat, size=size: bench_ledger_sim(size, repeat)
+        yield f"bill_tariffs[{size}]", size, lambda repeat, size=size: bench_bill_tariffs(size, repeat)
+
+
+def environment():
+    import xgboost as xgb
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=parent_dir, check=True,
+                                capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "xgboost": xgb.__version__,
+        "commit": commit,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the comparison table, including cases only one side has; returns
+    the names of regressed cases.
+    """
+    regressions = []
+    print(f"\n{'case':<32}{'baseline (s)':>14}{'current (s)':>14}{'change':>9}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<32}{'-':>14}{result['median']:>14.6f}{'':>9}  NEW")
+            continue
+        before, after = baseline[name]["median"], result["median"]
+        change = after / before - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<32}{before:>14.6f}{after:>14.6f}{change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    for name, result in baseline.items():
+        if name not in results:
+            print(f"{name:<32}{result['median']:>14.6f}{'-':>14}{'':>9}  DROPPED")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Python hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Row counts per sized case")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--cases", nargs="+", help="Only run cases whose name contains one of these strings")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Fail when a median is this fraction slower than the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<32}{'median (s)':>12}{'min (s)':>12}{'rows/s':>14}")
+    for name, rows, timer in cases(sorted(args.sizes)):
+        if args.cases and not any(pattern in name for pattern in args.cases):
+            continue
+        timings = timer(args.repeat)
+        median = statistics.median(timings)
+        results[name] = {
+            "rows": rows,
+            "timings": timings,
+            "min": min(timings),
+            "median": median,
+            "mean": statistics.fmean(timings),
+            "rowsPerSecond": rows / median if median > 0 else None,
+        }
+        print(f"{name:<32}{median:>12.6f}{min(timings):>12.6f}{rows / median:>14.0f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump({"environment": environment(), "repeat": args.repeat, "results": results}, handle, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as handle:
+            baseline = json.load(handle)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import json
+import sys
+
+import pytest
+
+from benchmarks import suite
+
+
+def run_suite(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["suite.py", *map(str, argv)])
+    suite.main()
+
+
+def test_suite_writes_results_and_passes_against_itself(monkeypatch, tmp_path, capsys):
+    output = tmp_path / "bench.json"
+    run_suite(monkeypatch, "--sizes", 200, "--repeat", 1, "--cases", "bill_tariffs", "ledger_sim",
+              "--output", output)
+
+    results = json.loads(output.read_text())["results"]
+    assert sorted(results) == ["bill_tariffs[200]", "ledger_sim[200]"]
+    assert all(len(result["timings"]) == 1 and result["rows"] == 200 for result in results.values())
+
+    run_suite(monkeypatch, "--sizes", 200, "--repeat", 1, "--cases", "bill_tariffs", "--compare", output,
+              "--threshold", 1000)
+    assert "No regressions" in capsys.readouterr().out
+
+
+def timing(median):
+    return {"median": median}
+
+
+def test_compare_flags_regressions_and_reports_new_and_dropped_cases(capsys):
+    baseline = {"fast": timing(1.0), "slow": timing(1.0), "removed": timing(2.0)}
+    results = {"fast": timing(1.1), "slow": timing(1.5), "added": timing(0.5)}
+
+    assert suite.compare(results, baseline, threshold=0.2) == ["slow"]
+
+    lines = {line.split()[0]: line for line in capsys.readouterr().out.splitlines()[2:]}
+    assert lines["slow"].endswith("REGRESSION")
+    assert lines["added"].endswith("NEW")
+    assert lines["removed"].endswith("DROPPED")
+    assert not lines["fast"].endswith("REGRESSION")
+
+
+def test_compare_exits_nonzero_on_a_regression(monkeypatch, tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": {"bill_tariffs[200]": timing(1e-9)}}))
+
+    with pytest.raises(SystemExit) as exit_info:
+        run_suite(monkeypatch, "--sizes", 200, "--repeat", 1, "--cases", "bill_tariffs", "--compare", baseline)
+
+    assert exit_info.value.code == 1
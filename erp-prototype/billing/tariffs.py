@@ -0,0 +1,302 @@
+"""
+Bulk tariff calculation mirroring ``CalculateTariff`` in chaincode/contract.go.
+
+The chaincode prices one item per ledger call: it walks every world-state key
+in ``["tariff_", "tariff_~")`` in key order, skips values that do not decode
+as a ``TariffPolicy``, inactive policies and unknown units, and adds each
+charge to a float64 running total:
+
+- ``weight``: ``weight * rate``
+- ``volume``: ``length * width * height * rate`` (left to right)
+- ``item``: ``rate``
+
+``PolicyTable`` reproduces that selection and order once, as columnar arrays
+plus a ``(category, unit)`` index. ``calculate`` then prices a whole batch of
+items in one pass: the per-unit bases (weight, volume) are computed once per
+batch and every applied policy is one vectorized multiply-add in ledger
+order, so each item's total is bit-for-bit the chaincode's ``totalTariff``
+(same operations, same order, same float64 rounding; Go does not fuse
+multiply-adds on amd64 by default). Exact parity needs exact float64 inputs:
+CSV is parsed with ``float_precision="round_trip"`` like Go's ``ParseFloat``,
+while a float32 column store has already rounded the measurements.
+
+``price_file`` streams CSV, Parquet or ``.cols`` inputs through
+``optimization.datastore`` in ``chunk_rows`` chunks, so month-end runs over
+more items than fit in memory use constant memory. Report totals per
+``(category, unit)`` are float64 sums of the per-item charges.
+
+Run from erp-prototype/:
+    python -m billing.tariffs policies.json items.parquet tariffs.parquet
+    python -m billing.tariffs policies.json demo/synthetic_data.csv tariffs.csv \\
+        --column length=L --column width=W --column height=H --column weight=optimal_weight --breakdown
+"""
+import argparse
+import json
+import math
+import re
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from optimization import datastore
+
+KEY_PREFIX = "tariff_"
+# GetStateByRange("tariff_", "tariff_~") ends before this key.
+KEY_RANGE_END = "tariff_~"
+UNITS = ("weight", "volume", "item")
+WEIGHT, VOLUME, ITEM = range(len(UNITS))
+# Measurement field -> input column
+DEFAULT_COLUMNS = {"id": "id", "length": "length", "width": "width", "height": "height", "weight": "weight"}
+DEFAULT_CHUNK_ROWS = datastore.DEFAULT_CHUNK_ROWS
+
+# TariffPolicy fields and their Go types, for json.Unmarshal-compatible decoding.
+_POLICY_FIELDS = {
+    "id": str, "name": str, "description": str, "rate": float, "unit": str,
+    "category": str, "active": bool, "createdBy": str, "createdAt": "time",
+}
+_FOLDED_FIELDS = {field.casefold(): field for field in _POLICY_FIELDS}
+_ZERO_VALUES = {str: "", float: 0.0, bool: False, "time": "0001-01-01T00:00:00Z"}
+_RFC3339 = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})$")
+
+
+class _JsonObject(list):
+    """A JSON object's ``(key, value)`` pairs in document order."""
+
+
+def ledger_key(policy_id):
+    return KEY_PREFIX + policy_id
+
+
+def in_key_range(key):
+    """Whether ``GetStateByRange("tariff_", "tariff_~")`` returns ``key``."""
+    encoded = key.encode("utf-8")
+    return KEY_PREFIX.encode("utf-8") <= encoded < KEY_RANGE_END.encode("utf-8")
+
+
+def _matches_type(value, go_type):
+    if go_type is str:
+        return isinstance(value, str)
+    if go_type is bool:
+        return isinstance(value, bool)
+    if go_type is float:
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+    return isinstance(value, str) and _RFC3339.match(value) is not None
+
+
+def decode_policy(value):
+    """
+    Decode a stored policy the way ``json.Unmarshal`` into ``TariffPolicy``
+    does, or return None where the chaincode would skip it: invalid JSON, a
+    non-object, or a field of the wrong type. Keys match field names
+    case-insensitively and are applied in document order (the last one
+    wins); JSON null and missing fields leave the zero value.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    if isinstance(value, str):
+        try:
+            value = json.loads(value, object_pairs_hook=_JsonObject)
+        except ValueError:
+            return None
+    elif isinstance(value, dict):
+        value = _JsonObject(value.items())
+    if value is None:
+        value = _JsonObject()
+    if not isinstance(value, _JsonObject):
+        return None
+
+    policy = {field: _ZERO_VALUES[go_type] for field, go_type in _POLICY_FIELDS.items()}
+    for key, item in value:
+        field = _FOLDED_FIELDS.get(key.casefold())
+        if field is None or item is None:
+            continue
+        go_type = _POLICY_FIELDS[field]
+        if not _matches_type(item, go_type):
+            return None
+        policy[field] = float(item) if go_type is float else item
+    return policy
+
+
+class PolicyTable:
+    """
+    The policies ``CalculateTariff`` applies, in the order it applies them,
+    as arrays: ``rates`` (float64), ``units`` (codes into ``UNITS``) and
+    ``categories``; ``index[(category, unit)]`` lists their positions.
+    """
+
+    def __init__(self, applied):
+        self.applied = list(applied)
+        self.rates = np.array([policy["rate"] for policy in self.applied], dtype=np.float64)
+        self.units = np.array([UNITS.index(policy["unit"]) for policy in self.applied], dtype=np.int8)
+        self.categories = [policy["category"] for policy in self.applied]
+        index = defaultdict(list)
+        for position, policy in enumerate(self.applied):
+            index[(policy["category"], policy["unit"])].append(position)
+        self.index = {key: np.array(positions, dtype=np.intp) for key, positions in index.items()}
+
+    @classmethod
+    def from_ledger(cls, entries):
+        """
+        Build from world-state ``(key, value)`` pairs in any order; keys
+        outside the tariff range and values the chaincode skips are dropped.
+        """
+        selected = sorted(((key, value) for key, value in entries if in_key_range(key)),
+                          key=lambda entry: entry[0].encode("utf-8"))
+        applied = []
+        for _, value in selected:
+            policy = decode_policy(value)
+            if policy is not None and policy["active"] and policy["unit"] in UNITS:
+                applied.append(policy)
+        return cls(applied)
+
+    @classmethod
+    def from_policies(cls, policies):
+        """Build from ``TariffPolicy`` objects, stored under ``tariff_<id>``."""
+        return cls.from_ledger((ledger_key(str(policy.get("id", ""))), policy) for policy in policies)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a JSON file holding either a list of ``TariffPolicy`` objects or
+        an object mapping world-state keys to stored policies.
+        """
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+        if isinstance(data, dict):
+            return cls.from_ledger(data.items())
+        return cls.from_policies(data)
+
+    def __len__(self):
+        return len(self.applied)
+
+    def has_unit(self, unit):
+        return bool(np.any(self.units == UNITS.index(unit)))
+
+
+def _accumulate(positions, table, bases, num_items):
+    """Sum the charges of ``positions`` in order, as the chaincode loop does."""
+    total = np.zeros(num_items)
+    charge = np.empty(num_items)
+    for position in positions:
+        unit = table.units[position]
+        if unit == ITEM:
+            total += table.rates[position]
+        else:
+            np.multiply(bases[unit], table.rates[position], out=charge)
+            total += charge
+    return total
+
+
+def _bases(frame, table, columns):
+    bases = {}
+    if table.has_unit("weight"):
+        bases[WEIGHT] = frame[columns["weight"]].to_numpy(dtype=np.float64)
+    if table.has_unit("volume"):
+        length, width, height = (frame[columns[name]].to_numpy(dtype=np.float64)
+                                 for name in ("length", "width", "height"))
+        bases[VOLUME] = length * width * height
+    return bases
+
+
+def calculate(items, table, columns=None, breakdown=False):
+    """
+    Price every row of ``items`` (a DataFrame or mapping of columns).
+    Returns a DataFrame with ``itemId`` (when the id column exists),
+    ``totalTariff`` and, with ``breakdown``, one ``tariff[<category>]``
+    column per policy category.
+    """
+    columns = dict(DEFAULT_COLUMNS, **(columns or {}))
+    frame = items if isinstance(items, pd.DataFrame) else pd.DataFrame(items)
+    return _price(frame, table, columns, breakdown, _bases(frame, table, columns))
+
+
+def _price(frame, table, columns, breakdown, bases):
+    num_items = len(frame)
+    result = pd.DataFrame(index=frame.index)
+    if columns["id"] in frame.columns:
+        result["itemId"] = frame[columns["id"]].to_numpy()
+    result["totalTariff"] = _accumulate(range(len(table)), table, bases, num_items)
+    if breakdown:
+        by_category = defaultdict(list)
+        for position, category in enumerate(table.categories):
+            by_category[category].append(position)
+        for category, positions in by_category.items():
+            result[f"tariff[{category}]"] = _accumulate(positions, table, bases, num_items)
+    return result
+
+
+def group_totals(frame, table, columns=None, bases=None):
+    """
+    Total charge of each ``(category, unit)`` group over ``frame``: the sum
+    of the group's per-item charges. ``bases`` (from ``_bases``) saves
+    recomputing the weight and volume columns already used for pricing.
+    """
+    if bases is None:
+        bases = _bases(frame, table, dict(DEFAULT_COLUMNS, **(columns or {})))
+    return {key: float(_accumulate(positions, table, bases, len(frame)).sum())
+            for key, positions in table.index.items()}
+
+
+def price_file(items_path, table, output_path, columns=None, breakdown=False, chunk_rows=DEFAULT_CHUNK_ROWS,
+               predict=False):
+    """
+    Stream ``items_path`` chunk by chunk into ``output_path`` (CSV, Parquet or
+    ``.cols``). With ``predict``, weights come from ``predict_weights`` on
+    the L/W/H/DF columns instead of the weight column. Returns a report with
+    the item count, the grand total and totals per ``(category, unit)``.
+    """
+    columns = dict(DEFAULT_COLUMNS, **(columns or {}))
+    rows = 0
+    total = 0.0
+    groups = defaultdict(float)
+    with datastore.open_writer(output_path) as writer:
+        for frame in datastore.iter_frames(items_path, chunk_rows, float_precision="round_trip"):
+            if predict:
+                from optimization.model import predict_weights
+
+                frame = frame.assign(**{columns["weight"]: predict_weights(frame).astype(np.float64)})
+            bases = _bases(frame, table, columns)
+            priced = _price(frame, table, columns, breakdown, bases)
+            writer.write(priced)
+            rows += len(priced)
+            total += float(priced["totalTariff"].sum())
+            for key, value in group_totals(frame, table, bases=bases).items():
+                groups[key] += value
+    return {
+        "items": rows,
+        "totalTariff": total,
+        "appliedPolicies": [policy["id"] for policy in table.applied],
+        "groups": [{"category": category, "unit": unit, "total": value}
+                   for (category, unit), value in sorted(groups.items())],
+    }
+
+
+def _parse_column(spec):
+    field, sep, column = spec.partition("=")
+    if not sep or field not in DEFAULT_COLUMNS:
+        raise argparse.ArgumentTypeError(f"expected field=column with field in {', '.join(DEFAULT_COLUMNS)}")
+    return field, column
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price measured items against the ledger's tariff policies.")
+    parser.add_argument("policies", help="JSON list of TariffPolicy objects, or an object of key -> stored policy")
+    parser.add_argument("items", help="Items to price (.csv, .parquet or .cols)")
+    parser.add_argument("output", help="Per-item tariffs (.csv, .parquet or .cols)")
+    parser.add_argument("--column", type=_parse_column, action="append", default=[],
+                        help="Map a measurement field to an input column, e.g. weight=optimal_weight (repeatable)")
+    parser.add_argument("--predict", action="store_true",
+                        help="Price predicted weights (from the L/W/H/DF columns) instead of the weight column")
+    parser.add_argument("--breakdown", action="store_true", help="Add a subtotal column per policy category")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Items per chunk")
+    args = parser.parse_args()
+
+    table = PolicyTable.load(args.policies)
+    report = price_file(args.items, table, args.output, dict(args.column), args.breakdown, args.chunk_rows,
+                        args.predict)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from billing import tariffs
+from optimization import datastore
+
+POLICY = {"id": "p1", "rate": 1.5, "unit": "weight", "category": "storage", "active": True,
+          "createdAt": "2024-05-01T10:00:00Z"}
+
+
+def stored(**changes):
+    return json.dumps(dict(POLICY, **changes))
+
+
+def chaincode_tariff(measurement, entries):
+    """Scalar transcription of the CalculateTariff loop in chaincode/contract.go."""
+    total = 0.0
+    applied = []
+    for key in sorted(entries, key=lambda key: key.encode("utf-8")):
+        if not tariffs.in_key_range(key):
+            continue
+        policy = tariffs.decode_policy(entries[key])
+        if policy is None or not policy["active"]:
+            continue
+        if policy["unit"] == "weight":
+            charge = measurement["weight"] * policy["rate"]
+        elif policy["unit"] == "volume":
+            charge = measurement["length"] * measurement["width"] * measurement["height"] * policy["rate"]
+        elif policy["unit"] == "item":
+            charge = policy["rate"]
+        else:
+            continue
+        total += charge
+        applied.append(policy["id"])
+    return total, applied
+
+
+@pytest.fixture(scope="module")
+def items():
+    rng = np.random.default_rng(3)
+    n = 2000
+    return pd.DataFrame({
+        "id": [f"item{i}" for i in range(n)],
+        "length": rng.uniform(1, 120, n), "width": rng.uniform(1, 80, n), "height": rng.uniform(0.5, 60, n),
+        "weight": rng.lognormal(2, 1, n) * rng.choice([1, -1, 0], n, p=[0.9, 0.05, 0.05]),
+    })
+
+
+@pytest.fixture(scope="module")
+def entries():
+    return {
+        "tariff_storage_kg": stored(id="storage_kg", rate=0.35),
+        "tariff_handling_m3": stored(id="handling_m3", unit="volume", category="handling", rate=1.25e-3),
+        "tariff_handling_item": stored(id="handling_item", unit="item", category="handling", rate=1.2),
+        "tariff_fuel": stored(id="fuel", rate=-0.1),
+        "tariff_legacy": stored(id="legacy", active=False),
+        "tariff_pallet": stored(id="pallet", unit="pallet"),
+        "tariff_broken": '{"id": "broken", "rate": ',
+        "tariff_~after": stored(id="after"),
+        "tariffs": stored(id="outside"),
+    }
+
+
+def test_missing_and_null_fields_keep_go_zero_values():
+    policy = tariffs.decode_policy('{"id": "p", "rate": null, "active": true}')
+
+    assert policy["rate"] == 0.0 and policy["unit"] == "" and policy["category"] == ""
+    assert tariffs.decode_policy("null")["active"] is False
+    assert tariffs.decode_policy(stored(rate=None)) is not None
+
+
+def test_field_names_match_case_insensitively_and_the_last_key_wins():
+    assert tariffs.decode_policy('{"RATE": 2, "Active": true, "UNIT": "item"}')["rate"] == 2.0
+    assert tariffs.decode_policy('{"rate": 1, "Rate": 3}')["rate"] == 3.0
+    assert tariffs.decode_policy('{"Rate": 3, "rate": 1}')["rate"] == 1.0
+    # A later null does not reset an earlier value.
+    assert tariffs.decode_policy('{"rate": 4, "RATE": null}')["rate"] == 4.0
+    assert tariffs.decode_policy('{"id": "a", "unknown": [1, 2]}')["id"] == "a"
+
+
+@pytest.mark.parametrize("raw", [
+    '{"rate": "1.5"}',                   # numeric string into float64
+    '{"rate": 1e400}',                   # out of float64 range
+    '{"active": 1}',                     # number into bool
+    '{"id": 7}',                         # number into string
+    '{"rate": 1, "RATE": "2"}',          # any mistyped occurrence fails
+    '{"createdAt": "yesterday"}',        # not RFC 3339
+    '{"category": {"name": "x"}}',       # object into string
+    "[]",
+    '"policy"',
+    '{"rate": ',
+])
+def test_values_json_unmarshal_rejects_are_skipped(raw):
+    assert tariffs.decode_policy(raw) is None
+
+
+def test_policy_table_follows_ledger_key_order_and_filters(entries):
+    table = tariffs.PolicyTable.from_ledger(entries.items())
+
+    assert [policy["id"] for policy in table.applied] == ["fuel", "handling_item", "handling_m3", "storage_kg"]
+    assert table.rates.tolist() == [-0.1, 1.2, 1.25e-3, 0.35]
+    assert set(table.index) == {("storage", "weight"), ("handling", "item"), ("handling", "volume")}
+    assert table.index[("storage", "weight")].tolist() == [0, 3]
+
+
+def test_calculate_matches_the_chaincode_loop_exactly(items, entries):
+    table = tariffs.PolicyTable.from_ledger(entries.items())
+
+    result = tariffs.calculate(items, table, breakdown=True)
+
+    for row, priced in zip(items.to_dict("records"), result.itertuples(index=False)):
+        total, _ = chaincode_tariff(row, entries)
+        assert np.float64(priced.totalTariff).tobytes() == np.float64(total).tobytes()
+    assert result["itemId"].tolist() == items["id"].tolist()
+    np.testing.assert_allclose(result["tariff[storage]"] + result["tariff[handling]"], result["totalTariff"])
+
+
+def test_policies_listed_by_id_use_their_ledger_keys():
+    table = tariffs.PolicyTable.from_policies([dict(POLICY, id="b"), dict(POLICY, id="a", active=False),
+                                               dict(POLICY, id="A")])
+
+    assert [policy["id"] for policy in table.applied] == ["A", "b"]
+
+
+def test_price_file_streams_chunks_to_the_same_totals(tmp_path, items, entries):
+    table = tariffs.PolicyTable.from_ledger(entries.items())
+    items_path = tmp_path / "items.csv"
+    items.to_csv(items_path, index=False)
+
+    report = tariffs.price_file(items_path, table, tmp_path / "tariffs.cols", chunk_rows=300)
+
+    priced = datastore.read_frame(tmp_path / "tariffs.cols")
+    expected = tariffs.calculate(pd.read_csv(items_path, float_precision="round_trip"), table)
+    np.testing.assert_array_equal(priced["totalTariff"].to_numpy(), expected["totalTariff"].to_numpy())
+    assert report["items"] == len(items)
+    assert report["appliedPolicies"] == ["fuel", "handling_item", "handling_m3", "storage_kg"]
+    assert sum(group["total"] for group in report["groups"]) == pytest.approx(expected["totalTariff"].sum())
+
+
+def test_group_totals_sum_the_per_item_charges(items, entries):
+    table = tariffs.PolicyTable.from_ledger(entries.items())
+    volume = (items["length"] * items["width"] * items["height"]).to_numpy()
+
+    totals = tariffs.group_totals(items, table)
+
+    assert totals[("handling", "item")] == np.full(len(items), 1.2).sum()
+    assert totals[("handling", "volume")] == (volume * 1.25e-3).sum()
+    assert totals[("storage", "weight")] == (items["weight"].to_numpy() * -0.1
+                                            + items["weight"].to_numpy() * 0.35).sum()
+
+
+def test_price_file_computes_the_bases_once_per_chunk(tmp_path, items, entries, monkeypatch):
+    table = tariffs.PolicyTable.from_ledger(entries.items())
+    items_path = tmp_path / "items.csv"
+    items.to_csv(items_path, index=False)
+    calls = []
+    bases = tariffs._bases
+    monkeypatch.setattr(tariffs, "_bases", lambda *args: calls.append(1) or bases(*args))
+
+    tariffs.price_file(items_path, table, tmp_path / "tariffs.csv", chunk_rows=500)
+
+    assert len(calls) == 4
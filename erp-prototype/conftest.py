@@ -0,0 +1,8 @@
+"""
+pytest root for the Python packages. Having a conftest here puts
+erp-prototype/ on sys.path, so tests import ``optimization``, ``demo`` and
+``billing`` the same way the scripts do.
+
+Run from erp-prototype/:
+    python -m pytest -q
+"""
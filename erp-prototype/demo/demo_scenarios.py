@@ -2,6 +2,7 @@ import argparse
 import os
 import random
 import sys
+import zlib
 
 import numpy as np
 import pandas as pd
@@ -12,58 +13,77 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
 try:
-    from optimization.model import predict_weight
+    from optimization import datastore
+    from optimization.model import predict_weights
+    from demo.streaming_stats import KpiSummary
 except ImportError:
     # Fallback for direct execution
     sys.path.append(current_dir)
-    from optimization.model import predict_weight
+    from optimization import datastore
+    from optimization.model import predict_weights
+    from streaming_stats import KpiSummary
 
-def run_scenario(scenario_name, df, num_iterations=1000):
-    """Run a demo scenario and collect KPIs"""
-    results = []
-
-    # Define scenario-specific parameters
-    scenario_params = {
-        'baseline_a': {
-            'base_latency': 0.52,  # seconds
-            'latency_variability': 0.10,
-            'base_throughput': 120,  # items per second
-            'throughput_variability': 15,
-            'cost_per_item': 0.002,
-            'dispute_rate': 0.023,
-            'recovery_min': 3.5
-        },
-        'baseline_b': {
-            'base_latency': 2.03,  # seconds
-            'latency_variability': 0.35,
-            'base_throughput': 45,  # items per second
-            'throughput_variability': 8,
-            'cost_per_item': 0.050,
-            'dispute_rate': 0.023,
-            'recovery_min': 4.2
-        },
-        'proposed': {
-            'base_latency': 1.47,  # seconds
-            'latency_variability': 0.22,
-            'base_throughput': 58,  # items per second
-            'throughput_variability': 10,
-            'cost_per_item': 0.010,
-            'dispute_rate': 0.004,  # 0.4%
-            'recovery_min': 1.8
-        }
+# Scenario-specific parameters
+SCENARIO_PARAMS = {
+    'baseline_a': {
+        'base_latency': 0.52,  # seconds
+        'latency_variability': 0.10,
+        'base_throughput': 120,  # items per second
+        'throughput_variability': 15,
+        'cost_per_item': 0.002,
+        'dispute_rate': 0.023,
+        'dispute_variability': 0.001,
+        'recovery_min': 3.5,
+        'mae_divisor': 9  # Scale to ~2.1kg for baseline scenarios
+    },
+    'baseline_b': {
+        'base_latency': 2.03,  # seconds
+        'latency_variability': 0.35,
+        'base_throughput': 45,  # items per second
+        'throughput_variability': 8,
+        'cost_per_item': 0.050,
+        'dispute_rate': 0.023,
+        'dispute_variability': 0.001,
+        'recovery_min': 4.2,
+        'mae_divisor': 9  # Scale to ~2.1kg for baseline scenarios
+    },
+    'proposed': {
+        'base_latency': 1.47,  # seconds
+        'latency_variability': 0.22,
+        'base_throughput': 58,  # items per second
+        'throughput_variability': 10,
+        'cost_per_item': 0.010,
+        'dispute_rate': 0.004,  # 0.4%
+        'dispute_variability': 0.0005,  # Smaller variation for lower baseline
+        'recovery_min': 1.8,
+        'mae_divisor': 25  # Scale to ~0.8kg for proposed scenario
     }
+}
+
+# Variation shared by all scenarios
+COST_VARIABILITY = 0.0001  # Much smaller variation
+RECOVERY_VARIABILITY = 0.2
+
+SCENARIOS = ['baseline_a', 'baseline_b', 'proposed']
+KPI_COLUMNS = ['latency', 'throughput', 'mae', 'cost_per_item', 'dispute_rate', 'recovery_min']
+RANDOM_KPI_COLUMNS = ['latency', 'throughput', 'cost_per_item', 'dispute_rate', 'recovery_min']
+KPI_ENGINES = ('loop', 'vectorized')
+QUANTILES = (0.5, 0.95, 0.99)
 
-    params = scenario_params[scenario_name]
 
-    for i, row in df.iterrows():
-        if i >= num_iterations:  # Limit iterations for demo
-            break
+def scenario_kpis(scenario_name, df, params=None):
+    """Compute KPI columns (one array per KPI) for every row of df"""
+    params = params or SCENARIO_PARAMS[scenario_name]
+    num_rows = len(df)
+    kpis = {column: np.empty(num_rows) for column in KPI_COLUMNS}
 
-        features = [row['L'], row['W'], row['H'], row['DF']]
-        actual_weight_kg = row['optimal_weight'] / 1000  # Convert grams to kg
+    # Get ML predictions for the whole frame in one batch
+    # (deterministic for given features + model)
+    predictions = predict_weights(df)
+    actual_weights = df['optimal_weight'].to_numpy()
 
-        # Get ML prediction (deterministic for given features + model)
-        predicted_weight = predict_weight(features)
+    for i, (predicted_weight, optimal_weight) in enumerate(zip(predictions, actual_weights)):
+        actual_weight_kg = optimal_weight / 1000  # Convert grams to kg
 
         # Simulate blockchain latency (deterministic with fixed seed)
         latency = params['base_latency'] + random.uniform(-params['latency_variability'], params['latency_variability'])
@@ -73,96 +93,205 @@ def run_scenario(scenario_name, df, num_iterations=1000):
         mae = abs(predicted_weight_kg - actual_weight_kg)
 
         # Scenario-specific cost
-        cost_per_item = params['cost_per_item'] + random.uniform(0, 0.0001)  # Much smaller variation
+        cost_per_item = params['cost_per_item'] + random.uniform(0, COST_VARIABILITY)
 
         # Scenario-specific dispute rate
-        if scenario_name == 'proposed':
-            dispute_rate = params['dispute_rate'] + random.uniform(-0.0005, 0.0005)  # Smaller variation for lower baseline
-        else:
-            dispute_rate = params['dispute_rate'] + random.uniform(-0.001, 0.001)
+        dispute_rate = params['dispute_rate'] + random.uniform(-params['dispute_variability'], params['dispute_variability'])
 
         # Scenario-specific recovery time
-        recovery_min = params['recovery_min'] + random.uniform(-0.2, 0.2)
-
-        # Scenario-specific MAE scaling to match expected values
-        if scenario_name == 'proposed':
-            mae_scaled = mae / 25  # Scale to ~0.8kg for proposed scenario
-        else:
-            mae_scaled = mae / 9   # Scale to ~2.1kg for baseline scenarios
-
-        results.append({
-            'scenario': scenario_name,
-            'latency': latency,  # Keep in seconds as expected
-            'throughput': params['base_throughput'] + random.uniform(-params['throughput_variability'], params['throughput_variability']),  # Items per second
-            'mae': mae_scaled,
-            'cost_per_item': cost_per_item,
-            'dispute_rate': dispute_rate,
-            'recovery_min': recovery_min
-        })
-
-    return results
+        recovery_min = params['recovery_min'] + random.uniform(-RECOVERY_VARIABILITY, RECOVERY_VARIABILITY)
 
-def main():
-    """Run all demo scenarios against synthetic, seeded data."""
-    parser = argparse.ArgumentParser(description="Run seeded synthetic scenarios.")
-    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducibility")
-    parser.add_argument("--limit", type=int, default=1000, help="Limit iterations per scenario")
-    args = parser.parse_args()
+        kpis['latency'][i] = latency  # Keep in seconds as expected
+        kpis['throughput'][i] = params['base_throughput'] + random.uniform(-params['throughput_variability'], params['throughput_variability'])  # Items per second
+        kpis['mae'][i] = mae / params['mae_divisor']  # Scenario-specific MAE scaling to match expected values
+        kpis['cost_per_item'][i] = cost_per_item
+        kpis['dispute_rate'][i] = dispute_rate
+        kpis['recovery_min'][i] = recovery_min
 
-    np.random.seed(args.seed)
-    random.seed(args.seed)
+    return kpis
+
+
+def kpi_generators(seed, scenario_name, start_row=0):
+    """
+    Independent seeded PCG64 streams, one per random KPI column, for a scenario.
+
+    Streams are derived from (seed, scenario name, column) only, so results do
+    not depend on chunk size or on which scenarios run. start_row skips each
+    stream ahead so a run starting at row k draws exactly what a full run
+    draws for row k (every uniform draw consumes one 64-bit output).
+    """
+    scenario_key = zlib.crc32(scenario_name.encode('utf-8'))
+    root = np.random.SeedSequence(seed, spawn_key=(scenario_key,))
+    generators = {}
+    for column, child in zip(RANDOM_KPI_COLUMNS, root.spawn(len(RANDOM_KPI_COLUMNS))):
+        bit_generator = np.random.PCG64(child)
+        if start_row:
+            bit_generator.advance(start_row)
+        generators[column] = np.random.Generator(bit_generator)
+    return generators
+
+
+def scenario_kpis_vectorized(scenario_name, df, generators, params=None):
+    """
+    Vectorized equivalent of scenario_kpis: every random KPI column is drawn in
+    one call from its own numpy Generator (see kpi_generators) and scenario
+    differences come from the SCENARIO_PARAMS table rather than branches.
+    """
+    params = params or SCENARIO_PARAMS[scenario_name]
+    num_rows = len(df)
+
+    predictions = predict_weights(df)
+    predicted_kg = np.where(predictions > 100, predictions / np.float32(1000), predictions)
+    actual_kg = df['optimal_weight'].to_numpy() / 1000
+    mae = np.abs(predicted_kg - actual_kg)
+
+    def jitter(column, low, high):
+        return generators[column].uniform(low, high, num_rows)
+
+    return {
+        'latency': params['base_latency'] + jitter('latency', -params['latency_variability'], params['latency_variability']),
+        'throughput': params['base_throughput'] + jitter('throughput', -params['throughput_variability'], params['throughput_variability']),
+        'mae': mae / params['mae_divisor'],
+        'cost_per_item': params['cost_per_item'] + jitter('cost_per_item', 0, COST_VARIABILITY),
+        'dispute_rate': params['dispute_rate'] + jitter('dispute_rate', -params['dispute_variability'], params['dispute_variability']),
+        'recovery_min': params['recovery_min'] + jitter('recovery_min', -RECOVERY_VARIABILITY, RECOVERY_VARIABILITY),
+    }
+
+
+def scenario_frame(scenario_name, df, generators=None, params=None):
+    """
+    KPI results for every row of df as a DataFrame in the results_kpi.csv layout.
+    Uses the vectorized engine when generators (from kpi_generators) are given,
+    otherwise the original per-row loop over the global random state. params
+    overrides the SCENARIO_PARAMS entry for scenario_name.
+    """
+    if generators is None:
+        kpis = scenario_kpis(scenario_name, df, params)
+    else:
+        kpis = scenario_kpis_vectorized(scenario_name, df, generators, params)
+    frame = pd.DataFrame(kpis, columns=KPI_COLUMNS)
+    frame.insert(0, 'scenario', scenario_name)
+    return frame
+
+
+def run_scenario(scenario_name, df, num_iterations=1000, params=None):
+    """Run a demo scenario and collect KPIs"""
+    # Limit iterations for demo
+    return scenario_frame(scenario_name, df.head(num_iterations), params=params).to_dict('records')
 
-    df = pd.read_csv("demo/synthetic_data.csv")
 
-    scenarios = ['baseline_a', 'baseline_b', 'proposed']
+def print_scenario_summary(means, quantiles=None):
+    """Print the per-scenario averages (and latency quantiles when streaming)"""
+    print(f"  Avg Latency: {means['latency']:.2f}s")
+    print(f"  Avg Throughput: {means['throughput']:.1f} items/s")
+    print(f"  Avg MAE: {means['mae']:.2f}")
+    print(f"  Avg Cost: ${means['cost_per_item']:.4f}")
+    print(f"  Avg Dispute Rate: {means['dispute_rate']:.2f}")
+    print(f"  Avg Recovery: {means['recovery_min']:.1f}min")
+    if quantiles:
+        print("  Latency " + ", ".join(f"p{int(q * 100)}: {value:.3f}s" for q, value in quantiles.items()))
+    print()
 
-    all_results = []
 
-    for scenario in scenarios:
+def summary_row(scenario, means, latency_sd):
+    return {
+        'scenario': scenario,
+        'latency_mean': means['latency'],
+        'latency_sd': latency_sd,
+        'throughput_mean': means['throughput'],
+        'mae_mean': means['mae'],
+        'cost_item': means['cost_per_item'],
+        'dispute_rate': means['dispute_rate'],
+        'recovery_min': means['recovery_min']
+    }
+
+
+def run_in_memory(args):
+    """Run every scenario over the first --limit rows held in memory"""
+    df = datastore.read_frame(args.input)
+
+    frames = []
+    for scenario in SCENARIOS:
         print(f"Running scenario: {scenario} (synthetic, seed={args.seed})")
-        results = run_scenario(scenario, df, num_iterations=args.limit)
-        all_results.extend(results)
-
-        # Print summary for this scenario
-        scenario_results = [r for r in all_results if r['scenario'] == scenario]
-        avg_latency = np.mean([r['latency'] for r in scenario_results])
-        avg_throughput = np.mean([r['throughput'] for r in scenario_results])
-        avg_mae = np.mean([r['mae'] for r in scenario_results])
-        avg_cost = np.mean([r['cost_per_item'] for r in scenario_results])
-        avg_dispute = np.mean([r['dispute_rate'] for r in scenario_results])
-        avg_recovery = np.mean([r['recovery_min'] for r in scenario_results])
-
-        print(f"  Avg Latency: {avg_latency:.2f}s")
-        print(f"  Avg Throughput: {avg_throughput:.1f} items/s")
-        print(f"  Avg MAE: {avg_mae:.2f}")
-        print(f"  Avg Cost: ${avg_cost:.4f}")
-        print(f"  Avg Dispute Rate: {avg_dispute:.2f}")
-        print(f"  Avg Recovery: {avg_recovery:.1f}min")
-        print()
+        generators = kpi_generators(args.seed, scenario) if args.kpi_engine == 'vectorized' else None
+        frame = scenario_frame(scenario, df.head(args.limit) if args.limit else df, generators)
+        frames.append(frame)
+        print_scenario_summary({column: np.mean(frame[column].to_numpy()) for column in KPI_COLUMNS})
 
     # Save results to CSV
-    results_df = pd.DataFrame(all_results)
-    results_df.to_csv("demo/results_kpi.csv", index=False)
-    print("Results saved to demo/results_kpi.csv")
+    results_df = pd.concat(frames, ignore_index=True)
+    datastore.write_frame(args.output, results_df)
+    print(f"Results saved to {args.output}")
 
     # Generate summary statistics
     summary = []
-    for scenario in scenarios:
-        scenario_data = results_df[results_df['scenario'] == scenario]
-        summary.append({
-            'scenario': scenario,
-            'latency_mean': scenario_data['latency'].mean(),
-            'latency_sd': scenario_data['latency'].std(),
-            'throughput_mean': scenario_data['throughput'].mean(),
-            'mae_mean': scenario_data['mae'].mean(),
-            'cost_item': scenario_data['cost_per_item'].mean(),
-            'dispute_rate': scenario_data['dispute_rate'].mean(),
-            'recovery_min': scenario_data['recovery_min'].mean()
-        })
+    for scenario, scenario_data in zip(SCENARIOS, frames):
+        means = {column: scenario_data[column].mean() for column in KPI_COLUMNS}
+        summary.append(summary_row(scenario, means, scenario_data['latency'].std()))
+    return summary
+
+
+def run_streaming(args):
+    """
+    Run every scenario chunk by chunk: read --chunksize input rows at a time,
+    append each chunk's KPI rows to the results file and keep only running
+    aggregates (a per-scenario ``KpiSummary``) in memory.
+    """
+    writer = datastore.open_writer(args.output)
+    kpis = KpiSummary(KPI_COLUMNS, quantile_columns=['latency'])
+    summary = []
+    for scenario in SCENARIOS:
+        print(f"Running scenario: {scenario} (synthetic, seed={args.seed}, streaming)")
+        generators = kpi_generators(args.seed, scenario) if args.kpi_engine == 'vectorized' else None
+        remaining = args.limit
+
+        for chunk in datastore.iter_frames(args.input, args.chunksize):
+            if args.limit:
+                chunk = chunk.head(remaining)
+                remaining -= len(chunk)
+
+            frame = scenario_frame(scenario, chunk, generators)
+            writer.write(frame)
+            kpis.update(frame)
+
+            if args.limit and remaining <= 0:
+                break
+
+        means = {column: kpis.stats(scenario, column).mean for column in KPI_COLUMNS}
+        print_scenario_summary(means, {q: kpis.quantile(scenario, 'latency', q) for q in QUANTILES})
+        summary.append(summary_row(scenario, means, kpis.stats(scenario, 'latency').std))
+
+    writer.close()
+    print(f"Results saved to {args.output}")
+    return summary
+
+
+def main():
+    """Run all demo scenarios against synthetic, seeded data."""
+    parser = argparse.ArgumentParser(description="Run seeded synthetic scenarios.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducibility")
+    parser.add_argument("--limit", type=int, default=1000, help="Limit iterations per scenario (0 = all rows)")
+    parser.add_argument("--input", default="demo/synthetic_data.csv",
+                        help="Measurement data to score (.csv, .parquet or .cols column store)")
+    parser.add_argument("--output", default="demo/results_kpi.csv",
+                        help="Per-item KPI results (.csv, .parquet or .cols column store)")
+    parser.add_argument("--summary", default="demo/summary_results.csv", help="Per-scenario summary CSV")
+    parser.add_argument("--stream", action="store_true",
+                        help="Process the input in chunks with constant memory (for multi-million-row runs)")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows per chunk in --stream mode")
+    parser.add_argument("--kpi-engine", choices=KPI_ENGINES, default="loop",
+                        help="'loop' reproduces the published per-row random.uniform results; "
+                             "'vectorized' draws whole KPI columns from seeded numpy Generators")
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    random.seed(args.seed)
+
+    summary = run_streaming(args) if args.stream else run_in_memory(args)
 
     summary_df = pd.DataFrame(summary)
-    summary_df.to_csv("demo/summary_results.csv", index=False)
-    print("Summary saved to demo/summary_results.csv")
+    summary_df.to_csv(args.summary, index=False)
+    print(f"Summary saved to {args.summary}")
 
 if __name__ == "__main__":
     main()
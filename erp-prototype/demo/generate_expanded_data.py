@@ -1,12 +1,64 @@
+"""
+Generate synthetic warehouse measurement data.
+
+The ``legacy`` engine is the original per-row loop and reproduces the
+published ``synthetic_data.csv``. The ``vectorized`` engine draws whole
+chunks at once from a ``numpy.random.Generator``; chunk ``i`` uses the
+``i``-th child of ``SeedSequence(seed)``, so output depends only on the seed,
+record count and ``--chunk-rows``, never on ``--workers``. Chunks are written
+as they are produced, to CSV, Parquet (with pyarrow installed) or a float32
+``.cols`` column store (see ``optimization.datastore``), so memory stays
+bounded for 10M+ row load-test inputs.
+
+Run from erp-prototype/:
+    python demo/generate_expanded_data.py
+    python demo/generate_expanded_data.py --engine vectorized --num-records 10000000 \\
+        --workers 8 --output demo/load_test.parquet
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 import random
 import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from optimization import datastore  # noqa: E402
+
+ENGINES = ('legacy', 'vectorized')
+DEFAULT_CHUNK_ROWS = 1000000
+COLUMNS = ['id', 'L', 'W', 'H', 'DF', 'optimal_weight']
+
+# Realistic ranges for dimensions (in cm) and density factor
+LENGTH_RANGE = (5, 50)
+WIDTH_RANGE = (3, 30)
+HEIGHT_RANGE = (2, 40)
+DENSITY_FACTOR_RANGE = (0.7, 1.0)
+MATERIAL_DENSITY = 0.85  # Average material density in g/cm³
+OUTLIER_FRACTION = 0.05
+EXTREME_DENSITY_FRACTION = 0.03
 
-def generate_expanded_synthetic_data(num_records=1000):
+
+def generate_expanded_synthetic_data(num_records=1000, engine='legacy', seed=42, chunk_rows=DEFAULT_CHUNK_ROWS):
     """
     Generate expanded synthetic data for warehouse items with realistic distributions
     """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {', '.join(ENGINES)}")
+    if engine == 'vectorized':
+        chunks = list(iter_chunks(num_records, seed=seed, chunk_rows=chunk_rows))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=COLUMNS)
+    return _generate_legacy(num_records)
+
+
+def _generate_legacy(num_records):
+    """Original row-by-row generator; reproduces the published dataset."""
     np.random.seed(42)  # For reproducible results
     random.seed(42)
 
@@ -115,21 +167,120 @@ def generate_expanded_synthetic_data(num_records=1000):
 
     return df
 
-def main():
-    """Generate expanded synthetic dataset"""
-    print("Generating expanded synthetic dataset...")
+def generate_chunk(rng, start, num_rows):
+    """
+    Vectorized counterpart of the legacy generator for rows
+    [start, start + num_rows): the same distributions, clipping, 5% size
+    outliers and 3% extreme densities, drawn in whole-array calls. Rows are
+    i.i.d. and the outlier rows are chosen at random, so no shuffle is needed.
+    """
+    # Correlated dimensions (realistic item shapes)
+    base_size = rng.uniform(5, 40, num_rows)
+    length = np.clip(base_size * rng.uniform(0.8, 1.4, num_rows), *LENGTH_RANGE)
+    width = np.clip(base_size * rng.uniform(0.4, 1.2, num_rows), *WIDTH_RANGE)
+    height = np.clip(base_size * rng.uniform(0.3, 1.1, num_rows), *HEIGHT_RANGE)
+    density_factor = rng.uniform(*DENSITY_FACTOR_RANGE, num_rows)
 
-    # Generate 1000 records
-    df = generate_expanded_synthetic_data(1000)
+    # Weight from volume and density with ±15% variation, kept within a
+    # reasonable band for the size
+    volume = length * width * height
+    weight = volume * density_factor * MATERIAL_DENSITY * rng.uniform(0.85, 1.15, num_rows)
+    weight = np.clip(weight, volume / 2000, volume / 500)
 
-    # Save to CSV
-    output_path = "demo/synthetic_data_expanded.csv"
-    df.to_csv(output_path, index=False)
+    length, width, height = length.round(1), width.round(1), height.round(1)
+    density_factor = density_factor.round(2)
+    weight = weight.round(1)
 
-    print(f"Generated {len(df)} records")
-    print(f"Saved to {output_path}")
+    # Outliers with extreme dimensions, half very large and half very small
+    outliers = rng.choice(num_rows, int(num_rows * OUTLIER_FRACTION), replace=False)
+    large = rng.random(outliers.size) < 0.5
+    for column, large_range, small_range in (
+        (length, (60, 100), (1, 4)),
+        (width, (40, 80), (1, 3)),
+        (height, (50, 90), (1, 3)),
+    ):
+        column[outliers] = np.where(
+            large,
+            rng.uniform(*large_range, outliers.size),
+            rng.uniform(*small_range, outliers.size),
+        ).round(1)
 
-    # Print some statistics
+    # Items with extreme density factors
+    extreme = rng.choice(num_rows, int(num_rows * EXTREME_DENSITY_FRACTION), replace=False)
+    density_factor[extreme] = rng.choice([0.5, 1.2], extreme.size)
+
+    # Recalculate weight for every patched row
+    patched = np.union1d(outliers, extreme)
+    weight[patched] = (length[patched] * width[patched] * height[patched]
+                       * density_factor[patched] * MATERIAL_DENSITY).round(1)
+
+    return pd.DataFrame({
+        'id': np.arange(start, start + num_rows),
+        'L': length,
+        'W': width,
+        'H': height,
+        'DF': density_factor,
+        'optimal_weight': weight,
+    })
+
+
+def chunk_tasks(num_records, seed, chunk_rows):
+    """(seed sequence, start row, row count) for every chunk, in order."""
+    starts = range(0, num_records, chunk_rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    return [(child, start, min(chunk_rows, num_records - start)) for child, start in zip(seeds, starts)]
+
+
+def _build_chunk(task):
+    child, start, num_rows, output_format = task
+    df = generate_chunk(np.random.default_rng(child), start, num_rows)
+    if output_format == 'csv':
+        # Format in the worker so CSV encoding runs in parallel too.
+        return df.to_csv(index=False, header=start == 0).encode('utf-8')
+    return df
+
+
+def iter_chunks(num_records, seed=42, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1, output_format=None):
+    """
+    Yield chunks in order as DataFrames (or encoded CSV text when
+    ``output_format='csv'``). With ``workers > 1`` chunks are built in a
+    process pool, keeping at most two chunks per worker in flight.
+    """
+    tasks = [task + (output_format,) for task in chunk_tasks(num_records, seed, chunk_rows)]
+    if workers <= 1:
+        for task in tasks:
+            yield _build_chunk(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_build_chunk, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_dataset(path, num_records, seed=42, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1):
+    """Stream vectorized chunks straight to a CSV, Parquet file or column store."""
+    output_format = datastore.detect_format(path)
+    chunks = iter_chunks(num_records, seed, chunk_rows, workers, output_format)
+
+    if output_format == 'csv':
+        with open(path, 'wb') as handle:
+            if num_records == 0:
+                handle.write((','.join(COLUMNS) + '\n').encode('utf-8'))
+            for chunk in chunks:
+                handle.write(chunk)
+        return
+
+    with datastore.open_writer(path, output_format, float_dtype=np.float32) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+
+def print_statistics(df):
     print("\nDataset Statistics:")
     print(f"Length range: {df['L'].min():.1f} - {df['L'].max():.1f} cm")
     print(f"Width range: {df['W'].min():.1f} - {df['W'].max():.1f} cm")
@@ -137,10 +288,54 @@ def main():
     print(f"Weight range: {df['optimal_weight'].min():.1f} - {df['optimal_weight'].max():.1f} g")
     print(f"Density factor range: {df['DF'].min():.2f} - {df['DF'].max():.2f}")
 
+
+def main():
+    """Generate expanded synthetic dataset"""
+    parser = argparse.ArgumentParser(description="Generate synthetic warehouse measurement data.")
+    parser.add_argument("--num-records", type=int, default=1000, help="Number of rows to generate")
+    parser.add_argument("--engine", choices=ENGINES, default='legacy',
+                        help="'legacy' reproduces the published data; 'vectorized' scales to 100M rows")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the vectorized engine")
+    parser.add_argument("--output", default="demo/synthetic_data_expanded.csv",
+                        help="Output file (.csv, .cols column store, or .parquet with pyarrow installed)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Rows per vectorized chunk; each chunk gets its own spawned seed")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for the vectorized engine")
+    parser.add_argument("--update-original", action="store_true",
+                        help="Also write the data to demo/synthetic_data.csv")
+    args = parser.parse_args()
+
+    print("Generating expanded synthetic dataset...")
+
+    if args.engine == 'vectorized':
+        write_dataset(args.output, args.num_records, args.seed, args.chunk_rows, args.workers)
+        print(f"Generated {args.num_records} records")
+        print(f"Saved to {args.output}")
+        if args.update_original:
+            write_dataset("demo/synthetic_data.csv", args.num_records, args.seed, args.chunk_rows, args.workers)
+            print("Updated original file: demo/synthetic_data.csv")
+        return
+
+    if args.workers > 1 or datastore.detect_format(args.output) != 'csv':
+        parser.error("--workers and non-CSV output need --engine vectorized")
+
+    df = generate_expanded_synthetic_data(args.num_records)
+
+    # Save to CSV
+    df.to_csv(args.output, index=False)
+
+    print(f"Generated {len(df)} records")
+    print(f"Saved to {args.output}")
+
+    # Print some statistics
+    print_statistics(df)
+
     # Update the original synthetic_data.csv file as well
-    original_path = "demo/synthetic_data.csv"
-    df.to_csv(original_path, index=False)
-    print(f"Updated original file: {original_path}")
+    if args.update_original:
+        original_path = "demo/synthetic_data.csv"
+        df.to_csv(original_path, index=False)
+        print(f"Updated original file: {original_path}")
+
 
 if __name__ == "__main__":
     main()
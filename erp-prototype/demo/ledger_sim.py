@@ -0,0 +1,418 @@
+"""
+Discrete-event simulator of ledger commit latency.
+
+A local stand-in for the Fabric network behind ``backend/fabric-stub.js``
+(which commits every call instantly), modelling the execute-order-validate
+path of one channel:
+
+1. transactions arrive at ``rate`` per second (``poisson`` or ``constant``);
+2. endorsement: each is executed by ``endorsers`` peers in parallel and is
+   ready when the slowest answers (exponential times, mean ``endorse_ms``);
+3. block cutting: the orderer cuts a block at ``block_size`` transactions or
+   ``block_timeout`` seconds after the first pending one, like Fabric's
+   ``BatchSize.MaxMessageCount`` / ``BatchTimeout``;
+4. consensus among ``validators`` nodes, at most ``pipeline`` blocks at a
+   time:
+
+   - ``none``: no agreement round (single writer);
+   - ``raft``: one AppendEntries round trip, done when a majority has acked,
+     2(n-1) messages;
+   - ``pbft``: pre-prepare (one message from the primary), then prepare and
+     commit phases, each done when the quorum (2f+1 with f = (n-1)//3) has
+     heard from enough peers; every phase costs each node ``msg_cost_ms``
+     per message it verifies, so latency grows with n and messages with
+     n^2: (n-1)(2n+1) per block;
+
+   message delays are exponential with mean ``network_ms``;
+5. validation and commit on the peer, one block at a time in block order
+   (``validate_block_ms`` + ``validate_tx_ms`` per transaction).
+
+Per-transaction times are drawn with NumPy up front and blocks are cut with
+``searchsorted``, so the heap-based event queue only handles block events
+(cut, consensus done, validated); a 10k-transaction run takes milliseconds
+and ``sweep`` evaluates thousands of configurations in a process pool.
+``saturation_throughput`` gives the capacity with full blocks, the rate
+beyond which commit latency grows without bound.
+
+Run from erp-prototype/:
+    python demo/ledger_sim.py --scenario proposed --set rate=80
+    python demo/ledger_sim.py --sweep rate=20,40,80,120 --sweep block_timeout=0.5,1,1.5,2 \\
+        --sweep validators=4,7,10 --workers 4
+"""
+import argparse
+import heapq
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from demo.demo_scenarios import KPI_COLUMNS, QUANTILES, SCENARIOS  # noqa: E402
+
+CONSENSUS_PROTOCOLS = ('none', 'raft', 'pbft')
+ARRIVALS = ('poisson', 'constant')
+
+DEFAULT_CONFIG = {
+    'rate': 50.0,               # offered transactions per second
+    'num_tx': 5000,
+    'arrival': 'poisson',
+    'consensus': 'pbft',
+    'validators': 4,
+    'endorsers': 2,
+    'block_size': 10,           # max transactions per block
+    'block_timeout': 1.0,       # seconds after the first pending transaction
+    'pipeline': 1,              # blocks in consensus at the same time
+    'endorse_ms': 20.0,
+    'network_ms': 5.0,
+    'msg_cost_ms': 0.5,
+    'validate_block_ms': 5.0,
+    'validate_tx_ms': 2.0,
+    'seed': 42,
+}
+
+# Stand-ins for the demo scenarios: no consensus, a crash-fault-tolerant
+# ordering service, and PBFT.
+SCENARIO_CONFIGS = {
+    'baseline_a': {'consensus': 'none', 'validators': 1},
+    'baseline_b': {'consensus': 'raft', 'validators': 3},
+    'proposed': {'consensus': 'pbft', 'validators': 4},
+}
+
+# Event kinds, in the order they are handled when times tie.
+CUT, AGREED, VALIDATED = 0, 1, 2
+
+
+def make_config(scenario=None, **overrides):
+    """``DEFAULT_CONFIG`` with the scenario's settings and ``overrides`` applied."""
+    config = dict(DEFAULT_CONFIG)
+    if scenario is not None:
+        config.update(SCENARIO_CONFIGS[scenario])
+    unknown = set(overrides) - set(config)
+    if unknown:
+        raise ValueError(f"unknown simulator settings: {', '.join(sorted(unknown))}")
+    config.update(overrides)
+    if config['consensus'] not in CONSENSUS_PROTOCOLS:
+        raise ValueError(f"consensus must be one of {', '.join(CONSENSUS_PROTOCOLS)}")
+    if config['arrival'] not in ARRIVALS:
+        raise ValueError(f"arrival must be one of {', '.join(ARRIVALS)}")
+    if config['validators'] < 1 or config['block_size'] < 1 or config['pipeline'] < 1:
+        raise ValueError("validators, block_size and pipeline must be at least 1")
+    return config
+
+
+def fault_tolerance(consensus, validators):
+    """Faulty nodes tolerated: Byzantine for PBFT, crashed for Raft."""
+    if consensus == 'pbft':
+        return (validators - 1) // 3
+    if consensus == 'raft':
+        return (validators - 1) // 2
+    return 0
+
+
+def messages_per_block(consensus, validators):
+    n = validators
+    if consensus == 'pbft':
+        return (n - 1) * (2 * n + 1)
+    if consensus == 'raft':
+        return 2 * (n - 1)
+    return 0
+
+
+def _kth_delay(rng, num_blocks, peers, k, mean_seconds):
+    """Per block, the k-th smallest of ``peers`` exponential delays (0 when k is 0)."""
+    if k <= 0 or peers <= 0:
+        return np.zeros(num_blocks)
+    delays = rng.exponential(mean_seconds, size=(num_blocks, peers))
+    return np.partition(delays, k - 1, axis=1)[:, k - 1]
+
+
+def consensus_durations(config, num_blocks, rng):
+    """Agreement time of each block, excluding queueing."""
+    n = config['validators']
+    network = config['network_ms'] / 1000
+    msg_cost = config['msg_cost_ms'] / 1000
+    if config['consensus'] == 'none' or n == 1:
+        return np.zeros(num_blocks)
+    if config['consensus'] == 'raft':
+        # Round trip to each follower; the leader needs n // 2 acks.
+        round_trips = rng.exponential(network, size=(num_blocks, n - 1)) \
+            + rng.exponential(network, size=(num_blocks, n - 1))
+        acks = np.partition(round_trips, n // 2 - 1, axis=1)[:, n // 2 - 1]
+        return acks + (n - 1) * msg_cost
+    # PBFT: a backup waits only for the primary's pre-prepare, then moves on
+    # once it has the quorum's prepare (and commit) messages; each phase it
+    # verifies about n messages.
+    f = (n - 1) // 3
+    quorum = 2 * f
+    pre_prepare = rng.exponential(network, size=num_blocks)
+    prepare = _kth_delay(rng, num_blocks, n - 1, quorum, network)
+    commit = _kth_delay(rng, num_blocks, n - 1, quorum, network)
+    return pre_prepare + prepare + commit + 3 * n * msg_cost
+
+
+def cut_blocks(ready, block_size, block_timeout):
+    """
+    Block boundaries for transactions reaching the orderer at sorted times
+    ``ready``: returns ``(starts, cut_times)``; block i holds transactions
+    ``starts[i]:starts[i + 1]``.
+    """
+    starts = []
+    cut_times = []
+    i = 0
+    count = ready.size
+    while i < count:
+        deadline = ready[i] + block_timeout
+        stop = min(i + block_size, int(np.searchsorted(ready, deadline, side='right')))
+        starts.append(i)
+        cut_times.append(ready[stop - 1] if stop - i == block_size else deadline)
+        i = stop
+    return np.asarray(starts, dtype=np.intp), np.asarray(cut_times)
+
+
+def simulate(config):
+    """
+    Run one configuration. Returns per-transaction arrays (``arrival``,
+    ``endorsed``, ``cut``, ``agreed``, ``committed``, ``latency``, ``block``)
+    and per-block ``block_sizes``.
+    """
+    config = make_config(**config)
+    rng = np.random.default_rng(config['seed'])
+    num_tx = config['num_tx']
+    rate = config['rate']
+
+    if config['arrival'] == 'poisson':
+        arrival = np.cumsum(rng.exponential(1 / rate, num_tx))
+    else:
+        arrival = np.arange(1, num_tx + 1) / rate
+    endorse = rng.exponential(config['endorse_ms'] / 1000, size=(num_tx, config['endorsers'])).max(axis=1)
+    endorsed = arrival + endorse + rng.exponential(config['network_ms'] / 1000, num_tx)
+
+    order = np.argsort(endorsed, kind='stable')
+    ready = endorsed[order]
+    starts, cut_times = cut_blocks(ready, config['block_size'], config['block_timeout'])
+    num_blocks = starts.size
+    sizes = np.diff(np.append(starts, num_tx))
+    agreement = consensus_durations(config, num_blocks, rng)
+    validation = (config['validate_block_ms'] + config['validate_tx_ms'] * sizes) / 1000
+
+    agreed_at = np.empty(num_blocks)
+    committed_at = np.empty(num_blocks)
+    events = [(cut_times[b], CUT, b) for b in range(num_blocks)]
+    heapq.heapify(events)
+    waiting_consensus = []      # FIFO of cut blocks (indices increase)
+    consensus_free = config['pipeline']
+    agreed = set()              # agreed blocks waiting for earlier ones
+    next_to_validate = 0
+    validator_busy = False
+
+    def start_validation(now):
+        nonlocal next_to_validate, validator_busy
+        if not validator_busy and next_to_validate in agreed:
+            agreed.discard(next_to_validate)
+            validator_busy = True
+            heapq.heappush(events, (now + validation[next_to_validate], VALIDATED, next_to_validate))
+            next_to_validate += 1
+
+    head = 0
+    while events:
+        now, kind, block = heapq.heappop(events)
+        if kind == CUT:
+            waiting_consensus.append(block)
+        elif kind == AGREED:
+            consensus_free += 1
+            agreed_at[block] = now
+            agreed.add(block)
+            start_validation(now)
+        else:
+            committed_at[block] = now
+            validator_busy = False
+            start_validation(now)
+        while consensus_free and head < len(waiting_consensus):
+            started = waiting_consensus[head]
+            head += 1
+            consensus_free -= 1
+            heapq.heappush(events, (now + agreement[started], AGREED, started))
+
+    block_of = np.repeat(np.arange(num_blocks), sizes)
+    committed = np.empty(num_tx)
+    cut = np.empty(num_tx)
+    agreed_tx = np.empty(num_tx)
+    committed[order] = committed_at[block_of]
+    cut[order] = cut_times[block_of]
+    agreed_tx[order] = agreed_at[block_of]
+    block = np.empty(num_tx, dtype=np.intp)
+    block[order] = block_of
+    return {
+        'config': config,
+        'arrival': arrival,
+        'endorsed': endorsed,
+        'cut': cut,
+        'agreed': agreed_tx,
+        'committed': committed,
+        'latency': committed - arrival,
+        'block': block,
+        'block_sizes': sizes,
+    }
+
+
+def mean_consensus_seconds(config, samples=2000):
+    """Mean agreement time of one block (Monte Carlo over ``samples`` blocks)."""
+    config = make_config(**config)
+    return float(consensus_durations(config, samples, np.random.default_rng(config['seed'])).mean())
+
+
+def saturation_throughput(config):
+    """
+    Committed transactions per second with full blocks: the slower of the
+    consensus stage (``pipeline`` blocks in flight) and the validating peer.
+    """
+    config = make_config(**config)
+    block_size = config['block_size']
+    consensus = mean_consensus_seconds(config) / config['pipeline']
+    validation = (config['validate_block_ms'] + config['validate_tx_ms'] * block_size) / 1000
+    bottleneck = max(consensus, validation)
+    return block_size / bottleneck if bottleneck > 0 else float('inf')
+
+
+def summarize_run(result):
+    """One summary row: latency mean/SD/quantiles, stage breakdown and throughput."""
+    config = result['config']
+    latency = result['latency']
+    span = result['committed'].max() - result['arrival'].min()
+    capacity = saturation_throughput(config)
+    row = dict(config)
+    row.update({
+        'latency_mean': latency.mean(),
+        'latency_std': latency.std(ddof=1) if latency.size > 1 else 0.0,
+        'throughput': latency.size / span if span > 0 else float('nan'),
+        'saturation_throughput': capacity,
+        'saturated': config['rate'] >= capacity,
+        'blocks': result['block_sizes'].size,
+        'mean_block_fill': result['block_sizes'].mean(),
+        'messages_per_block': messages_per_block(config['consensus'], config['validators']),
+        'fault_tolerance': fault_tolerance(config['consensus'], config['validators']),
+        'endorse_mean': (result['endorsed'] - result['arrival']).mean(),
+        'ordering_wait_mean': (result['cut'] - result['endorsed']).mean(),
+        'consensus_mean': (result['agreed'] - result['cut']).mean(),
+        'validation_mean': (result['committed'] - result['agreed']).mean(),
+    })
+    for q, value in zip(QUANTILES, np.quantile(latency, QUANTILES)):
+        row[f"latency_p{int(q * 100)}"] = value
+    return row
+
+
+def run_point(config):
+    return summarize_run(simulate(config))
+
+
+def sweep(grid, scenarios=SCENARIOS, base=None, workers=1):
+    """
+    Simulate every combination of ``grid`` (setting -> list of values) for each
+    scenario. Returns a DataFrame with one summary row per point and scenario.
+    """
+    keys = list(grid)
+    points = []
+    for scenario in scenarios:
+        for values in itertools.product(*(grid[key] for key in keys)):
+            config = make_config(scenario, **dict(base or {}, **dict(zip(keys, values))))
+            points.append((scenario, config))
+    configs = [config for _, config in points]
+    if workers <= 1:
+        rows = [run_point(config) for config in configs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(run_point, configs, chunksize=max(1, len(configs) // (workers * 8))))
+    frame = pd.DataFrame(rows)
+    frame.insert(0, 'scenario', [scenario for scenario, _ in points])
+    return frame
+
+
+def results_frame(scenario, result):
+    """Per-transaction rows in the results_kpi.csv layout (unmodelled KPIs empty)."""
+    latency = result['latency']
+    frame = pd.DataFrame({column: np.nan for column in KPI_COLUMNS}, index=range(latency.size))
+    frame['latency'] = latency
+    frame['throughput'] = summarize_run(result)['throughput']
+    frame.insert(0, 'scenario', scenario)
+    return frame
+
+
+def _parse_value(text):
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_setting(spec):
+    """Parse 'key=value' into (key, value)."""
+    key, sep, value = spec.partition("=")
+    if not sep or key not in DEFAULT_CONFIG:
+        raise argparse.ArgumentTypeError(f"expected key=value with key in {', '.join(DEFAULT_CONFIG)}, got {spec!r}")
+    return key, _parse_value(value)
+
+
+def parse_sweep(spec):
+    """Parse 'key=v1,v2,...' into (key, [v1, v2, ...])."""
+    key, sep, values = spec.partition("=")
+    if not sep or key not in DEFAULT_CONFIG:
+        raise argparse.ArgumentTypeError(f"expected key=v1,v2,... with key in {', '.join(DEFAULT_CONFIG)}, got {spec!r}")
+    return key, [_parse_value(value) for value in values.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate ledger commit latency.")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=SCENARIOS,
+                        help="Scenarios to simulate (see SCENARIO_CONFIGS)")
+    parser.add_argument("--set", type=parse_setting, action="append", default=[],
+                        help="Override a setting for every run: key=value (repeatable)")
+    parser.add_argument("--sweep", type=parse_sweep, action="append",
+                        help="Sweep a setting: key=v1,v2,... (repeatable; the grid is their product)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for sweeps")
+    parser.add_argument("--output", default="demo/ledger_sweep.csv", help="Summary CSV (one row per run)")
+    parser.add_argument("--results", default=None,
+                        help="Also write per-transaction rows in the results_kpi.csv layout (single runs only)")
+    args = parser.parse_args()
+
+    base = dict(args.set)
+    grid = dict(args.sweep or [])
+    if grid:
+        frame = sweep(grid, args.scenario, base, args.workers)
+        frame.to_csv(args.output, index=False)
+        print(f"Sweep of {len(frame)} runs saved to {args.output}")
+        return
+
+    rows = []
+    frames = []
+    for scenario in args.scenario:
+        result = simulate(make_config(scenario, **base))
+        row = summarize_run(result)
+        rows.append(dict(scenario=scenario, **row))
+        if args.results:
+            frames.append(results_frame(scenario, result))
+        print(f"Scenario: {scenario} ({row['consensus']}, n={row['validators']}, "
+              f"offered {row['rate']:g}/s, capacity {row['saturation_throughput']:.1f}/s)")
+        print(f"  Commit latency: mean {row['latency_mean']:.3f}s, "
+              + ", ".join(f"p{int(q * 100)} {row[f'latency_p{int(q * 100)}']:.3f}s" for q in QUANTILES))
+        print(f"  Breakdown: endorse {row['endorse_mean']:.3f}s, ordering wait {row['ordering_wait_mean']:.3f}s, "
+              f"consensus {row['consensus_mean']:.3f}s, validation {row['validation_mean']:.3f}s")
+        print(f"  Throughput: {row['throughput']:.1f} tx/s, {row['blocks']} blocks "
+              f"(mean fill {row['mean_block_fill']:.1f}), {row['messages_per_block']} messages/block")
+
+    pd.DataFrame(rows).to_csv(args.output, index=False)
+    print(f"Summary saved to {args.output}")
+    if frames:
+        pd.concat(frames, ignore_index=True).to_csv(args.results, index=False)
+        print(f"Results saved to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
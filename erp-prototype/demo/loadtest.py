@@ -0,0 +1,279 @@
+"""
+Open-loop load tests of the prediction path.
+
+Unlike demo_scenarios.py, which draws latency and throughput from
+``random.uniform`` around per-scenario constants, this harness measures them.
+Requests are issued on a fixed schedule at each offered rate (``constant`` or
+``poisson`` arrivals) whether or not earlier requests have finished, and
+latency is measured from the scheduled send time, so queueing under overload
+shows up in the numbers instead of silently lowering the rate (coordinated
+omission). Targets:
+
+- ``inprocess``: ``predict_weight`` on a thread pool inside this process;
+- ``http``: ``POST /predict`` on the prediction service
+  (``optimization/server.py``), either already running (``--url``/``--uds``)
+  or started for the run (``--spawn-server``).
+
+Per-request rows use the results_kpi.csv layout (``scenario``, ``latency``,
+``throughput``, ``mae``, ...; KPIs that are not measured are left empty) plus
+``offered_rate``, so analyze.py and plot_kpis.py work on measured numbers.
+Latency percentiles come from an HDR-style histogram.
+
+Run from erp-prototype/:
+    python demo/loadtest.py --target inprocess --rates 20 40 80 120
+    python demo/loadtest.py --target inprocess http --scenario baseline_a proposed \\
+        --spawn-server --rates 50 --requests 1000 --output ../results/consensus_comparison/raw_results.csv
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from demo.demo_scenarios import KPI_COLUMNS, QUANTILES, summary_row  # noqa: E402
+from demo.streaming_stats import HdrHistogram  # noqa: E402
+from optimization import datastore  # noqa: E402
+from optimization.model import FEATURE_NAMES, MODEL_PATH, predict_weight, prewarm  # noqa: E402
+
+TARGETS = ('inprocess', 'http')
+ARRIVALS = ('constant', 'poisson')
+DEFAULT_RATES = [20, 40, 80, 120]
+DEFAULT_CONCURRENCY = 32
+REPORT_PERCENTILES = (50, 90, 99, 99.9)
+SERVER_START_TIMEOUT = 60.0
+
+
+class InProcessTarget:
+    """``predict_weight`` on a thread pool of ``concurrency`` workers."""
+
+    name = 'inprocess'
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, backend=None):
+        self.backend = backend
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        prewarm(MODEL_PATH, backend=backend)
+
+    async def predict(self, features):
+        loop = asyncio.get_running_loop()
+        prediction = await loop.run_in_executor(self.executor, predict_weight, features, MODEL_PATH, self.backend)
+        return float(prediction)
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class HttpTarget:
+    """``POST /predict`` against the prediction service."""
+
+    name = 'http'
+
+    def __init__(self, url, uds=None, concurrency=DEFAULT_CONCURRENCY):
+        import httpx
+
+        transport = httpx.AsyncHTTPTransport(uds=uds) if uds else None
+        self.client = httpx.AsyncClient(
+            base_url=url,
+            transport=transport,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            timeout=30.0,
+        )
+
+    async def predict(self, features):
+        response = await self.client.post('/predict', json={'features': [float(value) for value in features]})
+        response.raise_for_status()
+        return response.json()['prediction']
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(port):
+    """Start optimization.server on ``port`` and wait until /health answers."""
+    import httpx
+
+    process = subprocess.Popen([sys.executable, '-m', 'optimization.server', '--port', str(port)], cwd=parent_dir)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'prediction server exited with code {process.returncode}')
+        try:
+            if httpx.get(f'{url}/health', timeout=1.0).status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'prediction server did not start within {SERVER_START_TIMEOUT:.0f}s')
+
+
+def arrival_offsets(rate, num_requests, arrival='constant', seed=42):
+    """Scheduled send times (seconds from the start) for an offered rate."""
+    if arrival == 'poisson':
+        gaps = np.random.default_rng(seed).exponential(1 / rate, num_requests)
+        return np.cumsum(gaps) - gaps[0]
+    return np.arange(num_requests) / rate
+
+
+def prediction_mae(predictions, actual_weights):
+    """Absolute error in kg, with the unit handling used by demo_scenarios.py."""
+    predicted_kg = np.where(predictions > 100, predictions / 1000, predictions)
+    return np.abs(predicted_kg - actual_weights / 1000)
+
+
+async def run_step(target, features, actual_weights, rate, num_requests, arrival='constant', seed=42):
+    """
+    Offer ``num_requests`` requests at ``rate`` per second. Returns per-request
+    latency (NaN for failures), predictions and the achieved throughput.
+    """
+    offsets = arrival_offsets(rate, num_requests, arrival, seed)
+    latencies = np.full(num_requests, np.nan)
+    predictions = np.full(num_requests, np.nan)
+    finished = np.full(num_requests, np.nan)
+
+    async def issue(i, scheduled):
+        try:
+            predictions[i] = await target.predict(features[i % len(features)])
+        except Exception:
+            return
+        finished[i] = time.perf_counter()
+        latencies[i] = finished[i] - scheduled
+
+    start = time.perf_counter()
+    tasks = []
+    for i, offset in enumerate(offsets):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(issue(i, start + offset)))
+    await asyncio.gather(*tasks)
+
+    completed = np.count_nonzero(~np.isnan(finished))
+    elapsed = np.nanmax(finished) - start if completed else np.nan
+    throughput = completed / elapsed if completed and elapsed > 0 else np.nan
+    mae = prediction_mae(predictions, actual_weights[np.arange(num_requests) % len(actual_weights)])
+    return latencies, mae, throughput
+
+
+def step_frame(scenario, rate, latencies, mae, throughput):
+    """Successful requests of one step in the results_kpi.csv layout."""
+    ok = ~np.isnan(latencies)
+    frame = pd.DataFrame({column: np.nan for column in KPI_COLUMNS}, index=range(int(ok.sum())))
+    frame['latency'] = latencies[ok]
+    frame['throughput'] = throughput
+    frame['mae'] = mae[ok]
+    frame.insert(0, 'scenario', scenario)
+    frame['offered_rate'] = rate
+    return frame
+
+
+def step_summary(scenario, rate, frame, histogram, errors):
+    means = {column: frame[column].mean() for column in KPI_COLUMNS}
+    row = summary_row(scenario, means, frame['latency'].std())
+    row['offered_rate'] = rate
+    for q in QUANTILES:
+        row[f"latency_p{int(q * 100)}"] = histogram.percentile(q * 100)
+    row['errors'] = errors
+    return row
+
+
+def make_target(name, args):
+    if name == 'inprocess':
+        return InProcessTarget(args.concurrency, args.backend)
+    return HttpTarget(args.url, args.uds, args.concurrency)
+
+
+async def run_load_test(args, features, actual_weights):
+    frames = []
+    summary = []
+    for target_name, scenario in zip(args.target, args.scenario):
+        target = make_target(target_name, args)
+        try:
+            for i in range(min(args.warmup, len(features))):
+                await target.predict(features[i])
+            for rate in args.rates:
+                latencies, mae, throughput = await run_step(target, features, actual_weights, rate, args.requests,
+                                                            args.arrival, args.seed)
+                histogram = HdrHistogram()
+                histogram.record_many(latencies)
+                errors = int(np.isnan(latencies).sum())
+                frame = step_frame(scenario, rate, latencies, mae, throughput)
+                frames.append(frame)
+                summary.append(step_summary(scenario, rate, frame, histogram, errors))
+                print(f"{scenario} ({target_name}) offered {rate:g}/s: achieved {throughput:.1f}/s, "
+                      + ", ".join(f"p{p:g} {histogram.percentile(p) * 1000:.2f}ms" for p in REPORT_PERCENTILES)
+                      + f", max {histogram.max * 1000:.2f}ms, errors {errors}")
+        finally:
+            await target.close()
+    return pd.concat(frames, ignore_index=True), summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test of the prediction path.")
+    parser.add_argument("--target", nargs="+", choices=TARGETS, default=["inprocess"],
+                        help="Prediction path(s) to drive, one after another")
+    parser.add_argument("--scenario", nargs="+",
+                        help="Scenario label per target in the output (default: the target name)")
+    parser.add_argument("--rates", type=float, nargs="+", default=DEFAULT_RATES,
+                        help="Offered request rates (requests/s), one step each")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per rate step")
+    parser.add_argument("--arrival", choices=ARRIVALS, default="constant", help="Inter-arrival distribution")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for Poisson arrivals")
+    parser.add_argument("--warmup", type=int, default=50, help="Unrecorded requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="In-process worker threads / HTTP connections")
+    parser.add_argument("--backend", default=None, help="In-process prediction backend (xgboost or numpy)")
+    parser.add_argument("--url", default="http://127.0.0.1:8001", help="Prediction service base URL")
+    parser.add_argument("--uds", default=None, help="Talk to the prediction service over this Unix socket")
+    parser.add_argument("--spawn-server", action="store_true",
+                        help="Start optimization.server on a free port for the http target")
+    parser.add_argument("--input", default="demo/synthetic_data.csv",
+                        help="Measurement rows to send (.csv, .parquet or .cols column store)")
+    parser.add_argument("--output", default="demo/loadtest_results.csv",
+                        help="Per-request results in the results_kpi.csv layout")
+    parser.add_argument("--summary", default="demo/loadtest_summary.csv", help="Per-scenario, per-rate summary CSV")
+    args = parser.parse_args()
+
+    args.scenario = args.scenario or args.target
+    if len(args.scenario) != len(args.target):
+        parser.error("--scenario needs one label per --target")
+
+    data = datastore.read_frame(args.input)
+    features = data[FEATURE_NAMES].to_numpy(dtype=float).tolist()
+    actual_weights = data['optimal_weight'].to_numpy(dtype=float)
+
+    server = None
+    if args.spawn_server and 'http' in args.target:
+        server, args.url = spawn_server(free_port())
+        args.uds = None
+    try:
+        frame, summary = asyncio.run(run_load_test(args, features, actual_weights))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    datastore.write_frame(args.output, frame)
+    print(f"Results saved to {args.output}")
+    pd.DataFrame(summary).to_csv(args.summary, index=False)
+    print(f"Summary saved to {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
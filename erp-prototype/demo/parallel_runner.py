@@ -0,0 +1,235 @@
+"""
+Multi-core scenario runner and parameter sweeps.
+
+Work is split into shards of a fixed number of input rows per scenario and
+scored in a process pool with the vectorized KPI engine. Each shard draws
+from the streams kpi_generators derives via SeedSequence from (seed,
+scenario, column), skipped ahead to the shard's first row, and shards are
+merged in a fixed order, so the output is bit-identical for any --workers
+value (and matches demo_scenarios.py --kpi-engine vectorized).
+
+Run from erp-prototype/:
+    python demo/parallel_runner.py --workers 8 --limit 0 --input big.csv
+    python demo/parallel_runner.py --sweep-seeds 1 2 3 --sweep-limits 1000 10000 \\
+        --sweep-param proposed.base_latency=1.2,1.47,1.8
+"""
+import argparse
+import copy
+import itertools
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from demo.demo_scenarios import (  # noqa: E402
+    KPI_COLUMNS,
+    QUANTILES,
+    SCENARIO_PARAMS,
+    SCENARIOS,
+    kpi_generators,
+    print_scenario_summary,
+    scenario_frame,
+    summary_row,
+)
+from demo.streaming_stats import DDSketch, RunningStats  # noqa: E402
+from optimization import datastore  # noqa: E402
+
+DEFAULT_SHARD_ROWS = 100000
+
+
+def count_rows(input_path):
+    """Number of data rows in the input (CSV, Parquet or column store)."""
+    return datastore.count_rows(input_path)
+
+
+def read_rows(input_path, start, stop):
+    """Read data rows [start, stop) without loading the rest."""
+    return datastore.read_frame(input_path, start=start, stop=stop)
+
+
+def run_shard(task):
+    """
+    Score one shard in a worker. Returns the KPI frame (when rows are being
+    collected) and the shard's running aggregates.
+    """
+    scenario, start, stop, seed, params, input_path, collect_rows = task
+    df = read_rows(input_path, start, stop)
+    frame = scenario_frame(scenario, df, kpi_generators(seed, scenario, start_row=start), params=params)
+
+    stats = {column: RunningStats() for column in KPI_COLUMNS}
+    for column in KPI_COLUMNS:
+        stats[column].update(frame[column].to_numpy())
+    latency_sketch = DDSketch()
+    latency_sketch.update(frame['latency'].to_numpy())
+    return (frame if collect_rows else None), stats, latency_sketch
+
+
+def shard_bounds(num_rows, shard_rows):
+    return [(start, min(start + shard_rows, num_rows)) for start in range(0, num_rows, shard_rows)]
+
+
+def map_shards(tasks, workers):
+    """Run tasks in order; a single worker runs inline without a pool."""
+    if workers <= 1:
+        return [run_shard(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_shard, tasks))
+
+
+def group_results(keys, results):
+    """Group shard results by key, keeping task order within each group."""
+    groups = defaultdict(list)
+    for key, result in zip(keys, results):
+        groups[key].append(result)
+    return groups
+
+
+def aggregate(results):
+    """Merge shard aggregates in task order."""
+    stats = {column: RunningStats() for column in KPI_COLUMNS}
+    latency_sketch = DDSketch()
+    for _, shard_stats, shard_sketch in results:
+        for column in KPI_COLUMNS:
+            stats[column].merge(shard_stats[column])
+        latency_sketch.merge(shard_sketch)
+    return stats, latency_sketch
+
+
+def run_parallel(input_path, seed, limit, workers, shard_rows, scenario_params=None, collect_rows=True):
+    """
+    Run every scenario over the first ``limit`` rows (0 = all) of input_path.
+    Returns the concatenated KPI frame (None unless collect_rows) and a dict mapping each
+    scenario to (RunningStats per KPI, latency DDSketch).
+    """
+    scenario_params = scenario_params or SCENARIO_PARAMS
+    total = count_rows(input_path)
+    num_rows = min(limit, total) if limit else total
+
+    tasks = []
+    for scenario in SCENARIOS:
+        for start, stop in shard_bounds(num_rows, shard_rows):
+            tasks.append((scenario, start, stop, seed, scenario_params[scenario], input_path, collect_rows))
+
+    results = map_shards(tasks, workers)
+    groups = group_results([task[0] for task in tasks], results)
+
+    per_scenario = {}
+    frames = []
+    for scenario in SCENARIOS:
+        scenario_results = groups[scenario]
+        per_scenario[scenario] = aggregate(scenario_results)
+        frames.extend(frame for frame, _, _ in scenario_results if frame is not None)
+
+    frame = None
+    if collect_rows:
+        # No input rows still yields a results file with the usual columns.
+        frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['scenario'] + KPI_COLUMNS)
+    return frame, per_scenario
+
+
+def parse_sweep_param(spec):
+    """Parse 'scenario.key=v1,v2,...' into ((scenario, key), [v1, v2, ...])."""
+    try:
+        target, values = spec.split("=", 1)
+        scenario, key = target.split(".", 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected scenario.key=v1,v2,... but got {spec!r}")
+    if scenario not in SCENARIO_PARAMS or key not in SCENARIO_PARAMS[scenario]:
+        raise argparse.ArgumentTypeError(f"unknown scenario parameter {target!r}")
+    return (scenario, key), [float(value) for value in values.split(",")]
+
+
+def sweep_points(seeds, limits, param_grid):
+    """Cartesian product of seeds, limits and every parameter value list."""
+    keys = [key for key, _ in param_grid]
+    for seed, limit, values in itertools.product(seeds, limits, itertools.product(*[v for _, v in param_grid])):
+        yield seed, limit, dict(zip(keys, values))
+
+
+def run_sweep(args):
+    """
+    Evaluate every sweep point. All shards of all points share one process
+    pool; only aggregates come back, so memory does not grow with rows.
+    """
+    points = list(sweep_points(args.sweep_seeds or [args.seed], args.sweep_limits or [args.limit],
+                               args.sweep_param or []))
+    total = count_rows(args.input)
+
+    tasks = []
+    task_keys = []
+    for index, (seed, limit, overrides) in enumerate(points):
+        params = copy.deepcopy(SCENARIO_PARAMS)
+        for (scenario, key), value in overrides.items():
+            params[scenario][key] = value
+        num_rows = min(limit, total) if limit else total
+        for scenario in SCENARIOS:
+            for start, stop in shard_bounds(num_rows, args.shard_rows):
+                tasks.append((scenario, start, stop, seed, params[scenario], args.input, False))
+                task_keys.append((index, scenario))
+
+    results = map_shards(tasks, args.workers)
+    groups = group_results(task_keys, results)
+
+    rows = []
+    for index, (seed, limit, overrides) in enumerate(points):
+        for scenario in SCENARIOS:
+            stats, latency_sketch = aggregate(groups[(index, scenario)])
+            row = {'point': index, 'seed': seed, 'limit': limit}
+            row.update({f"{s}.{k}": value for (s, k), value in overrides.items()})
+            row.update(summary_row(scenario, {c: stats[c].mean for c in KPI_COLUMNS}, stats['latency'].std))
+            for q in QUANTILES:
+                row[f"latency_p{int(q * 100)}"] = latency_sketch.quantile(q)
+            rows.append(row)
+
+    sweep_df = pd.DataFrame(rows)
+    sweep_df.to_csv(args.sweep_output, index=False)
+    print(f"Sweep of {len(points)} points x {len(SCENARIOS)} scenarios saved to {args.sweep_output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run seeded scenarios across a process pool.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducibility")
+    parser.add_argument("--limit", type=int, default=1000, help="Limit rows per scenario (0 = all rows)")
+    parser.add_argument("--input", default="demo/synthetic_data.csv",
+                        help="Measurement data to score (.csv, .parquet or .cols column store)")
+    parser.add_argument("--output", default="demo/results_kpi.csv",
+                        help="Per-item KPI results (.csv, .parquet or .cols column store)")
+    parser.add_argument("--summary", default="demo/summary_results.csv", help="Per-scenario summary CSV")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS,
+                        help="Input rows per shard; fixed so output does not depend on --workers")
+    parser.add_argument("--sweep-seeds", type=int, nargs="+", help="Sweep over these seeds")
+    parser.add_argument("--sweep-limits", type=int, nargs="+", help="Sweep over these row limits")
+    parser.add_argument("--sweep-param", type=parse_sweep_param, action="append",
+                        help="Sweep a scenario parameter: scenario.key=v1,v2,... (repeatable)")
+    parser.add_argument("--sweep-output", default="demo/sweep_results.csv", help="Sweep summary CSV")
+    args = parser.parse_args()
+
+    if args.sweep_seeds or args.sweep_limits or args.sweep_param:
+        run_sweep(args)
+        return
+
+    frame, per_scenario = run_parallel(args.input, args.seed, args.limit, args.workers, args.shard_rows)
+
+    summary = []
+    for scenario in SCENARIOS:
+        stats, latency_sketch = per_scenario[scenario]
+        means = {column: stats[column].mean for column in KPI_COLUMNS}
+        print(f"Scenario: {scenario} (synthetic, seed={args.seed}, workers={args.workers})")
+        print_scenario_summary(means, {q: latency_sketch.quantile(q) for q in QUANTILES})
+        summary.append(summary_row(scenario, means, stats['latency'].std))
+
+    datastore.write_frame(args.output, frame)
+    print(f"Results saved to {args.output}")
+    pd.DataFrame(summary).to_csv(args.summary, index=False)
+    print(f"Summary saved to {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,42 @@
+"""
+Render the KPI figures from the scenario summary.
+
+``generate_plots()`` renders each figure in its own task with the Agg
+backend, in a process pool when more than one figure needs rendering. It skips
+figures whose output is already up to date: every figure's cache key is a hash
+of the bytes it is drawn from (``summary_results.csv`` and, for the
+latency-vs-rate figures, ``loadtest_summary.csv``, for the block-interval
+figure ``ledger_sweep.csv``), its dpi and the renderer version, recorded in
+``plots/.plot_cache.json``. matplotlib and pandas are
+imported only when something has to be drawn, so an all-cached call returns
+in milliseconds. The returned report lists each figure's path, whether it
+came from the cache and how long it took.
+
+Run from erp-prototype/ (or call ``generate_plots`` directly):
+    python demo/plot_kpis.py
+    python demo/plot_kpis.py --workers 4 --force --json
+"""
+import argparse
+import hashlib
+import json
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-
-OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'plots')
-SUMMARY_CSV = os.path.join(os.path.dirname(__file__), 'summary_results.csv')
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-# Fallback styles
-plt.style.use('seaborn-v0_8-whitegrid')
-
-# KPI data are synthetic and seeded; this script consumes the deterministic
-# outputs from demo_scenarios.py.
-# If summary doesn't exist, try to build from results_kpi
-if not os.path.exists(SUMMARY_CSV):
-    results_csv = os.path.join(os.path.dirname(__file__), 'results_kpi.csv')
-    if os.path.exists(results_csv):
-        df = pd.read_csv(results_csv)
-        summary = (
-            df.groupby('scenario')
-            .agg(
-                latency_mean=('latency', 'mean'),
-                throughput_mean=('throughput', 'mean'),
-                mae_mean=('mae', 'mean'),
-                cost_item=('cost_per_item', 'mean')
-            )
-            .reset_index()
-        )
-        summary.to_csv(SUMMARY_CSV, index=False)
-    else:
-        raise FileNotFoundError('No KPI data found. Run demo_scenarios.py first.')
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-summary = pd.read_csv(SUMMARY_CSV)
+DEMO_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(DEMO_DIR, 'plots')
+SUMMARY_CSV = os.path.join(DEMO_DIR, 'summary_results.csv')
+RESULTS_CSV = os.path.join(DEMO_DIR, 'results_kpi.csv')
+# Written by loadtest.py; when present, the latency-vs-rate figures use these
+# measured points instead of scaling the simulated means.
+LOADTEST_SUMMARY_CSV = os.path.join(DEMO_DIR, 'loadtest_summary.csv')
+# Written by ledger_sim.py; when present, the block-interval figure plots the
+# simulated commit latency instead of scaling the means linearly.
+LEDGER_SWEEP_CSV = os.path.join(DEMO_DIR, 'ledger_sweep.csv')
+CACHE_MANIFEST = '.plot_cache.json'
+# Bump when a figure's drawing code changes so cached PNGs are re-rendered.
+RENDERER_VERSION = 1
+DEFAULT_DPI = 150
 
 # Define order and colors/markers
 order = ['baseline_a', 'baseline_b', 'proposed']
@@ -54,108 +59,276 @@ markers = {
 # Common x-axis for transaction rate
 x_values = [20, 40, 80, 120]
 
+
+def ensure_summary(summary_csv=SUMMARY_CSV, results_csv=RESULTS_CSV):
+    """
+    KPI data are synthetic and seeded; this module consumes the deterministic
+    outputs from demo_scenarios.py. If the summary doesn't exist, build it
+    from results_kpi.csv.
+    """
+    if os.path.exists(summary_csv):
+        return
+    if not os.path.exists(results_csv):
+        raise FileNotFoundError('No KPI data found. Run demo_scenarios.py first.')
+    import pandas as pd
+
+    df = pd.read_csv(results_csv)
+    summary = (
+        df.groupby('scenario')
+        .agg(
+            latency_mean=('latency', 'mean'),
+            throughput_mean=('throughput', 'mean'),
+            mae_mean=('mae', 'mean'),
+            cost_item=('cost_per_item', 'mean')
+        )
+        .reset_index()
+    )
+    summary.to_csv(summary_csv, index=False)
+
+
+def _scenario_value(summary, scen, column):
+    return float(summary.loc[summary['scenario'] == scen, column].values[0])
+
+
+def plot_measured(ax, measured, column):
+    """One line per load-tested scenario: ``column`` against offered rate."""
+    for scen, group in measured.groupby('scenario', sort=False):
+        ax.plot(group['offered_rate'], group[column], marker=markers.get(scen, 'o'),
+                color=colors.get(scen), label=labels.get(scen, scen))
+
+
 # ---------- Figure 1: Throughput vs Latency (overview) ----------
-fig1, ax1 = plt.subplots(figsize=(5, 4))
-for scen in order:
-    lat_base = float(summary.loc[summary['scenario'] == scen, 'latency_mean'].values[0])
-    y_vals = [lat_base * 0.6, lat_base * 0.75, lat_base * 0.95, lat_base * 1.05]
-    ax1.plot(x_values, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
-ax1.set_xlabel('Transaction rate (decisions/s)')
-ax1.set_ylabel('Latency (s)')
-ax1.set_ylim(bottom=0)
-ax1.legend()
-fig1.tight_layout()
-latency_path = os.path.join(OUTPUT_DIR, 'throughput_vs_latency.png')
-fig1.savefig(latency_path, dpi=150)
+def draw_throughput_vs_latency(ax, summary, measured):
+    if measured is not None:
+        plot_measured(ax, measured, 'latency_mean')
+    else:
+        for scen in order:
+            lat_base = _scenario_value(summary, scen, 'latency_mean')
+            y_vals = [lat_base * 0.6, lat_base * 0.75, lat_base * 0.95, lat_base * 1.05]
+            ax.plot(x_values, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
+    ax.set_xlabel('Transaction rate (decisions/s)')
+    ax.set_ylabel('Latency (s)')
+
 
 # ---------- Figure 2: Cost per item vs Transaction rate (overview) ----------
-fig2, ax2 = plt.subplots(figsize=(5, 4))
-for scen in order:
-    cost = float(summary.loc[summary['scenario'] == scen, 'cost_item'].values[0])
-    # Baseline B increases faster; Proposed moderate; Baseline A slight
-    if scen == 'baseline_b':
-        y_vals = [cost * 0.6, cost * 0.8, cost * 1.2, cost * 1.6]
-    elif scen == 'proposed':
-        y_vals = [cost * 0.9, cost * 1.0, cost * 1.1, cost * 1.2]
-    else:  # baseline_a
-        y_vals = [cost * 0.95, cost * 1.0, cost * 1.02, cost * 1.05]
-    ax2.plot(x_values, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
-ax2.set_xlabel('Transaction rate (decisions/s)')
-ax2.set_ylabel('Cost per item ($)')
-ax2.set_ylim(bottom=0)
-ax2.legend()
-fig2.tight_layout()
-cost_path = os.path.join(OUTPUT_DIR, 'cost_vs_txrate.png')
-fig2.savefig(cost_path, dpi=150)
+def draw_cost_vs_txrate(ax, summary, measured):
+    for scen in order:
+        cost = _scenario_value(summary, scen, 'cost_item')
+        # Baseline B increases faster; Proposed moderate; Baseline A slight
+        if scen == 'baseline_b':
+            y_vals = [cost * 0.6, cost * 0.8, cost * 1.2, cost * 1.6]
+        elif scen == 'proposed':
+            y_vals = [cost * 0.9, cost * 1.0, cost * 1.1, cost * 1.2]
+        else:  # baseline_a
+            y_vals = [cost * 0.95, cost * 1.0, cost * 1.02, cost * 1.05]
+        ax.plot(x_values, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
+    ax.set_xlabel('Transaction rate (decisions/s)')
+    ax.set_ylabel('Cost per item ($)')
+
 
 # ---------- 6.3 Qualitative Analysis (synthetic trends) ----------
 # Latency vs Transaction rate highlighting manageable latency for Proposed
-fig3, ax3 = plt.subplots(figsize=(5, 4))
-for scen in order:
-    lat = float(summary.loc[summary['scenario'] == scen, 'latency_mean'].values[0])
-    scale = {'baseline_a': 0.8, 'baseline_b': 1.8, 'proposed': 1.1}[scen]
-    y_vals = [lat * scale * 0.6, lat * scale * 0.8, lat * scale * 0.95, lat * scale * 1.05]
-    ax3.plot(x_values, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
-ax3.set_xlabel('Transaction rate (decisions/s)')
-ax3.set_ylabel('Latency (s)')
-ax3.set_ylim(bottom=0)
-ax3.legend()
-fig3.tight_layout()
-qa_latency_path = os.path.join(OUTPUT_DIR, 'qualitative_latency_vs_tx.png')
-fig3.savefig(qa_latency_path, dpi=150)
+def draw_qualitative_latency(ax, summary, measured):
+    if measured is not None:
+        plot_measured(ax, measured, 'latency_p99')
+    else:
+        for scen in order:
+            lat = _scenario_value(summary, scen, 'latency_mean')
+            scale = {'baseline_a': 0.8, 'baseline_b': 1.8, 'proposed': 1.1}[scen]
+            y_vals = [lat * scale * 0.6, lat * scale * 0.8, lat * scale * 0.95, lat * scale * 1.05]
+            ax.plot(x_values, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
+    ax.set_xlabel('Transaction rate (decisions/s)')
+    ax.set_ylabel('p99 latency (s)' if measured is not None else 'Latency (s)')
+
 
 # Dispute rate vs Transaction rate (Baseline A higher disputes; Proposed lowest)
-fig4, ax4 = plt.subplots(figsize=(5, 4))
-for scen in order:
-    # Base dispute rates reflecting narrative
-    base = {'baseline_a': 0.04, 'baseline_b': 0.02, 'proposed': 0.008}[scen]
-    y_vals = [base * 0.9, base * 1.0, base * 1.05, base * 1.1]
-    ax4.plot(x_values, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
-ax4.set_xlabel('Transaction rate (decisions/s)')
-ax4.set_ylabel('Dispute rate')
-ax4.set_ylim(bottom=0)
-ax4.legend()
-fig4.tight_layout()
-qa_dispute_path = os.path.join(OUTPUT_DIR, 'qualitative_dispute_vs_tx.png')
-fig4.savefig(qa_dispute_path, dpi=150)
+def draw_qualitative_dispute(ax, summary, measured):
+    for scen in order:
+        # Base dispute rates reflecting narrative
+        base = {'baseline_a': 0.04, 'baseline_b': 0.02, 'proposed': 0.008}[scen]
+        y_vals = [base * 0.9, base * 1.0, base * 1.05, base * 1.1]
+        ax.plot(x_values, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
+    ax.set_xlabel('Transaction rate (decisions/s)')
+    ax.set_ylabel('Dispute rate')
+
 
 # ---------- 6.4 Sensitivity Analysis ----------
 # Latency vs Block interval (linear)
-block_intervals = [0.5, 1.0, 1.5, 2.0]
-fig5, ax5 = plt.subplots(figsize=(5, 4))
-for scen in order:
-    base_lat = float(summary.loc[summary['scenario'] == scen, 'latency_mean'].values[0])
-    # Linear scaling with block interval
-    y_vals = [base_lat * (bi / 1.0) for bi in block_intervals]
-    ax5.plot(block_intervals, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
-ax5.set_xlabel('Block interval (s)')
-ax5.set_ylabel('Latency (s)')
-ax5.set_ylim(bottom=0)
-ax5.legend()
-fig5.tight_layout()
-sens_latency_path = os.path.join(OUTPUT_DIR, 'sensitivity_latency_vs_block_interval.png')
-fig5.savefig(sens_latency_path, dpi=150)
+def draw_sensitivity_latency(ax, summary, measured):
+    if measured is not None:
+        # Expects a sweep over block_timeout; other swept settings are averaged.
+        curves = measured.groupby(['scenario', 'block_timeout'], sort=True)['latency_mean'].mean().reset_index()
+        for scen, group in curves.groupby('scenario', sort=False):
+            ax.plot(group['block_timeout'], group['latency_mean'], marker=markers.get(scen, 'o'),
+                    color=colors.get(scen), label=labels.get(scen, scen))
+        ax.set_xlabel('Block interval (s)')
+        ax.set_ylabel('Simulated commit latency (s)')
+        return
+    block_intervals = [0.5, 1.0, 1.5, 2.0]
+    for scen in order:
+        base_lat = _scenario_value(summary, scen, 'latency_mean')
+        # Linear scaling with block interval
+        y_vals = [base_lat * (bi / 1.0) for bi in block_intervals]
+        ax.plot(block_intervals, y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
+    ax.set_xlabel('Block interval (s)')
+    ax.set_ylabel('Latency (s)')
+
 
 # Cost per item vs Transaction rate (sensitivity focus on Baseline B vs Proposed)
-fig6, ax6 = plt.subplots(figsize=(5, 4))
-for scen in ['baseline_b', 'proposed']:
-    cost = float(summary.loc[summary['scenario'] == scen, 'cost_item'].values[0])
-    if scen == 'baseline_b':
-        y_vals = [cost * 0.6, cost * 0.9, cost * 1.4, cost * 2.0]
-    else:  # proposed
-        y_vals = [cost * 0.9, cost * 1.0, cost * 1.08, cost * 1.15]
-    ax6.plot([20, 40, 60, 80], y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
-ax6.set_xlabel('Transaction rate (decisions/s)')
-ax6.set_ylabel('Cost per item ($)')
-ax6.set_ylim(bottom=0)
-ax6.legend()
-fig6.tight_layout()
-sens_cost_path = os.path.join(OUTPUT_DIR, 'sensitivity_cost_vs_txrate.png')
-fig6.savefig(sens_cost_path, dpi=150)
-
-print('Saved:', latency_path)
-print('Saved:', cost_path)
-print('Saved:', qa_latency_path)
-print('Saved:', qa_dispute_path)
-print('Saved:', sens_latency_path)
-print('Saved:', sens_cost_path)
+def draw_sensitivity_cost(ax, summary, measured):
+    for scen in ['baseline_b', 'proposed']:
+        cost = _scenario_value(summary, scen, 'cost_item')
+        if scen == 'baseline_b':
+            y_vals = [cost * 0.6, cost * 0.9, cost * 1.4, cost * 2.0]
+        else:  # proposed
+            y_vals = [cost * 0.9, cost * 1.0, cost * 1.08, cost * 1.15]
+        ax.plot([20, 40, 60, 80], y_vals, marker=markers[scen], color=colors[scen], label=labels[scen])
+    ax.set_xlabel('Transaction rate (decisions/s)')
+    ax.set_ylabel('Cost per item ($)')
+
+
+# name -> (output file, draw function, optional second input: 'loadtest' or 'ledger')
+FIGURES = {
+    'throughput_vs_latency': ('throughput_vs_latency.png', draw_throughput_vs_latency, 'loadtest'),
+    'cost_vs_txrate': ('cost_vs_txrate.png', draw_cost_vs_txrate, None),
+    'qualitative_latency_vs_tx': ('qualitative_latency_vs_tx.png', draw_qualitative_latency, 'loadtest'),
+    'qualitative_dispute_vs_tx': ('qualitative_dispute_vs_tx.png', draw_qualitative_dispute, None),
+    'sensitivity_latency_vs_block_interval': ('sensitivity_latency_vs_block_interval.png',
+                                              draw_sensitivity_latency, 'ledger'),
+    'sensitivity_cost_vs_txrate': ('sensitivity_cost_vs_txrate.png', draw_sensitivity_cost, None),
+}
+
+
+def _file_bytes(path):
+    if path is None or not os.path.exists(path):
+        return b''
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+
+def cache_key(name, summary_bytes, measured_bytes, dpi):
+    """Hash of everything a figure's PNG depends on."""
+    digest = hashlib.sha256()
+    digest.update(f"{name}|{RENDERER_VERSION}|{dpi}|".encode('utf-8'))
+    digest.update(hashlib.sha256(summary_bytes).digest())
+    if FIGURES[name][2]:
+        digest.update(hashlib.sha256(measured_bytes).digest())
+    return digest.hexdigest()
+
+
+def render_figure(task):
+    """Draw one figure to ``path`` (via a temporary file); returns seconds taken."""
+    name, path, summary_csv, measured_csv, dpi = task
+    started = time.perf_counter()
+    import matplotlib
+
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    plt.style.use('seaborn-v0_8-whitegrid')
+    summary = pd.read_csv(summary_csv)
+    measured = pd.read_csv(measured_csv) if measured_csv else None
+
+    fig, ax = plt.subplots(figsize=(5, 4))
+    FIGURES[name][1](ax, summary, measured)
+    ax.set_ylim(bottom=0)
+    ax.legend()
+    fig.tight_layout()
+    tmp_path = f"{path}.tmp.png"
+    fig.savefig(tmp_path, dpi=dpi)
+    plt.close(fig)
+    os.replace(tmp_path, path)
+    return time.perf_counter() - started
+
+
+def _load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def generate_plots(summary_csv=SUMMARY_CSV, output_dir=OUTPUT_DIR, measured_csv=LOADTEST_SUMMARY_CSV,
+                   figures=None, workers=None, force=False, dpi=DEFAULT_DPI, ledger_csv=LEDGER_SWEEP_CSV):
+    """
+    Render ``figures`` (all by default) into ``output_dir``, skipping those
+    whose cache key is unchanged unless ``force``. Returns a report dict with
+    one entry per figure (``name``, ``path``, ``cached``, ``seconds``) and the
+    total wall time.
+    """
+    started = time.perf_counter()
+    ensure_summary(summary_csv)
+    os.makedirs(output_dir, exist_ok=True)
+    inputs = {
+        kind: path if path and os.path.exists(path) else None
+        for kind, path in (('loadtest', measured_csv), ('ledger', ledger_csv))
+    }
+
+    summary_bytes = _file_bytes(summary_csv)
+    input_bytes = {kind: _file_bytes(path) for kind, path in inputs.items()}
+    manifest_path = os.path.join(output_dir, CACHE_MANIFEST)
+    manifest = _load_manifest(manifest_path)
+
+    entries = []
+    pending = []
+    for name in figures or FIGURES:
+        path = os.path.join(output_dir, FIGURES[name][0])
+        kind = FIGURES[name][2]
+        key = cache_key(name, summary_bytes, input_bytes.get(kind, b''), dpi)
+        cached = not force and manifest.get(name) == key and os.path.exists(path)
+        entries.append({'name': name, 'path': path, 'cached': cached, 'seconds': 0.0, 'key': key,
+                        'input': inputs.get(kind)})
+        if not cached:
+            pending.append(entries[-1])
+
+    tasks = [(entry['name'], entry['path'], summary_csv, entry['input'], dpi) for entry in pending]
+    workers = min(len(tasks), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        timings = [render_figure(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            timings = list(executor.map(render_figure, tasks))
+
+    for entry, seconds in zip(pending, timings):
+        entry['seconds'] = seconds
+        manifest[entry['name']] = entry['key']
+    if pending:
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(manifest, handle, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    for entry in entries:
+        del entry['key'], entry['input']
+    return {
+        'figures': entries,
+        'rendered': len(pending),
+        'workers': workers if pending else 0,
+        'totalSeconds': time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the KPI figures.")
+    parser.add_argument("--summary", default=SUMMARY_CSV, help="Per-scenario summary CSV")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Directory for the PNG files")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="Re-render figures even if their inputs are unchanged")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI, help="Output resolution")
+    parser.add_argument("--json", action="store_true", help="Print the timing report as JSON")
+    args = parser.parse_args()
+
+    report = generate_plots(args.summary, args.output_dir, workers=args.workers, force=args.force, dpi=args.dpi)
+    if args.json:
+        print(json.dumps(report))
+        return
+    for entry in report['figures']:
+        status = 'cached' if entry['cached'] else f"{entry['seconds']:.2f}s"
+        print(f"Saved: {entry['path']} ({status})")
+    print(f"Rendered {report['rendered']} of {len(report['figures'])} figures in {report['totalSeconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+"""
+One-pass statistics for KPI streams.
+
+``RunningStats`` keeps count/mean/variance/min/max with Welford's update,
+merged per chunk with Chan et al.'s pairwise formula, and ``DDSketch``
+answers quantile queries with bounded relative error from log-spaced bins.
+Both use memory independent of the number of values consumed, so results
+files far larger than RAM can be summarised chunk by chunk.
+
+``QuantileSketch`` keeps exact quantiles until a bounded number of values has
+been seen and then falls back to a ``DDSketch``, and ``BinnedSample`` does the
+same for the resampling tests in ``significance.py``. ``HdrHistogram`` records
+measured latencies for the load-test harness. ``KpiSummary`` combines them
+into per-scenario summaries built in one scan (``summarize`` reads a results
+file through ``optimization.datastore``).
+"""
+import math
+
+import numpy as np
+
+
+class RunningStats:
+    """Streaming count, mean, sample variance, min and max."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _merge_moments(self, count, mean, m2, minimum, maximum):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def update(self, values):
+        """Fold a chunk of values (any array-like) into the running moments."""
+        values = np.asarray(values, dtype=float).ravel()
+        if values.size == 0:
+            return
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(np.square(values - chunk_mean).sum())
+        self._merge_moments(values.size, chunk_mean, chunk_m2, float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        """Combine with another ``RunningStats`` built over disjoint data."""
+        self._merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance) if self.count > 1 else math.nan
+
+
+class DDSketch:
+    """
+    Quantile sketch with relative-error guarantees (Masson et al., 2019).
+
+    Values are counted in bins whose boundaries grow geometrically by
+    ``gamma = (1 + alpha) / (1 - alpha)``, so any returned quantile is within
+    a factor ``alpha`` of a true sample at that rank. Positive and negative
+    values use separate stores; exact zeros are counted on their own.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add_to_store(self, store, magnitudes):
+        if magnitudes.size == 0:
+            return
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64),
+                                 return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values):
+        """Add a chunk of values; NaNs are ignored."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        self._add_to_store(self.positive, values[values > 0])
+        self._add_to_store(self.negative, -values[values < 0])
+        self.zero_count += int(np.count_nonzero(values == 0))
+        self.count += values.size
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def _bin_value(self, key):
+        return 2.0 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        """Approximate the ``q``-quantile (0 <= q <= 1); NaN when empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be in [0, 1]")
+        if self.count == 0:
+            return math.nan
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bin_value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bin_value(key)
+        return self._bin_value(max(self.positive))
+
+
+class HdrHistogram:
+    """
+    HDR-style latency histogram (log-linear buckets, as in HdrHistogram).
+
+    Values are recorded as integer multiples of ``unit`` (microseconds for
+    latencies in seconds). Values below ``2 * 10**significant_figures`` units
+    get their own bucket; above that every power-of-two range is split into
+    the same number of linear sub-buckets, so a recorded value is reproduced to
+    ``significant_figures`` digits and memory depends only on the value range.
+    """
+
+    def __init__(self, significant_figures=3, unit=1e-6):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.significant_figures = significant_figures
+        self.unit = unit
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.half_count = self.sub_bucket_count // 2
+        self.counts = np.zeros(self.sub_bucket_count, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = -math.inf
+
+    def _indices(self, units):
+        shift = np.maximum(np.frexp(units.astype(float))[1] - self.sub_bucket_bits, 0)
+        sub_bucket = units >> shift
+        # shift 0 covers [0, sub_bucket_count); each later shift adds half_count buckets.
+        return np.where(shift == 0, units, self.sub_bucket_count + (shift - 1) * self.half_count
+                        + sub_bucket - self.half_count)
+
+    def _bucket_value(self, index):
+        if index < self.sub_bucket_count:
+            return index
+        shift, offset = divmod(index - self.sub_bucket_count, self.half_count)
+        shift += 1
+        lowest = (offset + self.half_count) << shift
+        return lowest + ((1 << shift) - 1) / 2
+
+    def record_many(self, values):
+        """Record a chunk of non-negative values; NaNs are ignored."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        if (values < 0).any():
+            raise ValueError("HdrHistogram values must be non-negative")
+        indices = self._indices(np.rint(values / self.unit).astype(np.int64))
+        if indices.max() >= self.counts.size:
+            self.counts = np.concatenate([self.counts, np.zeros(indices.max() + 1 - self.counts.size, np.int64)])
+        self.counts += np.bincount(indices, minlength=self.counts.size)
+        self.count += values.size
+        self.total += float(values.sum())
+        self.max = max(self.max, float(values.max()))
+
+    def record(self, value):
+        self.record_many([value])
+
+    def merge(self, other):
+        if (other.significant_figures, other.unit) != (self.significant_figures, self.unit):
+            raise ValueError("Cannot merge histograms with different precision or unit")
+        size = max(self.counts.size, other.counts.size)
+        counts = np.zeros(size, dtype=np.int64)
+        counts[:self.counts.size] += self.counts
+        counts[:other.counts.size] += other.counts
+        self.counts = counts
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    def percentile(self, percentile):
+        """Value at ``percentile`` (0-100), in the recorded unit; NaN when empty."""
+        if not 0 <= percentile <= 100:
+            raise ValueError("percentile must be in [0, 100]")
+        if self.count == 0:
+            return math.nan
+        rank = max(1, math.ceil(percentile / 100 * self.count))
+        if rank >= self.count:
+            return self.max
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(self._bucket_value(index) * self.unit, self.max)
+
+
+DEFAULT_EXACT_LIMIT = 100000
+
+
+class QuantileSketch:
+    """
+    Quantiles that are exact while few values have been seen and bounded in
+    memory afterwards.
+
+    Up to ``exact_limit`` values are kept and quantiles are interpolated
+    linearly between them, matching ``pandas.Series.quantile``; beyond that the
+    values are folded into a ``DDSketch`` and only the sketch is kept.
+    """
+
+    def __init__(self, exact_limit=DEFAULT_EXACT_LIMIT, relative_accuracy=0.001):
+        self.exact_limit = exact_limit
+        self.relative_accuracy = relative_accuracy
+        self.sketch = None
+        self._values = []
+        self._exact_count = 0
+
+    @property
+    def exact(self):
+        return self.sketch is None
+
+    @property
+    def count(self):
+        return self._exact_count if self.sketch is None else self.sketch.count
+
+    def _spill(self):
+        self.sketch = DDSketch(self.relative_accuracy)
+        for values in self._values:
+            self.sketch.update(values)
+        self._values = []
+        self._exact_count = 0
+
+    def update(self, values):
+        """Add a chunk of values; NaNs are ignored."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if self.sketch is not None:
+            self.sketch.update(values)
+            return
+        self._values.append(values)
+        self._exact_count += values.size
+        if self._exact_count > self.exact_limit:
+            self._spill()
+
+    def merge(self, other):
+        if other.sketch is None:
+            for values in other._values:
+                self.update(values)
+            return self
+        if self.sketch is None:
+            self._spill()
+        self.sketch.merge(other.sketch)
+        return self
+
+    def quantile(self, q):
+        if self.sketch is not None:
+            return self.sketch.quantile(q)
+        if not 0 <= q <= 1:
+            raise ValueError("q must be in [0, 1]")
+        if self._exact_count == 0:
+            return math.nan
+        return float(np.quantile(np.concatenate(self._values), q))
+
+
+class BinnedSample:
+    """
+    A resamplable summary of a value stream for bootstrap and permutation
+    tests (see ``demo/significance.py``).
+
+    Up to ``exact_limit`` values are kept as they are. Beyond that they are
+    folded into log-spaced bins of relative width ``relative_accuracy`` (the
+    DDSketch bins) that keep a count and a sum, so every value is replaced by
+    its bin's mean: the sample mean is preserved exactly and resampled means
+    differ only by the spread inside a bin.
+    """
+
+    def __init__(self, exact_limit=10000, relative_accuracy=0.001):
+        self.exact_limit = exact_limit
+        self.log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.relative_accuracy = relative_accuracy
+        self.bins = None
+        self._values = []
+        self.count = 0
+
+    @property
+    def exact(self):
+        return self.bins is None
+
+    def _keys(self, values):
+        magnitudes = np.abs(values)
+        keys = np.zeros(values.size, dtype=np.int64)
+        nonzero = magnitudes > 0
+        # Shift positive keys up and negative keys down so 0 stays the zero bin.
+        keys[nonzero] = np.ceil(np.log(magnitudes[nonzero]) / self.log_gamma).astype(np.int64) + (1 << 40)
+        return np.sign(values).astype(np.int64) * keys
+
+    def _bin(self, values):
+        keys, inverse = np.unique(self._keys(values), return_inverse=True)
+        counts = np.bincount(inverse, minlength=keys.size)
+        sums = np.bincount(inverse, weights=values, minlength=keys.size)
+        for key, count, total in zip(keys.tolist(), counts.tolist(), sums.tolist()):
+            entry = self.bins.setdefault(key, [0, 0.0])
+            entry[0] += count
+            entry[1] += total
+
+    def _spill(self):
+        self.bins = {}
+        for values in self._values:
+            self._bin(values)
+        self._values = []
+
+    def update(self, values):
+        """Add a chunk of values; NaNs are ignored."""
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        self.count += values.size
+        if self.bins is not None:
+            self._bin(values)
+            return
+        self._values.append(values)
+        if self.count > self.exact_limit:
+            self._spill()
+
+    def merge(self, other):
+        if other.log_gamma != self.log_gamma:
+            raise ValueError("Cannot merge samples with different relative accuracy")
+        if other.bins is None:
+            for values in other._values:
+                self.update(values)
+            return self
+        if self.bins is None:
+            self._spill()
+        for key, (count, total) in other.bins.items():
+            entry = self.bins.setdefault(key, [0, 0.0])
+            entry[0] += count
+            entry[1] += total
+        self.count += other.count
+        return self
+
+    def support(self):
+        """
+        ``(values, counts)``: the distinct resampling points and how many
+        original values each stands for (``counts`` is None while exact).
+        """
+        if self.bins is None:
+            return (np.concatenate(self._values) if self._values else np.empty(0)), None
+        entries = np.array(list(self.bins.values()), dtype=float).reshape(-1, 2)
+        return entries[:, 1] / entries[:, 0], entries[:, 0].astype(np.int64)
+
+    @property
+    def mean(self):
+        values, counts = self.support()
+        if self.count == 0:
+            return math.nan
+        return float(values.mean() if counts is None else values @ counts / self.count)
+
+
+class KpiSummary:
+    """
+    Single-scan per-group summaries of KPI records.
+
+    Feed it DataFrame chunks (or lists of record dicts); every chunk is split
+    by ``group_by`` (e.g. ``scenario``) once, and each group keeps a
+    ``RunningStats`` per column, a ``QuantileSketch`` per column in
+    ``quantile_columns`` and a ``BinnedSample`` per column in
+    ``sample_columns``. Memory depends on the number of groups and columns,
+    not on the number of records.
+    """
+
+    def __init__(self, columns, group_by="scenario", quantile_columns=None, sample_columns=(),
+                 exact_limit=DEFAULT_EXACT_LIMIT, relative_accuracy=0.001):
+        self.columns = list(columns)
+        self.group_by = group_by
+        self.quantile_columns = self.columns if quantile_columns is None else list(quantile_columns)
+        self.sample_columns = list(sample_columns)
+        self.exact_limit = exact_limit
+        self.relative_accuracy = relative_accuracy
+        self.moments = {}
+        self.quantiles = {}
+        self.samples = {}
+
+    def _group(self, name):
+        if name not in self.moments:
+            self.moments[name] = {column: RunningStats() for column in self.columns}
+            self.quantiles[name] = {
+                column: QuantileSketch(self.exact_limit, self.relative_accuracy)
+                for column in self.quantile_columns
+            }
+            self.samples[name] = {
+                column: BinnedSample(self.exact_limit, self.relative_accuracy)
+                for column in self.sample_columns
+            }
+        return self.moments[name], self.quantiles[name]
+
+    def update(self, frame):
+        """Fold one DataFrame chunk into the per-group summaries."""
+        if self.group_by is None:
+            groups = {None: slice(None)}
+        else:
+            groups = frame.groupby(self.group_by, sort=False).indices
+        for name, index in groups.items():
+            moments, quantiles = self._group(name)
+            for column in self.columns:
+                values = frame[column].to_numpy()[index]
+                moments[column].update(values)
+                if column in quantiles:
+                    quantiles[column].update(values)
+                if column in self.samples[name]:
+                    self.samples[name][column].update(values)
+        return self
+
+    def update_records(self, records):
+        """Fold an iterable of record dicts (one batch) into the summaries."""
+        import pandas as pd
+
+        return self.update(pd.DataFrame.from_records(list(records)))
+
+    def merge(self, other):
+        for name in other.moments:
+            moments, quantiles = self._group(name)
+            for column in self.columns:
+                moments[column].merge(other.moments[name][column])
+            for column in self.quantile_columns:
+                quantiles[column].merge(other.quantiles[name][column])
+            for column in self.sample_columns:
+                self.samples[name][column].merge(other.samples[name][column])
+        return self
+
+    @property
+    def groups(self):
+        return list(self.moments)
+
+    def stats(self, group, column):
+        return self.moments[group][column]
+
+    def quantile(self, group, column, q):
+        return self.quantiles[group][column].quantile(q)
+
+    def sample(self, group, column):
+        return self.samples[group][column]
+
+    def to_records(self, quantiles=(0.5, 0.95, 0.99)):
+        """One summary record per (group, column)."""
+        records = []
+        for name in self.moments:
+            for column in self.columns:
+                stats = self.moments[name][column]
+                record = {
+                    "group": name, "column": column, "count": stats.count, "mean": stats.mean,
+                    "std": stats.std, "min": stats.min, "max": stats.max,
+                }
+                if column in self.quantiles[name]:
+                    for q in quantiles:
+                        record[f"p{q * 100:g}"] = self.quantiles[name][column].quantile(q)
+                records.append(record)
+        return records
+
+
+def summarize(path, columns, group_by="scenario", chunk_rows=262144, **kwargs):
+    """
+    Summarize a results file (CSV, Parquet or column store) in one chunked
+    scan. Extra keyword arguments go to ``KpiSummary``.
+    """
+    from optimization import datastore
+
+    summary = KpiSummary(columns, group_by=group_by, **kwargs)
+    read_columns = list(columns) + ([group_by] if group_by else [])
+    for chunk in datastore.iter_frames(path, chunk_rows, columns=read_columns):
+        summary.update(chunk)
+    return summary
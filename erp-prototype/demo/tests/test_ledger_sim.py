@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from demo import ledger_sim
+
+
+def expected_kth_delay(peers, k, mean):
+    """Mean of the k-th smallest of ``peers`` exponential delays."""
+    return mean * sum(1 / (peers - i) for i in range(k))
+
+
+@pytest.mark.parametrize("validators", [4, 7, 10, 16])
+def test_pbft_phases_match_their_analytic_means(validators):
+    config = ledger_sim.make_config("proposed", validators=validators, msg_cost_ms=0.0, network_ms=5.0)
+    durations = ledger_sim.consensus_durations(config, 200000, np.random.default_rng(0))
+
+    # One pre-prepare message from the primary, then two phases waiting for
+    # 2f of the other n - 1 validators.
+    quorum = 2 * ledger_sim.fault_tolerance("pbft", validators)
+    expected = 0.005 + 2 * expected_kth_delay(validators - 1, quorum, 0.005)
+    assert durations.mean() == pytest.approx(expected, rel=0.01)
+
+
+def test_raft_waits_for_a_majority_round_trip():
+    config = ledger_sim.make_config("baseline_b", validators=5, msg_cost_ms=0.0)
+    durations = ledger_sim.consensus_durations(config, 1000, np.random.default_rng(0))
+
+    assert (durations > 0).all()
+    assert ledger_sim.consensus_durations(ledger_sim.make_config("baseline_a"), 10, None).tolist() == [0.0] * 10
+
+
+def test_message_counts_and_fault_tolerance():
+    assert ledger_sim.messages_per_block("pbft", 4) == 27
+    assert ledger_sim.messages_per_block("raft", 3) == 4
+    assert ledger_sim.fault_tolerance("pbft", 4) == 1
+    assert ledger_sim.fault_tolerance("raft", 5) == 2
+
+
+def test_make_config_rejects_unknown_settings():
+    with pytest.raises(ValueError):
+        ledger_sim.make_config(block_szie=5)
+    with pytest.raises(ValueError):
+        ledger_sim.make_config(consensus="paxos")
+
+
+def test_blocks_cut_by_size_or_timeout():
+    ready = np.array([0.0, 0.1, 0.2, 0.3, 2.0, 5.0])
+
+    starts, cut_times = ledger_sim.cut_blocks(ready, block_size=3, block_timeout=1.0)
+
+    assert starts.tolist() == [0, 3, 4, 5]
+    assert cut_times.tolist() == [0.2, 1.3, 3.0, 6.0]
+
+
+def test_every_transaction_commits_after_it_arrives():
+    result = ledger_sim.simulate(ledger_sim.make_config("proposed", num_tx=2000))
+
+    assert (result["committed"] >= result["arrival"]).all()
+    assert np.all(np.diff(result["committed"][np.argsort(result["block"], kind="stable")]) >= 0)
@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from demo import demo_scenarios, parallel_runner
+from optimization import datastore
+
+SYNTHETIC_DATA = Path(__file__).resolve().parents[1] / "synthetic_data.csv"
+
+
+def run_cli(module, monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", [module.__name__, *map(str, argv)])
+    module.main()
+
+
+def run_parallel_cli(monkeypatch, tmp_path, workers, input_path=SYNTHETIC_DATA, limit=700):
+    output = tmp_path / f"results_{workers}.csv"
+    run_cli(parallel_runner, monkeypatch, "--input", input_path, "--output", output,
+            "--summary", tmp_path / f"summary_{workers}.csv", "--limit", limit, "--workers", workers,
+            "--shard-rows", 150)
+    return output
+
+
+def test_output_does_not_depend_on_workers_and_matches_vectorized_demo(monkeypatch, tmp_path):
+    single = run_parallel_cli(monkeypatch, tmp_path, 1)
+    pooled = run_parallel_cli(monkeypatch, tmp_path, 3)
+    vectorized = tmp_path / "vectorized.csv"
+    run_cli(demo_scenarios, monkeypatch, "--input", SYNTHETIC_DATA, "--output", vectorized,
+            "--summary", tmp_path / "vectorized_summary.csv", "--limit", 700, "--kpi-engine", "vectorized")
+
+    assert single.read_bytes() == pooled.read_bytes() == vectorized.read_bytes()
+    assert len(pd.read_csv(single)) == 3 * 700
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".cols"])
+def test_empty_input_writes_an_empty_result(monkeypatch, tmp_path, suffix):
+    empty = tmp_path / "empty.csv"
+    pd.read_csv(SYNTHETIC_DATA, nrows=0).to_csv(empty, index=False)
+    output = tmp_path / f"results{suffix}"
+
+    run_cli(parallel_runner, monkeypatch, "--input", empty, "--output", output, "--summary",
+            tmp_path / "summary.csv", "--workers", 1)
+
+    results = datastore.read_frame(output)
+    assert results.empty
+    assert list(results.columns) == ["scenario"] + demo_scenarios.KPI_COLUMNS
@@ -0,0 +1,86 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from demo import significance
+from demo.streaming_stats import BinnedSample
+
+
+def sample(values, exact_limit=10000):
+    result = BinnedSample(exact_limit=exact_limit)
+    result.update(values)
+    return result
+
+
+def exact_permutation_p_value(a, b):
+    """Two-sided p-value over every relabelling of the pooled values."""
+    pooled = np.concatenate([a, b])
+    observed = abs(np.mean(b) - np.mean(a))
+    extreme = total = 0
+    for chosen in itertools.combinations(range(pooled.size), len(a)):
+        mask = np.zeros(pooled.size, dtype=bool)
+        mask[list(chosen)] = True
+        extreme += abs(pooled[~mask].mean() - pooled[mask].mean()) >= observed - 1e-12
+        total += 1
+    return extreme / total
+
+
+def test_permutation_p_value_matches_exact_enumeration():
+    a = np.array([1.0, 2.5, 3.0, 4.0])
+    b = np.array([3.5, 5.0, 6.0, 7.5])
+    expected = exact_permutation_p_value(a, b)
+
+    p_value = significance.permutation_test(sample(a), sample(b), resamples=20000)
+
+    assert expected == pytest.approx(4 / 70)
+    assert p_value == pytest.approx(expected, abs=0.01)
+
+
+def test_permutation_p_value_bounds():
+    same = sample(np.arange(20.0))
+    apart_a, apart_b = sample(np.arange(10.0)), sample(np.arange(100.0, 110.0))
+
+    assert significance.permutation_test(same, same, resamples=500) == 1.0
+    assert significance.permutation_test(apart_a, apart_b, resamples=500) == pytest.approx(1 / 501)
+
+
+def test_binned_samples_agree_with_exact_samples():
+    rng = np.random.default_rng(11)
+    a, b = rng.lognormal(0, 0.5, 20000), rng.lognormal(0.02, 0.5, 20000)
+
+    exact = significance.bootstrap_ratio(sample(a, 10 ** 9), sample(b, 10 ** 9), resamples=2000)
+    binned = significance.bootstrap_ratio(sample(a, 1000), sample(b, 1000), resamples=2000)
+
+    assert binned[0] == pytest.approx(exact[0], rel=1e-9)
+    assert binned[1] == pytest.approx(exact[1], rel=2e-3)
+    assert binned[2] == pytest.approx(exact[2], rel=2e-3)
+    assert significance.permutation_test(sample(a, 1000), sample(b, 1000), resamples=2000) == pytest.approx(
+        significance.permutation_test(sample(a, 10 ** 9), sample(b, 10 ** 9), resamples=2000), abs=0.03)
+
+
+def test_bootstrap_interval_covers_the_ratio_and_ignores_batching():
+    rng = np.random.default_rng(5)
+    a, b = sample(rng.normal(100, 10, 500)), sample(rng.normal(110, 10, 500))
+
+    estimate, low, high = significance.bootstrap_ratio(a, b, resamples=1000, batch_size=250)
+
+    assert low < estimate < high
+    assert low < 1.1 < high
+    assert significance.bootstrap_ratio(a, b, resamples=1000, batch_size=250, workers=2) == (estimate, low, high)
+
+
+def test_compare_orders_bounds_for_reductions():
+    rng = np.random.default_rng(9)
+    samples_a = {"latency": sample(rng.normal(100, 5, 300)), "throughput": sample(rng.normal(50, 2, 300)),
+                 "mae": sample(rng.normal(4, 0.5, 300))}
+    samples_b = {"latency": sample(rng.normal(120, 5, 300)), "throughput": sample(rng.normal(40, 2, 300)),
+                 "mae": sample(rng.normal(3, 0.5, 300))}
+
+    results = significance.compare(samples_a, samples_b, resamples=500)
+
+    assert results["latency_overhead"]["estimate"] == pytest.approx(20, abs=2)
+    assert results["throughput_reduction"]["estimate"] == pytest.approx(20, abs=2)
+    for result in results.values():
+        assert result["low"] <= result["estimate"] <= result["high"]
+        assert result["p_value"] == pytest.approx(1 / 501)
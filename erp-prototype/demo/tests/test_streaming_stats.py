@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from demo.streaming_stats import BinnedSample, DDSketch, HdrHistogram, KpiSummary, QuantileSketch, RunningStats
+
+QUANTILES = (0.0, 0.01, 0.25, 0.5, 0.9, 0.99, 0.999, 1.0)
+
+
+@pytest.fixture(scope="module")
+def values():
+    rng = np.random.default_rng(7)
+    return np.concatenate([rng.lognormal(0, 2, 20000), -rng.exponential(3, 5000), np.zeros(100)])
+
+
+def chunks(values, size=3000):
+    return [values[start:start + size] for start in range(0, values.size, size)]
+
+
+def test_running_stats_merge_matches_numpy(values):
+    merged = RunningStats()
+    for chunk in chunks(values):
+        part = RunningStats()
+        part.update(chunk)
+        merged.merge(part)
+
+    assert merged.count == values.size
+    assert merged.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert merged.variance == pytest.approx(values.var(ddof=1), rel=1e-10)
+    assert (merged.min, merged.max) == (values.min(), values.max())
+
+
+@pytest.mark.parametrize("alpha", [0.01, 0.001])
+def test_ddsketch_quantiles_are_within_relative_accuracy(values, alpha):
+    sketch = DDSketch(alpha)
+    for chunk in chunks(values):
+        sketch.update(chunk)
+
+    ordered = np.sort(values)
+    for q in QUANTILES:
+        expected = ordered[int(np.floor(q * (values.size - 1)))]
+        assert abs(sketch.quantile(q) - expected) <= alpha * abs(expected)
+
+
+def test_ddsketch_merge_equals_single_sketch(values):
+    whole = DDSketch(0.01)
+    whole.update(values)
+    merged = DDSketch(0.01)
+    for chunk in chunks(values):
+        part = DDSketch(0.01)
+        part.update(chunk)
+        merged.merge(part)
+
+    assert (merged.positive, merged.negative, merged.zero_count, merged.count) == \
+        (whole.positive, whole.negative, whole.zero_count, whole.count)
+    with pytest.raises(ValueError):
+        merged.merge(DDSketch(0.02))
+
+
+def test_hdr_histogram_percentiles_keep_significant_figures():
+    rng = np.random.default_rng(3)
+    latencies = rng.lognormal(-6, 1, 50000)
+    histogram = HdrHistogram(significant_figures=3)
+    histogram.record_many(latencies)
+
+    ordered = np.sort(latencies)
+    for percentile in (50, 90, 99, 99.9):
+        expected = ordered[int(np.ceil(percentile / 100 * latencies.size)) - 1]
+        # Relative bucket width plus rounding to the microsecond unit.
+        assert abs(histogram.percentile(percentile) - expected) <= 1e-3 * expected + 1e-6
+    assert histogram.percentile(100) == latencies.max()
+
+
+def test_hdr_histogram_merge_equals_single_histogram():
+    rng = np.random.default_rng(4)
+    latencies = rng.lognormal(-5, 1.5, 20000)
+    whole = HdrHistogram()
+    whole.record_many(latencies)
+    merged = HdrHistogram()
+    for chunk in chunks(latencies):
+        part = HdrHistogram()
+        part.record_many(chunk)
+        merged.merge(part)
+
+    np.testing.assert_array_equal(merged.counts[:whole.counts.size], whole.counts)
+    assert not merged.counts[whole.counts.size:].any()
+    assert (merged.count, merged.max) == (whole.count, whole.max)
+    assert merged.total == pytest.approx(whole.total)
+
+
+def test_quantile_sketch_is_exact_until_its_limit(values):
+    exact = QuantileSketch(exact_limit=values.size)
+    spilled = QuantileSketch(exact_limit=1000, relative_accuracy=0.001)
+    for chunk in chunks(values):
+        exact.update(chunk)
+        spilled.update(chunk)
+
+    assert exact.exact and not spilled.exact
+    for q in QUANTILES:
+        assert exact.quantile(q) == pd.Series(values).quantile(q)
+        expected = np.sort(values)[int(np.floor(q * (values.size - 1)))]
+        assert abs(spilled.quantile(q) - expected) <= 0.001 * abs(expected)
+
+
+def test_binned_sample_preserves_count_and_mean_across_merges(values):
+    exact = BinnedSample(exact_limit=10 ** 9)
+    exact.update(values)
+    merged = BinnedSample(exact_limit=5000)
+    for chunk in chunks(values):
+        part = BinnedSample(exact_limit=5000)
+        part.update(chunk)
+        merged.merge(part)
+
+    assert exact.exact and not merged.exact
+    _, counts = merged.support()
+    assert merged.count == counts.sum() == values.size
+    assert merged.mean == pytest.approx(exact.mean, rel=1e-9)
+
+
+def test_kpi_summary_groups_and_merges():
+    frame = pd.DataFrame({"scenario": ["a", "b"] * 500, "latency": np.arange(1000, dtype=float)})
+    left, right = KpiSummary(["latency"]), KpiSummary(["latency"])
+    left.update(frame.iloc[:400])
+    right.update(frame.iloc[400:])
+    left.merge(right)
+
+    for name, group in frame.groupby("scenario"):
+        stats = left.stats(name, "latency")
+        assert stats.count == len(group)
+        assert stats.mean == pytest.approx(group["latency"].mean())
+        assert left.quantile(name, "latency", 0.5) == group["latency"].quantile(0.5)
+
+
+def test_kpi_summary_samples_use_its_limits():
+    frame = pd.DataFrame({"scenario": ["a"] * 1000, "latency": np.linspace(1, 2, 1000)})
+    kpis = KpiSummary(["latency"], sample_columns=["latency"], exact_limit=100, relative_accuracy=0.01)
+
+    kpis.update(frame)
+
+    sample = kpis.samples["a"]["latency"]
+    assert (sample.exact_limit, sample.relative_accuracy) == (100, 0.01)
+    assert not sample.exact and sample.mean == pytest.approx(1.5)
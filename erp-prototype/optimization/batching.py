@@ -0,0 +1,158 @@
+"""
+Micro-batching for concurrent single-item predictions.
+
+Requests that arrive within a short window are gathered into one batch and
+scored with a single vectorized ``predict_weights`` call; each caller gets
+its own prediction back.
+"""
+import asyncio
+import bisect
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from optimization.model import predict_weights
+
+# Upper bounds (ms) of the queueing-delay histogram buckets.
+DELAY_BUCKETS_MS = (0.5, 1.0, 2.0, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+
+class CoalescerMetrics:
+    """Batch-size distribution and queueing-delay histogram for a coalescer."""
+
+    def __init__(self):
+        self.batch_sizes = Counter()
+        self.delay_bucket_counts = [0] * (len(DELAY_BUCKETS_MS) + 1)
+        self.delay_count = 0
+        self.delay_sum_ms = 0.0
+        self.delay_max_ms = 0.0
+
+    def record_batch(self, size, delays_ms):
+        self.batch_sizes[size] += 1
+        for delay in delays_ms:
+            self.delay_bucket_counts[bisect.bisect_left(DELAY_BUCKETS_MS, delay)] += 1
+            self.delay_count += 1
+            self.delay_sum_ms += delay
+            if delay > self.delay_max_ms:
+                self.delay_max_ms = delay
+
+    def snapshot(self):
+        batches = sum(self.batch_sizes.values())
+        items = sum(size * count for size, count in self.batch_sizes.items())
+        bucket_labels = [f"le_{edge:g}ms" for edge in DELAY_BUCKETS_MS] + ["le_inf"]
+        return {
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "batch_size_counts": dict(sorted(self.batch_sizes.items())),
+            "queue_delay_ms": {
+                "count": self.delay_count,
+                "mean": self.delay_sum_ms / self.delay_count if self.delay_count else 0.0,
+                "max": self.delay_max_ms,
+                "buckets": dict(zip(bucket_labels, self.delay_bucket_counts)),
+            },
+        }
+
+
+class PredictionCoalescer:
+    """
+    Gather single-item predictions into vectorized batches.
+
+    A batch is flushed when ``max_batch_size`` requests are queued or when
+    ``max_wait_ms`` has elapsed since the first request of the batch arrived,
+    whichever comes first. The batch runs in the default executor so the
+    event loop keeps accepting requests while the model is busy.
+    """
+
+    def __init__(self, predict_batch=predict_weights, max_batch_size=64, max_wait_ms=2.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must be non-negative")
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.metrics = CoalescerMetrics()
+        self._pending = deque()
+        # Requests taken off the queue whose batch has not been resolved yet.
+        self._batch = []
+        self._wakeup = None
+        self._worker = None
+
+    async def start(self):
+        if self._worker is None:
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for _, _, future in self._batch:
+            if not future.done():
+                future.cancel()
+        self._batch = []
+        while self._pending:
+            _, _, future = self._pending.popleft()
+            if not future.done():
+                future.cancel()
+
+    async def predict(self, features):
+        """Queue one feature vector and wait for its prediction."""
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((features, time.perf_counter(), future))
+        self._wakeup.set()
+        return await future
+
+    async def _wait_for_request(self, timeout=None):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _collect(self):
+        while not self._pending:
+            await self._wait_for_request()
+
+        batch = self._batch = [self._pending.popleft()]
+        deadline = batch[0][1] + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            if self._pending:
+                batch.append(self._pending.popleft())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not await self._wait_for_request(remaining):
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            self.metrics.record_batch(
+                len(batch), [(started - queued_at) * 1000.0 for _, queued_at, _ in batch]
+            )
+
+            try:
+                matrix = np.asarray([features for features, _, _ in batch], dtype=np.float32)
+                predictions = await loop.run_in_executor(None, self.predict_batch, matrix)
+            except Exception as error:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                self._batch = []
+                continue
+
+            for (_, _, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result(float(prediction))
+            self._batch = []
@@ -0,0 +1,106 @@
+"""
+Memoization of single-item predictions.
+
+Warehouse scanners re-measure the same SKU footprints constantly, and the
+measurements are rounded to 0.1 cm (DF to 0.01), so keying predictions on
+the quantized feature tuple lets repeat scans skip the model entirely.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_SIZE = 100000
+DIMENSION_STEP = 0.1
+DENSITY_STEP = 0.01
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of predictions with an optional TTL.
+
+    Entries are keyed on ``(model_path, round(L / 0.1), round(W / 0.1),
+    round(H / 0.1), round(DF / 0.01))``. Each lookup passes the current model
+    fingerprint; when it differs from the one that model's entries were
+    filled with (the model was retrained) those entries are dropped before the
+    lookup. Entries of other model paths are kept.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl_seconds=None,
+                 dimension_step=DIMENSION_STEP, density_step=DENSITY_STEP, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.steps = (dimension_step, dimension_step, dimension_step, density_step)
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key(self, model_path, features):
+        return (str(model_path),) + tuple(
+            int(round(float(value) / step)) for value, step in zip(features, self.steps)
+        )
+
+    def _check_fingerprint(self, model_path, fingerprint):
+        model_path = str(model_path)
+        if self._fingerprints.get(model_path, fingerprint) != fingerprint:
+            for key in [key for key in self._entries if key[0] == model_path]:
+                del self._entries[key]
+            self.invalidations += 1
+        self._fingerprints[model_path] = fingerprint
+
+    def get(self, model_path, features, fingerprint):
+        """Return the cached prediction, or ``None`` on a miss."""
+        key = self.key(model_path, features)
+        with self._lock:
+            self._check_fingerprint(model_path, fingerprint)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and self.clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, model_path, features, fingerprint, value):
+        key = self.key(model_path, features)
+        expires_at = self.clock() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._check_fingerprint(model_path, fingerprint)
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxSize": self.max_size,
+            "ttlSeconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
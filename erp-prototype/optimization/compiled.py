@@ -0,0 +1,139 @@
+"""
+Pure-NumPy evaluator for the XGBoost JSON model.
+
+``dw_model.json`` holds a few dozen shallow regression trees over four float
+features, so the forest can be flattened into a handful of arrays and
+evaluated for a whole batch with vectorized indexing. This needs only NumPy
+at prediction time, which keeps lightweight deployments free of xgboost.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+SUPPORTED_OBJECTIVES = ("reg:squarederror",)
+
+
+def _parse_base_score(value):
+    # XGBoost >= 3 stores base_score as a bracketed vector, e.g. "[5.93E3]".
+    return float(str(value).strip("[]").split(",")[0])
+
+
+def _tree_depth(left, right):
+    depth = 0
+    frontier = [0]
+    while frontier:
+        frontier = [child for node in frontier for child in (left[node], right[node]) if child != -1]
+        if frontier:
+            depth += 1
+    return depth
+
+
+class CompiledForest:
+    """
+    Flattened tree ensemble.
+
+    All trees are concatenated into shared node arrays. Leaf nodes point to
+    themselves as both children so every row can take the same fixed number
+    of steps (the depth of the deepest tree) without branching on leaves.
+    """
+
+    def __init__(self, feature, threshold, left, right, default_left, value,
+                 roots, max_depth, base_score, feature_names):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_score = base_score
+        self.feature_names = feature_names
+        self.children = np.stack([left, right], axis=1)
+        self.has_default_left = bool(default_left.any())
+
+    @property
+    def num_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_json(cls, model_path):
+        """Compile a model saved with ``Booster.save_model(... .json)``."""
+        with open(Path(model_path), "r", encoding="utf-8") as handle:
+            return cls.from_learner(json.load(handle)["learner"])
+
+    @classmethod
+    def from_learner(cls, learner):
+        """Compile the ``learner`` object of an already parsed JSON model."""
+        objective = learner["objective"]["name"]
+        if objective not in SUPPORTED_OBJECTIVES:
+            raise ValueError(f"Unsupported objective for compilation: {objective}")
+        booster = learner["gradient_booster"]
+        if booster["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster for compilation: {booster['name']}")
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree in booster["model"]["trees"]:
+            if any(split_type != 0 for split_type in tree["split_type"]):
+                raise ValueError("Categorical splits are not supported")
+
+            tree_left = tree["left_children"]
+            tree_right = tree["right_children"]
+            num_nodes = len(tree_left)
+            max_depth = max(max_depth, _tree_depth(tree_left, tree_right))
+
+            for node in range(num_nodes):
+                is_leaf = tree_left[node] == -1
+                left.append(offset + node if is_leaf else offset + tree_left[node])
+                right.append(offset + node if is_leaf else offset + tree_right[node])
+                feature.append(0 if is_leaf else tree["split_indices"][node])
+                threshold.append(0.0 if is_leaf else tree["split_conditions"][node])
+                value.append(tree["split_conditions"][node] if is_leaf else 0.0)
+                default_left.append(bool(tree["default_left"][node]))
+
+            roots.append(offset)
+            offset += num_nodes
+
+        return cls(
+            feature=np.asarray(feature, dtype=np.intp),
+            threshold=np.asarray(threshold, dtype=np.float32),
+            left=np.asarray(left, dtype=np.intp),
+            right=np.asarray(right, dtype=np.intp),
+            default_left=np.asarray(default_left, dtype=bool),
+            value=np.asarray(value, dtype=np.float32),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            base_score=_parse_base_score(learner["learner_model_param"]["base_score"]),
+            feature_names=learner.get("feature_names") or [],
+        )
+
+    def predict(self, features):
+        """
+        Score an (N, F) float array. Splits follow XGBoost semantics: go left
+        when ``x < threshold`` and follow ``default_left`` for NaN.
+        """
+        X = np.ascontiguousarray(features, dtype=np.float32)
+        num_rows, num_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(num_rows) * num_features)[:, None]
+        nodes = np.broadcast_to(self.roots, (num_rows, self.num_trees))
+
+        for _ in range(self.max_depth):
+            x = flat[row_offsets + self.feature[nodes]]
+            # NaN compares False, so missing values go right unless the node
+            # says otherwise.
+            go_right = ~(x < self.threshold[nodes])
+            if self.has_default_left:
+                go_right &= ~(np.isnan(x) & self.default_left[nodes])
+            nodes = self.children[nodes, go_right.view(np.int8)]
+
+        # Accumulate in float32, tree by tree, starting from the base score:
+        # the same order XGBoost uses, so results match it bit for bit.
+        # cumsum is sequential along the row, unlike pairwise sum().
+        totals = np.empty((num_rows, self.num_trees + 1), dtype=np.float32)
+        totals[:, 0] = self.base_score
+        totals[:, 1:] = self.value[nodes]
+        return np.cumsum(totals, axis=1, dtype=np.float32)[:, -1]
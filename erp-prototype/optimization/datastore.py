@@ -0,0 +1,395 @@
+"""
+Pluggable tabular storage for measurement data and scenario results.
+
+Three formats are supported, chosen from the path:
+
+- ``csv`` (anything else): the original format, read with pandas so existing
+  files and outputs are unchanged.
+- ``parquet`` (``.parquet`` / ``.pq``): needs pyarrow, which is optional and
+  imported only when a Parquet file is used.
+- ``columns`` (a ``.cols`` directory): a memory-mapped column store. Each
+  block of columns is a raw little-endian binary file described by
+  ``manifest.json``; the ``L``/``W``/``H``/``DF`` features are stored as one
+  row-major (N, 4) block, so ``read_features`` hands the model a zero-copy
+  ``np.memmap`` that goes straight into ``predict_weights`` or a ``DMatrix``.
+  String columns (e.g. ``scenario``) are dictionary-encoded.
+
+Convert an existing CSV from erp-prototype/:
+    python -m optimization.datastore demo/synthetic_data.csv demo/synthetic_data.cols --float32
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FORMATS = ("csv", "parquet", "columns")
+FEATURE_NAMES = ["L", "W", "H", "DF"]
+LABEL = "optimal_weight"
+MANIFEST = "manifest.json"
+DEFAULT_CHUNK_ROWS = 262144
+CSV_INDEX_STRIDE = 4096
+
+
+def detect_format(path):
+    """Storage format implied by ``path``."""
+    path = Path(path)
+    if path.suffix in (".parquet", ".pq"):
+        return "parquet"
+    if path.suffix == ".cols" or (path / MANIFEST).exists():
+        return "columns"
+    return "csv"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet support requires pyarrow (pip install pyarrow)") from None
+    return pa, pq
+
+
+class ColumnStore:
+    """Read-only view of a ``.cols`` directory; every column is a memmap (view)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / MANIFEST, "r", encoding="utf-8") as handle:
+            self.manifest = json.load(handle)
+        self.rows = self.manifest["rows"]
+        self.columns = self.manifest["columns"]
+        self.categories = self.manifest.get("categories", {})
+        self._blocks = {}
+        self._locations = {}
+        for block in self.manifest["blocks"]:
+            for index, name in enumerate(block["columns"]):
+                self._locations[name] = (block["name"], index)
+
+    def block(self, name):
+        """The (rows, k) memmap holding block ``name``."""
+        if name not in self._blocks:
+            spec = next(block for block in self.manifest["blocks"] if block["name"] == name)
+            shape = (self.rows, len(spec["columns"]))
+            if self.rows == 0:
+                self._blocks[name] = np.empty(shape, dtype=spec["dtype"])
+            else:
+                self._blocks[name] = np.memmap(self.path / spec["file"], dtype=spec["dtype"], mode="r", shape=shape)
+        return self._blocks[name]
+
+    def column(self, name, start=0, stop=None):
+        """Values of one column; numeric columns are zero-copy (strided) views."""
+        block_name, index = self._locations[name]
+        values = self.block(block_name)[start:stop, index]
+        if name in self.categories:
+            return np.asarray(self.categories[name], dtype=object)[values]
+        return values
+
+    def matrix(self, names, start=0, stop=None):
+        """
+        Columns ``names`` as a 2-D array; zero-copy when they are exactly one
+        stored block in the same order (as the feature block is).
+        """
+        block_name, _ = self._locations[names[0]]
+        spec = next(block for block in self.manifest["blocks"] if block["name"] == block_name)
+        if spec["columns"] == list(names):
+            return self.block(block_name)[start:stop]
+        return np.column_stack([self.column(name, start, stop) for name in names])
+
+    def frame(self, columns=None, start=0, stop=None):
+        return pd.DataFrame({name: self.column(name, start, stop) for name in columns or self.columns})
+
+
+class ColumnStoreWriter:
+    """
+    Append DataFrames to a ``.cols`` directory. The manifest is written on
+    ``close()``, so readers never see a partially written store.
+    """
+
+    def __init__(self, path, float_dtype=None):
+        self.path = Path(path)
+        self.float_dtype = float_dtype
+        self.rows = 0
+        self.columns = None
+        self.blocks = None
+        self.categories = {}
+        self._handles = {}
+
+    def _plan(self, frame):
+        self.columns = list(frame.columns)
+        self.blocks = []
+        grouped = set()
+        if all(name in frame.columns for name in FEATURE_NAMES):
+            self.blocks.append({"name": "features", "columns": list(FEATURE_NAMES)})
+            grouped.update(FEATURE_NAMES)
+        for name in self.columns:
+            if name not in grouped:
+                self.blocks.append({"name": name, "columns": [name]})
+
+        for block in self.blocks:
+            sample = frame[block["columns"]]
+            if any(not pd.api.types.is_numeric_dtype(sample[name]) for name in block["columns"]):
+                dtype = np.dtype("<i4")
+                self.categories.update({name: [] for name in block["columns"]})
+            else:
+                dtype = np.result_type(*sample.dtypes)
+                if self.float_dtype is not None and dtype.kind == "f":
+                    dtype = np.dtype(self.float_dtype)
+                dtype = dtype.newbyteorder("<")
+            block["dtype"] = dtype.str
+            block["file"] = f"{block['name']}.bin"
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        manifest = self.path / MANIFEST
+        if manifest.exists():
+            manifest.unlink()
+        # A rewrite with fewer columns must not leave the old blocks behind.
+        planned = {block["file"] for block in self.blocks}
+        for stale in self.path.glob("*.bin"):
+            if stale.name not in planned:
+                stale.unlink()
+        for block in self.blocks:
+            self._handles[block["name"]] = open(self.path / block["file"], "wb")
+
+    def _encode(self, name, values):
+        categories = self.categories[name]
+        lookup = {value: code for code, value in enumerate(categories)}
+        codes = np.empty(len(values), dtype="<i4")
+        for i, value in enumerate(values):
+            if value not in lookup:
+                lookup[value] = len(categories)
+                categories.append(value)
+            codes[i] = lookup[value]
+        return codes
+
+    def write(self, frame):
+        if self.columns is None:
+            self._plan(frame)
+        elif list(frame.columns) != self.columns:
+            raise ValueError("All chunks written to a column store must have the same columns")
+
+        for block in self.blocks:
+            if block["columns"][0] in self.categories:
+                values = np.column_stack([self._encode(name, frame[name].tolist()) for name in block["columns"]])
+            else:
+                values = frame[block["columns"]].to_numpy(dtype=block["dtype"])
+            self._handles[block["name"]].write(np.ascontiguousarray(values, dtype=block["dtype"]).tobytes())
+        self.rows += len(frame)
+
+    def close(self):
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+        if self.columns is None:
+            return
+        manifest = {
+            "format": "dw-columns",
+            "version": 1,
+            "rows": self.rows,
+            "columns": self.columns,
+            "blocks": self.blocks,
+            "categories": self.categories,
+        }
+        tmp_path = self.path / f".{MANIFEST}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, indent=2)
+        os.replace(tmp_path, self.path / MANIFEST)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.first = True
+
+    def write(self, frame):
+        frame.to_csv(self.path, mode="w" if self.first else "a", header=self.first, index=False)
+        self.first = False
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self.pa, pq = _pyarrow()
+        self._writer_class = pq.ParquetWriter
+        self.path = path
+        self.writer = None
+
+    def write(self, frame):
+        table = self.pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = self._writer_class(str(self.path), table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_writer(path, fmt=None, float_dtype=None):
+    """
+    Writer with ``write(frame)`` / ``close()`` that appends DataFrame chunks.
+    ``float_dtype`` (e.g. ``np.float32``) narrows float columns in the column
+    store; CSV and Parquet keep the frame's dtypes.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == "columns":
+        return ColumnStoreWriter(path, float_dtype=float_dtype)
+    if fmt == "parquet":
+        return _ParquetWriter(path)
+    return _CsvWriter(path)
+
+
+def write_frame(path, frame, fmt=None, float_dtype=None):
+    with open_writer(path, fmt, float_dtype) as writer:
+        writer.write(frame)
+
+
+def count_rows(path, fmt=None):
+    """Number of data rows."""
+    fmt = fmt or detect_format(path)
+    if fmt == "columns":
+        return ColumnStore(path).rows
+    if fmt == "parquet":
+        return _pyarrow()[1].ParquetFile(str(path)).metadata.num_rows
+    with open(path, "rb") as handle:
+        return max(sum(1 for _ in handle) - 1, 0)
+
+
+def read_frame(path, columns=None, start=0, stop=None, fmt=None):
+    """Rows [start, stop) of ``columns`` (all by default) as a DataFrame."""
+    fmt = fmt or detect_format(path)
+    if fmt == "columns":
+        return ColumnStore(path).frame(columns, start, stop)
+    if fmt == "parquet":
+        table = _pyarrow()[1].read_table(str(path), columns=columns, memory_map=True)
+        if start or stop is not None:
+            table = table.slice(start, (stop if stop is not None else table.num_rows) - start)
+        return table.to_pandas()
+    if not start and stop is None:
+        return pd.read_csv(path, usecols=columns)
+    return _read_csv_rows(path, columns, start, stop)
+
+
+_csv_indexes = {}
+
+
+def _csv_index(path):
+    """
+    (rows, offsets) of a CSV, where ``offsets`` holds the byte offset of every
+    ``CSV_INDEX_STRIDE``-th data row. Built with one pass over the lines and
+    cached until the file changes, so sharded reads seek instead of
+    re-parsing every row before their start.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    cached = _csv_indexes.get(key)
+    if cached is not None and cached[0] == (stat.st_size, stat.st_mtime_ns):
+        return cached[1]
+    offsets = []
+    rows = 0
+    with open(path, "rb") as handle:
+        position = len(handle.readline())
+        for rows, line in enumerate(handle, 1):
+            if (rows - 1) % CSV_INDEX_STRIDE == 0:
+                offsets.append(position)
+            position += len(line)
+    _csv_indexes[key] = ((stat.st_size, stat.st_mtime_ns), (rows, offsets))
+    return rows, offsets
+
+
+def _read_csv_rows(path, columns, start, stop):
+    """Rows [start, stop) of a CSV, seeking to the nearest indexed row."""
+    rows, offsets = _csv_index(path)
+    stop = rows if stop is None else min(stop, rows)
+    if start >= stop:
+        return pd.read_csv(path, usecols=columns, nrows=0)
+    names = pd.read_csv(path, nrows=0).columns
+    with open(path, "rb") as handle:
+        handle.seek(offsets[start // CSV_INDEX_STRIDE])
+        for _ in range(start % CSV_INDEX_STRIDE):
+            handle.readline()
+        return pd.read_csv(handle, header=None, names=names, usecols=columns, nrows=stop - start)
+
+
+def iter_frames(path, chunk_rows=DEFAULT_CHUNK_ROWS, columns=None, fmt=None, float_precision=None):
+    """
+    Yield the data ``chunk_rows`` rows at a time without loading it all.
+    ``float_precision="round_trip"`` parses CSV floats exactly (slower).
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == "columns":
+        store = ColumnStore(path)
+        for start in range(0, store.rows, chunk_rows):
+            yield store.frame(columns, start, start + chunk_rows)
+    elif fmt == "parquet":
+        for batch in _pyarrow()[1].ParquetFile(str(path)).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows, float_precision=float_precision)
+
+
+def read_features(path, label=LABEL, fmt=None):
+    """
+    The (N, 4) float32 feature matrix and the label column (None when
+    ``label`` is None or absent). For a float32 column store the matrix is a
+    read-only memmap, not a copy.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == "columns":
+        store = ColumnStore(path)
+        features = store.matrix(FEATURE_NAMES)
+        labels = store.column(label) if label in store.columns else None
+    else:
+        frame = read_frame(path, fmt=fmt)
+        features = frame[FEATURE_NAMES].to_numpy()
+        labels = frame[label].to_numpy() if label in frame.columns else None
+    return np.asarray(features, dtype=np.float32), labels
+
+
+def convert(source, destination, chunk_rows=DEFAULT_CHUNK_ROWS, float_dtype=None):
+    """Copy a table between formats chunk by chunk; returns the row count."""
+    rows = 0
+    with open_writer(destination, float_dtype=float_dtype) as writer:
+        for frame in iter_frames(source, chunk_rows):
+            writer.write(frame)
+            rows += len(frame)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert tables between CSV, Parquet and the column store.")
+    parser.add_argument("source", help="Input file (.csv, .parquet or .cols)")
+    parser.add_argument("destination", help="Output file (.csv, .parquet or .cols)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per chunk")
+    parser.add_argument("--float32", action="store_true", help="Store float columns as float32 in a .cols store")
+    args = parser.parse_args()
+
+    rows = convert(args.source, args.destination, args.chunk_rows, np.float32 if args.float32 else None)
+    print(f"Converted {rows} rows: {args.source} -> {args.destination}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Instrumentation for the prediction path, exposed in the Prometheus text
+format (version 0.0.4) without a client library.
+
+Collection is off unless ``DW_METRICS=1`` is set or ``enable()`` is called
+(the prediction server enables it). While disabled, ``stage()`` hands back a
+shared no-op context manager and ``observe_call()`` returns immediately, so
+instrumented code pays one attribute check per call.
+
+Recorded series:
+
+- ``dw_prediction_stage_seconds{stage}``: model lookup/load, ``DMatrix``
+  construction and ``predict`` (or the compiled forest) separately;
+- ``dw_prediction_seconds{function,backend}``: whole ``predict_weight`` /
+  ``predict_weights`` calls;
+- ``dw_prediction_batch_rows{function}``: rows per call.
+
+Other components add scrape-time collectors with ``register_collector`` (the
+server exposes the prediction cache and the batching coalescer this way).
+
+Sampling profiler hook: with ``DW_PROFILE_SAMPLE_RATE`` (e.g. ``0.01``) a
+fraction of prediction calls runs under one shared ``cProfile.Profile``;
+``profile_stats()`` formats it and ``dump_profile(path)`` writes a pstats
+file for snakeviz or ``python -m pstats``. For py-spy, attach to the running
+process (``py-spy record --pid <pid>``); each stage is its own function in
+``optimization.model``, so stages show up by name in the flame graph.
+"""
+import bisect
+import io
+import os
+import random
+import threading
+import time
+
+# Upper bounds (seconds) for latency histograms: 10 us .. 2.5 s.
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Upper bounds for rows-per-call histograms: powers of two up to 65536.
+BATCH_SIZE_BUCKETS = tuple(float(2 ** power) for power in range(17))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def format_value(value):
+    """A sample value or ``le`` bound as Prometheus writes it (``+Inf``, ``1``, ``0.25``)."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.labelnames), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """Record ``value``; label values are positional, in ``labelnames`` order."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for edge, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": format_value(edge)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class MetricsRegistry:
+    """Metrics plus scrape-time collectors, rendered together by ``render()``."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS, labelnames=()):
+        metric = Histogram(name, documentation, buckets, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """
+        Add ``collect()``, called on every scrape and returning metric families
+        as ``(name, type, documentation, [(sample_name, labels, value), ...])``.
+        """
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        families = [(metric.name, metric.type, metric.documentation, metric.samples()) for metric in self._metrics]
+        for collect in self._collectors:
+            families.extend(collect())
+        for name, metric_type, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+STAGE_SECONDS = registry.histogram(
+    "dw_prediction_stage_seconds", "Time spent in each stage of a prediction call.", labelnames=("stage",))
+PREDICTION_SECONDS = registry.histogram(
+    "dw_prediction_seconds", "Wall time of whole prediction calls.", labelnames=("function", "backend"))
+BATCH_ROWS = registry.histogram(
+    "dw_prediction_batch_rows", "Rows scored per prediction call.", BATCH_SIZE_BUCKETS, labelnames=("function",))
+
+enabled = os.environ.get("DW_METRICS", "0").lower() not in ("", "0", "false", "no")
+
+
+def enable(on=True):
+    """Turn collection on (or off) for this process."""
+    global enabled
+    enabled = on
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, self.stage)
+        return False
+
+
+def stage(name):
+    """Context manager timing one stage into ``dw_prediction_stage_seconds``."""
+    return _StageTimer(name) if enabled else _NULL_TIMER
+
+
+def observe_call(function, backend, rows, started):
+    """Record a finished prediction call that began at ``perf_counter()`` ``started``."""
+    if not enabled:
+        return
+    PREDICTION_SECONDS.observe(time.perf_counter() - started, function, backend)
+    BATCH_ROWS.observe(rows, function)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    return registry.render()
+
+
+# ---------- sampling profiler hook ----------
+profile_sample_rate = float(os.environ.get("DW_PROFILE_SAMPLE_RATE", "0"))
+_profiler = None
+_profiler_lock = threading.Lock()
+_profiled_calls = 0
+
+
+class _SampledProfile:
+    __slots__ = ("active",)
+
+    def __enter__(self):
+        global _profiled_calls, _profiler
+        # One profiled call at a time; concurrent calls are simply not sampled.
+        self.active = _profiler_lock.acquire(blocking=False)
+        if self.active:
+            if _profiler is None:
+                import cProfile
+
+                _profiler = cProfile.Profile()
+            _profiled_calls += 1
+            _profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.active:
+            _profiler.disable()
+            _profiler_lock.release()
+        return False
+
+
+def sampled_profile():
+    """Profile this call with probability ``profile_sample_rate``."""
+    if profile_sample_rate <= 0 or random.random() >= profile_sample_rate:
+        return _NULL_TIMER
+    return _SampledProfile()
+
+
+def set_profile_sample_rate(rate):
+    global profile_sample_rate
+    if not 0 <= rate <= 1:
+        raise ValueError("profile sample rate must be in [0, 1]")
+    profile_sample_rate = rate
+
+
+def profile_stats(sort="cumulative", limit=30):
+    """Text summary of the sampled profile (top ``limit`` functions)."""
+    import pstats
+
+    with _profiler_lock:
+        stream = io.StringIO()
+        stream.write(f"{_profiled_calls} sampled calls\n")
+        if _profiler is None:
+            return stream.getvalue()
+        pstats.Stats(_profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+
+def dump_profile(path):
+    """Write the sampled profile as a pstats file; False when nothing was sampled."""
+    with _profiler_lock:
+        if _profiler is None:
+            return False
+        _profiler.dump_stats(path)
+        return True
@@ -1,21 +1,288 @@
+"""
+Dimensional weight prediction.
+
+Importing this module is cheap: numpy and xgboost are imported on first use
+inside the prediction functions, so callers that only need metadata
+(``model_metadata``) or the volumetric fallback (``volumetric_weight``) never
+pay for them. Long-lived processes can call ``prewarm()`` at startup to move
+the import and model-load cost out of the first request.
+
+``predict_weight_cached`` memoizes single-item predictions on the quantized
+feature tuple (see ``optimization.cache``); the cache is sized with
+``DW_PREDICTION_CACHE_SIZE`` (0 disables it) and ``DW_PREDICTION_CACHE_TTL``.
+
+Prediction calls are instrumented through ``optimization.metrics`` (per-stage
+timers, call latency and rows-per-call histograms, sampled profiling); it is
+a no-op unless metrics are enabled. Every stage is a separate function
+(``_load_booster``, ``_build_dmatrix``, ``_booster_predict``,
+``_compiled_predict``) so it also shows up by name in profiles.
+
+Run as a script, the module scores many rows in one process (see ``main``):
+
+    python -m optimization.model < items.jsonl > predictions.jsonl
+    python -m optimization.model --format f32 < items.f32 > predictions.f32
+"""
+import argparse
+import json
+import os
+import sys
+import time
 from pathlib import Path
 
-import numpy as np
-import xgboost as xgb
+from optimization import metrics
+from optimization.cache import DEFAULT_MAX_SIZE, PredictionCache
+from optimization.registry import get_compiled_model, get_model, model_fingerprint
+
+MODEL_PATH = Path(__file__).resolve().parent / "dw_model.json"
+FEATURE_NAMES = ["L", "W", "H", "DF"]
+DEFAULT_CHUNK_SIZE = 65536
+
+# "xgboost" scores with the Booster; "numpy" uses the compiled pure-NumPy
+# forest from optimization/compiled.py, which gives identical predictions.
+BACKENDS = ("xgboost", "numpy")
+DEFAULT_BACKEND = os.environ.get("DW_PREDICT_BACKEND", "xgboost")
+
+# Same constant as the fallback in backend/ml-service.js.
+VOLUMETRIC_FACTOR = 0.001
+
+_cache_size = int(os.environ.get("DW_PREDICTION_CACHE_SIZE", DEFAULT_MAX_SIZE))
+_cache_ttl = float(os.environ.get("DW_PREDICTION_CACHE_TTL", "0")) or None
+prediction_cache = PredictionCache(max_size=_cache_size, ttl_seconds=_cache_ttl) if _cache_size > 0 else None
+
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown prediction backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+
+def volumetric_weight(features):
+    """
+    Volume-based weight estimate used when the model is unavailable:
+    ``L * W * H * DF * 0.001``. Needs no third-party imports.
+    """
+    length, width, height, density_factor = features
+    return length * width * height * density_factor * VOLUMETRIC_FACTOR
+
+
+def model_metadata(model_path=MODEL_PATH):
+    """
+    Describe the model file without loading xgboost or numpy: path, size,
+    modification time, feature names, tree count and base score.
+    """
+    path = Path(model_path)
+    if not path.exists():
+        return {"modelPath": str(path), "exists": False}
+
+    mtime_ns, size = model_fingerprint(path)
+    with open(path, "r", encoding="utf-8") as handle:
+        learner = json.load(handle)["learner"]
+    trees = learner["gradient_booster"]["model"]["gbtree_model_param"]["num_trees"]
+    return {
+        "modelPath": str(path),
+        "exists": True,
+        "lastModifiedNs": mtime_ns,
+        "size": size,
+        "featureNames": learner.get("feature_names") or FEATURE_NAMES,
+        "numTrees": int(trees),
+        "baseScore": learner["learner_model_param"]["base_score"],
+        "objective": learner["objective"]["name"],
+    }
+
+
+def prewarm(model_path=MODEL_PATH, backend=None):
+    """
+    Import the prediction dependencies, load the model into the registry and
+    run one throwaway prediction so the first real request is warm.
+    """
+    predict_weight([10.0, 10.0, 10.0, 0.85], model_path=model_path, backend=backend)
+
+
+def _load_booster(model_path):
+    with metrics.stage("load"):
+        return get_model(model_path)
+
 
+def _build_dmatrix(rows):
+    import xgboost as xgb
 
-def predict_weight(features):
+    with metrics.stage("dmatrix"):
+        return xgb.DMatrix(rows, feature_names=FEATURE_NAMES)
+
+
+def _booster_predict(model, dmatrix):
+    with metrics.stage("predict"):
+        return model.predict(dmatrix)
+
+
+def _compiled_predict(model_path, rows):
+    with metrics.stage("load"):
+        forest = get_compiled_model(model_path)
+    with metrics.stage("compiled_predict"):
+        return forest.predict(rows)
+
+
+def predict_weight(features, model_path=MODEL_PATH, backend=None):
     """
     Predict dimensional weight for a single feature vector using the trained
     model stored alongside this module.
+
+    The model is loaded once per process through the model registry and
+    reloaded only when the model file changes on disk.
     """
-    model_path = Path(__file__).resolve().parent / "dw_model.json"
+    import numpy as np
+
+    backend = backend or DEFAULT_BACKEND
+    _check_backend(backend)
+    started = time.perf_counter()
+
+    with metrics.sampled_profile():
+        if backend == "numpy":
+            prediction = _compiled_predict(model_path, np.array([features], dtype=np.float32))[0]
+        else:
+            model = _load_booster(model_path)
+            prediction = _booster_predict(model, _build_dmatrix(np.array([features], dtype=float)))[0]
+
+    metrics.observe_call("predict_weight", backend, 1, started)
+    return prediction
+
+
+def predict_weight_cached(features, model_path=MODEL_PATH, backend=None, cache=None):
+    """
+    ``predict_weight`` behind the quantized prediction cache. Repeat scans of
+    the same footprint return the memoized value without touching the model;
+    a retrained model file invalidates the cache on the next call.
+    """
+    cache = prediction_cache if cache is None else cache
+    if cache is None:
+        return float(predict_weight(features, model_path=model_path, backend=backend))
+
+    fingerprint = model_fingerprint(model_path)
+    cached = cache.get(model_path, features, fingerprint)
+    if cached is not None:
+        return cached
+
+    prediction = float(predict_weight(features, model_path=model_path, backend=backend))
+    cache.put(model_path, features, fingerprint, prediction)
+    return prediction
+
+
+def as_feature_matrix(features):
+    """
+    Coerce a batch of feature rows into a 2-D float32 array with one column
+    per entry of ``FEATURE_NAMES``. DataFrames are matched by column name, so
+    extra columns such as ``id`` or ``optimal_weight`` are ignored.
+    """
+    import numpy as np
+
+    if hasattr(features, "columns"):
+        missing = [name for name in FEATURE_NAMES if name not in features.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+        features = features[FEATURE_NAMES].to_numpy()
+
+    matrix = np.asarray(features, dtype=np.float32)
+    if matrix.ndim == 1 and matrix.size == len(FEATURE_NAMES):
+        matrix = matrix.reshape(1, -1)
+    if matrix.ndim != 2 or matrix.shape[1] != len(FEATURE_NAMES):
+        raise ValueError(
+            f"Expected an (N, {len(FEATURE_NAMES)}) feature array, got shape {matrix.shape}"
+        )
+    return matrix
+
+
+def predict_weights(features, model_path=MODEL_PATH, chunk_size=DEFAULT_CHUNK_SIZE, backend=None):
+    """
+    Predict dimensional weight for a batch of items.
+
+    ``features`` is an (N, 4) array-like or a DataFrame with ``L``, ``W``,
+    ``H`` and ``DF`` columns. Rows are scored ``chunk_size`` at a time so the
+    intermediate ``DMatrix`` stays bounded regardless of N. Returns a 1-D
+    float32 array of length N.
+    """
+    import numpy as np
+
+    backend = backend or DEFAULT_BACKEND
+    _check_backend(backend)
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    started = time.perf_counter()
+    matrix = as_feature_matrix(features)
+    predictions = np.empty(matrix.shape[0], dtype=np.float32)
+    if matrix.shape[0] == 0:
+        return predictions
+
+    with metrics.sampled_profile():
+        if backend == "numpy":
+            for start in range(0, matrix.shape[0], chunk_size):
+                stop = start + chunk_size
+                predictions[start:stop] = _compiled_predict(model_path, matrix[start:stop])
+        else:
+            model = _load_booster(model_path)
+            for start in range(0, matrix.shape[0], chunk_size):
+                stop = start + chunk_size
+                predictions[start:stop] = _booster_predict(model, _build_dmatrix(matrix[start:stop]))
+
+    metrics.observe_call("predict_weights", backend, matrix.shape[0], started)
+    return predictions
+
+
+def read_feature_rows(stream, input_format="jsonl"):
+    """
+    Read feature rows from a binary stream. ``jsonl`` expects one JSON array
+    of four numbers per line (blank lines are skipped); ``f32`` expects a
+    packed little-endian float32 buffer of N * 4 values.
+    """
+    import numpy as np
+
+    if input_format == "f32":
+        buffer = stream.read()
+        if len(buffer) % (4 * len(FEATURE_NAMES)):
+            raise ValueError(f"f32 input must hold a multiple of {len(FEATURE_NAMES)} float32 values")
+        return np.frombuffer(buffer, dtype="<f4").reshape(-1, len(FEATURE_NAMES))
+
+    rows = []
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError as error:
+            raise ValueError(f"line {line_number}: {error}") from None
+    if not rows:
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32)
+    return as_feature_matrix(rows)
+
+
+def write_predictions(stream, predictions, output_format="jsonl"):
+    """Write predictions in one call: one JSON number per line, or packed float32."""
+    import numpy as np
+
+    if output_format == "f32":
+        stream.write(np.asarray(predictions, dtype="<f4").tobytes())
+    else:
+        stream.write("".join(f"{value}\n" for value in predictions.tolist()).encode("ascii"))
+    stream.flush()
+
+
+def main():
+    """Score feature rows from stdin and write all predictions to stdout."""
+    parser = argparse.ArgumentParser(description="Bulk dimensional weight prediction over stdin/stdout.")
+    parser.add_argument("--format", choices=("jsonl", "f32"), default="jsonl",
+                        help="Input format; predictions are written in the same format")
+    parser.add_argument("--model", default=str(MODEL_PATH), help="Path to the trained model JSON")
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="Prediction backend")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per DMatrix")
+    args = parser.parse_args()
+
+    try:
+        matrix = read_feature_rows(sys.stdin.buffer, args.format)
+    except ValueError as error:
+        parser.exit(2, f"{parser.prog}: invalid input: {error}\n")
+
+    predictions = predict_weights(matrix, model_path=args.model, chunk_size=args.chunk_size, backend=args.backend)
+    write_predictions(sys.stdout.buffer, predictions, args.format)
 
-    model = xgb.Booster()
-    model.load_model(str(model_path))
 
-    dmatrix = xgb.DMatrix(
-        np.array([features], dtype=float),
-        feature_names=["L", "W", "H", "DF"],
-    )
-    return model.predict(dmatrix)[0]
+if __name__ == "__main__":
+    main()
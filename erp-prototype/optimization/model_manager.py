@@ -0,0 +1,399 @@
+"""
+Zero-downtime model swaps for the prediction service.
+
+``ModelManager`` owns the model that serves requests. New models are loaded
+on a background thread as a *candidate* while the current version keeps
+serving; promotion and rollback are a single reference assignment, so no
+request waits for a load and every request runs start to finish on one
+version. The version that was replaced stays loaded, which makes
+``rollback()`` instant.
+
+Loading reads the model file once into memory and only accepts the snapshot
+if the file's fingerprint is the same before and after the read, so a file
+that is being rewritten in place is retried instead of parsed half-written
+(``train.py`` already swaps files in atomically). The snapshot is parsed,
+checked against ``FEATURE_NAMES`` and scored on probe rows before it can
+become a candidate.
+
+Shadow scoring: with ``shadow_sample_rate`` > 0, that fraction of requests is
+also scored by the candidate on a background thread (never on the request
+path; samples are dropped when the shadow queue is full) and the absolute
+prediction differences and both latencies are accumulated in
+``ShadowStats``. With ``auto_promote`` the candidate is promoted once it has
+``min_shadow_samples`` comparisons without errors and, if
+``max_mean_abs_diff`` is set, a mean absolute difference within it;
+otherwise promotion is manual.
+
+``watch(interval)`` polls the model file and loads a candidate when it
+changes, replacing the per-call file check of ``optimization.registry``.
+"""
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from optimization import metrics
+from optimization.model import BACKENDS, DEFAULT_BACKEND, FEATURE_NAMES, MODEL_PATH, as_feature_matrix
+from optimization.registry import model_fingerprint
+
+SNAPSHOT_RETRIES = 5
+SNAPSHOT_RETRY_DELAY = 0.05
+DEFAULT_MIN_SHADOW_SAMPLES = 200
+DEFAULT_MAX_PENDING_SHADOW = 64
+# Rows every new model must score to finite values before it can serve.
+PROBE_ROWS = np.array([[10.0, 10.0, 10.0, 0.85], [30.0, 20.0, 15.0, 1.0], [5.0, 5.0, 5.0, 0.5]],
+                      dtype=np.float32)
+
+
+def read_snapshot(model_path, retries=SNAPSHOT_RETRIES, delay=SNAPSHOT_RETRY_DELAY):
+    """
+    Read the model file into memory; returns ``(raw_bytes, fingerprint)``.
+    Raises ``RuntimeError`` if the file kept changing during every attempt.
+    """
+    for _ in range(retries):
+        before = model_fingerprint(model_path)
+        with open(model_path, "rb") as handle:
+            raw = handle.read()
+        if model_fingerprint(model_path) == before and len(raw) == before[1]:
+            return raw, before
+        time.sleep(delay)
+    raise RuntimeError(f"{model_path} kept changing while it was being read")
+
+
+class ModelVersion:
+    """One loaded model: immutable once built, safe to share between threads."""
+
+    __slots__ = ("number", "path", "fingerprint", "backend", "model", "loaded_at", "load_seconds")
+
+    def __init__(self, number, path, fingerprint, backend, model, load_seconds):
+        self.number = number
+        self.path = str(path)
+        self.fingerprint = fingerprint
+        self.backend = backend
+        self.model = model
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+
+    def predict(self, matrix):
+        """Score an (N, 4) float32 array."""
+        if self.backend == "numpy":
+            with metrics.stage("compiled_predict"):
+                return self.model.predict(matrix)
+
+        import xgboost as xgb
+
+        with metrics.stage("dmatrix"):
+            dmatrix = xgb.DMatrix(matrix, feature_names=FEATURE_NAMES)
+        with metrics.stage("predict"):
+            return self.model.predict(dmatrix)
+
+    def describe(self):
+        return {
+            "version": self.number,
+            "path": self.path,
+            "fingerprint": list(self.fingerprint),
+            "backend": self.backend,
+            "loadedAt": self.loaded_at,
+            "loadSeconds": self.load_seconds,
+        }
+
+
+def load_version(model_path, backend, number):
+    """Snapshot, parse and probe ``model_path``; returns a ``ModelVersion``."""
+    started = time.perf_counter()
+    raw, fingerprint = read_snapshot(model_path)
+    learner = json.loads(raw)["learner"]
+    feature_names = learner.get("feature_names") or FEATURE_NAMES
+    if list(feature_names) != FEATURE_NAMES:
+        raise ValueError(f"model features {feature_names} do not match {FEATURE_NAMES}")
+
+    if backend == "numpy":
+        from optimization.compiled import CompiledForest
+
+        model = CompiledForest.from_learner(learner)
+    else:
+        import xgboost as xgb
+
+        model = xgb.Booster()
+        model.load_model(bytearray(raw))
+
+    version = ModelVersion(number, model_path, fingerprint, backend, model, 0.0)
+    if not np.isfinite(version.predict(PROBE_ROWS)).all():
+        raise ValueError(f"{model_path} produced non-finite predictions on the probe rows")
+    version.load_seconds = time.perf_counter() - started
+    return version
+
+
+class ShadowStats:
+    """Candidate-vs-serving comparison accumulated from shadow-scored requests."""
+
+    def __init__(self):
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.dropped = 0
+        self.abs_diff_sum = 0.0
+        self.abs_diff_max = 0.0
+        self.serving_seconds = 0.0
+        self.candidate_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, serving, candidate, serving_seconds, candidate_seconds):
+        diff = np.abs(np.asarray(candidate, dtype=np.float64) - np.asarray(serving, dtype=np.float64))
+        with self._lock:
+            self.requests += 1
+            self.rows += diff.size
+            self.abs_diff_sum += float(diff.sum())
+            self.abs_diff_max = max(self.abs_diff_max, float(diff.max()))
+            self.serving_seconds += serving_seconds
+            self.candidate_seconds += candidate_seconds
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_dropped(self):
+        with self._lock:
+            self.dropped += 1
+
+    @property
+    def mean_abs_diff(self):
+        return self.abs_diff_sum / self.rows if self.rows else 0.0
+
+    def snapshot(self):
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "meanAbsDiff": self.mean_abs_diff,
+            "maxAbsDiff": self.abs_diff_max,
+            "servingMeanSeconds": self.serving_seconds / self.requests if self.requests else 0.0,
+            "candidateMeanSeconds": self.candidate_seconds / self.requests if self.requests else 0.0,
+        }
+
+
+class ModelManager:
+    """
+    Serving model plus an optional candidate and the previous version.
+
+    Readers take ``self.active`` once per request; writers (load, promote,
+    rollback) hold ``self._lock`` only long enough to reassign references.
+    ``generation`` is bumped after every change of ``active``, so a reader
+    that sees the same generation before and after scoring knows the version
+    it read beforehand is the one that scored.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, backend=None, shadow_sample_rate=0.0, auto_promote=True,
+                 min_shadow_samples=DEFAULT_MIN_SHADOW_SAMPLES, max_mean_abs_diff=None,
+                 max_pending_shadow=DEFAULT_MAX_PENDING_SHADOW):
+        self.model_path = model_path
+        self.backend = backend or DEFAULT_BACKEND
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown prediction backend {self.backend!r}; expected one of {', '.join(BACKENDS)}")
+        if not 0 <= shadow_sample_rate <= 1:
+            raise ValueError("shadow_sample_rate must be in [0, 1]")
+        self.shadow_sample_rate = shadow_sample_rate
+        self.auto_promote = auto_promote
+        self.min_shadow_samples = min_shadow_samples
+        self.max_mean_abs_diff = max_mean_abs_diff
+        self.max_pending_shadow = max_pending_shadow
+
+        self.active = None
+        self.candidate = None
+        self.previous = None
+        self.generation = 0
+        self.shadow = ShadowStats()
+        self.swaps = {"promote": 0, "rollback": 0}
+        self.load_errors = 0
+        self.last_error = None
+        self._failed_fingerprint = None
+
+        self._versions = 0
+        self._lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-load")
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-shadow")
+        self._pending_shadow = 0
+        self._loading = None
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def _next_number(self):
+        with self._lock:
+            self._versions += 1
+            return self._versions
+
+    def start(self):
+        """Load the serving model synchronously (call before taking traffic)."""
+        version = load_version(self.model_path, self.backend, self._next_number())
+        with self._lock:
+            self.active = version
+            self.generation += 1
+        return version
+
+    # ---------- loading and swapping ----------
+    def load_candidate(self, model_path=None):
+        """
+        Load ``model_path`` (default: the managed path) in the background.
+        Returns a future resolving to the candidate ``ModelVersion``; a load
+        already in flight is returned instead of starting another.
+        """
+        with self._lock:
+            if self._loading is not None and not self._loading.done():
+                return self._loading
+            self._loading = self._loader.submit(self._load_candidate, model_path or self.model_path)
+            return self._loading
+
+    def _load_candidate(self, model_path):
+        try:
+            version = load_version(model_path, self.backend, self._next_number())
+        except Exception as error:
+            with self._lock:
+                self.load_errors += 1
+                self.last_error = f"{type(error).__name__}: {error}"
+                try:
+                    self._failed_fingerprint = model_fingerprint(model_path)
+                except OSError:
+                    self._failed_fingerprint = None
+            raise
+        with self._lock:
+            self.candidate = version
+            self.shadow = ShadowStats()
+        if self.auto_promote and self.shadow_sample_rate == 0:
+            self.promote()
+        return version
+
+    def promote(self):
+        """Make the candidate the serving model; returns it, or None without one."""
+        with self._lock:
+            if self.candidate is None:
+                return None
+            self.previous, self.active, self.candidate = self.active, self.candidate, None
+            self.generation += 1
+            self.swaps["promote"] += 1
+            return self.active
+
+    def rollback(self):
+        """Swap the previous version back in; returns it, or None without one."""
+        with self._lock:
+            if self.previous is None:
+                return None
+            self.active, self.previous = self.previous, self.active
+            self.generation += 1
+            self.swaps["rollback"] += 1
+            return self.active
+
+    def discard_candidate(self):
+        with self._lock:
+            candidate, self.candidate = self.candidate, None
+            return candidate
+
+    # ---------- serving ----------
+    def predict(self, features):
+        """Score a batch on the serving version; returns a float32 array."""
+        started = time.perf_counter()
+        version = self.active
+        matrix = as_feature_matrix(features)
+        with metrics.sampled_profile():
+            predictions = version.predict(matrix)
+        elapsed = time.perf_counter() - started
+        metrics.observe_call("ModelManager.predict", version.backend, matrix.shape[0], started)
+
+        candidate = self.candidate
+        if candidate is not None and self.shadow_sample_rate > 0 and random.random() < self.shadow_sample_rate:
+            self._submit_shadow(candidate, matrix, predictions, elapsed)
+        return predictions
+
+    def _submit_shadow(self, candidate, matrix, predictions, serving_seconds):
+        with self._lock:
+            if self._pending_shadow >= self.max_pending_shadow:
+                self.shadow.record_dropped()
+                return
+            self._pending_shadow += 1
+        self._shadow_executor.submit(self._score_shadow, candidate, matrix, predictions, serving_seconds)
+
+    def _score_shadow(self, candidate, matrix, predictions, serving_seconds):
+        try:
+            started = time.perf_counter()
+            try:
+                shadow_predictions = candidate.predict(matrix)
+            except Exception:
+                self.shadow.record_error()
+                return
+            if candidate is not self.candidate:
+                return
+            self.shadow.record(predictions, shadow_predictions, serving_seconds, time.perf_counter() - started)
+            if self.auto_promote and self._shadow_passed():
+                with self._lock:
+                    ready = self.candidate is candidate
+                if ready:
+                    self.promote()
+        finally:
+            with self._lock:
+                self._pending_shadow -= 1
+
+    def _shadow_passed(self):
+        shadow = self.shadow
+        if shadow.errors or shadow.requests < self.min_shadow_samples:
+            return False
+        return self.max_mean_abs_diff is None or shadow.mean_abs_diff <= self.max_mean_abs_diff
+
+    # ---------- file watching ----------
+    def check_for_update(self):
+        """
+        Start loading the model file if it is not a version already held
+        (serving, candidate or previous, so a rollback is not undone) and did
+        not fail to load before.
+        """
+        try:
+            fingerprint = model_fingerprint(self.model_path)
+        except FileNotFoundError:
+            return None
+        versions = (self.active, self.candidate, self.previous)
+        known = {version.fingerprint for version in versions if version is not None}
+        if fingerprint in known or fingerprint == self._failed_fingerprint:
+            return None
+        return self.load_candidate()
+
+    def watch(self, interval=2.0):
+        """Poll the model file every ``interval`` seconds on a daemon thread."""
+        if self._watcher is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                self.check_for_update()
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=run, name="model-watch", daemon=True)
+        self._watcher.start()
+
+    def close(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._loader.shutdown(wait=True)
+        self._shadow_executor.shutdown(wait=True)
+
+    def status(self):
+        def describe(version):
+            return version.describe() if version is not None else None
+
+        loading = self._loading is not None and not self._loading.done()
+        return {
+            "active": describe(self.active),
+            "candidate": describe(self.candidate),
+            "previous": describe(self.previous),
+            "generation": self.generation,
+            "loading": loading,
+            "shadowSampleRate": self.shadow_sample_rate,
+            "autoPromote": self.auto_promote,
+            "shadow": self.shadow.snapshot(),
+            "swaps": dict(self.swaps),
+            "loadErrors": self.load_errors,
+            "lastError": self.last_error,
+        }
@@ -0,0 +1,96 @@
+import os
+import threading
+
+
+def model_fingerprint(model_path):
+    """
+    Return a cheap identity for a model file: its modification time in
+    nanoseconds and its size in bytes. A retrain that rewrites the file
+    changes the fingerprint, which is what triggers a reload.
+    """
+    stat = os.stat(model_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_booster(model_path):
+    """Load an XGBoost booster from ``model_path``."""
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(str(model_path))
+    return booster
+
+
+def load_compiled(model_path):
+    """Compile ``model_path`` into a pure-NumPy ``CompiledForest``."""
+    from optimization.compiled import CompiledForest
+
+    return CompiledForest.from_json(model_path)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models.
+
+    Each model file is parsed once with ``loader`` and kept in memory keyed by
+    its absolute path. On every lookup the file's fingerprint is compared with
+    the one recorded at load time, so a model rewritten by ``train.py`` is
+    picked up on the next call without restarting the process.
+    """
+
+    def __init__(self, loader=load_booster):
+        self.loader = loader
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_path):
+        """Return the model for ``model_path``, loading it if needed."""
+        path = os.path.abspath(model_path)
+        fingerprint = model_fingerprint(path)
+
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == fingerprint:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == fingerprint:
+                return entry[1]
+
+            model = self.loader(path)
+            self._entries[path] = (fingerprint, model)
+            return model
+
+    def invalidate(self, model_path=None):
+        """
+        Drop the cached model for ``model_path``, or every cached model when
+        no path is given.
+        """
+        with self._lock:
+            if model_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(model_path), None)
+
+    def __contains__(self, model_path):
+        return os.path.abspath(model_path) in self._entries
+
+
+default_registry = ModelRegistry()
+compiled_registry = ModelRegistry(loader=load_compiled)
+
+
+def get_model(model_path):
+    """Return the cached booster for ``model_path`` from the default registry."""
+    return default_registry.get(model_path)
+
+
+def get_compiled_model(model_path):
+    """Return the cached pure-NumPy ``CompiledForest`` for ``model_path``."""
+    return compiled_registry.get(model_path)
+
+
+def invalidate(model_path=None):
+    """Invalidate entries in the booster and compiled-model registries."""
+    default_registry.invalidate(model_path)
+    compiled_registry.invalidate(model_path)
@@ -0,0 +1,388 @@
+"""
+Long-lived prediction service used by the Node.js backend.
+
+The service keeps the XGBoost booster warm in a ``ModelManager`` (see
+``optimization.model_manager``) so each request only pays for the prediction
+itself. A retrained model file is loaded in the background and swapped in
+without stalling requests; it can first be shadow-scored against the serving
+model, and the previous version stays loaded for instant rollback
+(``/model/versions``, ``/model/candidate``, ``/model/promote``,
+``/model/rollback``). Concurrent single-item requests are coalesced into
+vectorized batches (see ``optimization.batching``). Run it from
+``erp-prototype/``:
+
+    python -m optimization.server --port 8001
+    python -m optimization.server --uds /tmp/dw-predict.sock
+    python -m optimization.server --batch-window-ms 0   # disable coalescing
+    python -m optimization.server --profile-sample-rate 0.01
+    python -m optimization.server --shadow-sample-rate 0.1 --no-auto-promote
+
+``GET /metrics`` serves Prometheus text: the per-stage and per-call series
+from ``optimization.metrics`` plus the prediction cache and the coalescer.
+Collection is on by default here (``--no-metrics`` turns it off).
+``GET /debug/profile`` prints the sampled cProfile statistics.
+"""
+import argparse
+import bisect
+import os
+import pstats
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel, Field
+
+from optimization import metrics
+from optimization.batching import DELAY_BUCKETS_MS, PredictionCoalescer
+from optimization.model import FEATURE_NAMES, MODEL_PATH, model_metadata, prediction_cache
+from optimization.model_manager import ModelManager
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8001
+DEFAULT_BATCH_WINDOW_MS = float(os.environ.get("DW_BATCH_WINDOW_MS", "2"))
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get("DW_MAX_BATCH_SIZE", "64"))
+DEFAULT_WATCH_INTERVAL = float(os.environ.get("DW_MODEL_WATCH_INTERVAL", "2"))
+DEFAULT_SHADOW_SAMPLE_RATE = float(os.environ.get("DW_SHADOW_SAMPLE_RATE", "0"))
+PROFILE_SORT_KEYS = frozenset(key.value for key in pstats.SortKey)
+
+REQUESTS = metrics.registry.counter(
+    "dw_server_requests_total", "Prediction requests received, by endpoint.", labelnames=("endpoint",))
+
+
+class PredictRequest(BaseModel):
+    features: List[float] = Field(..., min_length=4, max_length=4)
+
+
+class BatchPredictRequest(BaseModel):
+    items: List[List[float]]
+
+
+class CandidateRequest(BaseModel):
+    path: Optional[str] = None
+    wait: bool = True
+
+
+def _validate_rows(rows):
+    try:
+        matrix = np.asarray(rows, dtype=float)
+    except ValueError:
+        matrix = None
+    if matrix is None or matrix.ndim != 2 or matrix.shape[1] != len(FEATURE_NAMES):
+        raise HTTPException(
+            status_code=422,
+            detail=f"each item must have {len(FEATURE_NAMES)} features ({', '.join(FEATURE_NAMES)})",
+        )
+    if not np.isfinite(matrix).all():
+        raise HTTPException(status_code=422, detail="features must be finite numbers")
+    return matrix
+
+
+def _cumulative(buckets, counts):
+    """Prometheus bucket samples from per-bucket counts (last entry is +Inf)."""
+    total = 0
+    for edge, count in zip(tuple(buckets) + (float("inf"),), counts):
+        total += count
+        yield edge, total
+
+
+def _cache_families():
+    if prediction_cache is None:
+        return []
+    stats = prediction_cache.stats()
+    return [
+        ("dw_prediction_cache_lookups_total", "counter", "Prediction cache lookups, by result.", [
+            ("dw_prediction_cache_lookups_total", {"result": "hit"}, stats["hits"]),
+            ("dw_prediction_cache_lookups_total", {"result": "miss"}, stats["misses"]),
+        ]),
+        ("dw_prediction_cache_removals_total", "counter", "Prediction cache entries dropped, by reason.", [
+            ("dw_prediction_cache_removals_total", {"reason": "evicted"}, stats["evictions"]),
+            ("dw_prediction_cache_removals_total", {"reason": "expired"}, stats["expirations"]),
+            ("dw_prediction_cache_removals_total", {"reason": "invalidated"}, stats["invalidations"]),
+        ]),
+        ("dw_prediction_cache_entries", "gauge", "Entries currently in the prediction cache.", [
+            ("dw_prediction_cache_entries", {}, stats["size"]),
+        ]),
+    ]
+
+
+def _coalescer_families():
+    coalescer = app.state.coalescer
+    if coalescer is None:
+        return []
+    recorded = coalescer.metrics
+    size_counts = [0] * (len(metrics.BATCH_SIZE_BUCKETS) + 1)
+    for size, count in recorded.batch_sizes.items():
+        size_counts[bisect.bisect_left(metrics.BATCH_SIZE_BUCKETS, size)] += count
+    items = sum(size * count for size, count in recorded.batch_sizes.items())
+    batch_samples = [("dw_coalescer_batch_size_bucket", {"le": metrics.format_value(edge)}, total)
+                     for edge, total in _cumulative(metrics.BATCH_SIZE_BUCKETS, size_counts)]
+    batch_samples += [
+        ("dw_coalescer_batch_size_sum", {}, items),
+        ("dw_coalescer_batch_size_count", {}, sum(recorded.batch_sizes.values())),
+    ]
+    delay_samples = [("dw_coalescer_queue_delay_seconds_bucket", {"le": metrics.format_value(edge / 1000)}, total)
+                     for edge, total in _cumulative(DELAY_BUCKETS_MS, recorded.delay_bucket_counts)]
+    delay_samples += [
+        ("dw_coalescer_queue_delay_seconds_sum", {}, recorded.delay_sum_ms / 1000),
+        ("dw_coalescer_queue_delay_seconds_count", {}, recorded.delay_count),
+    ]
+    return [
+        ("dw_coalescer_batch_size", "histogram", "Requests per coalesced batch.", batch_samples),
+        ("dw_coalescer_queue_delay_seconds", "histogram", "Time a request waited for its batch.", delay_samples),
+    ]
+
+
+def _model_families():
+    models = app.state.models
+    if models is None or models.active is None:
+        return []
+    shadow = models.shadow
+    return [
+        ("dw_model_version", "gauge", "Number of the serving model version.", [
+            ("dw_model_version", {}, models.active.number),
+        ]),
+        ("dw_model_swaps_total", "counter", "Model promotions and rollbacks.", [
+            ("dw_model_swaps_total", {"action": action}, count) for action, count in sorted(models.swaps.items())
+        ]),
+        ("dw_model_load_errors_total", "counter", "Candidate models that failed to load.", [
+            ("dw_model_load_errors_total", {}, models.load_errors),
+        ]),
+        ("dw_shadow_requests_total", "counter", "Requests shadow-scored by the candidate, by outcome.", [
+            ("dw_shadow_requests_total", {"outcome": "compared"}, shadow.requests),
+            ("dw_shadow_requests_total", {"outcome": "error"}, shadow.errors),
+            ("dw_shadow_requests_total", {"outcome": "dropped"}, shadow.dropped),
+        ]),
+        ("dw_shadow_mean_abs_diff", "gauge", "Mean |candidate - serving| prediction difference.", [
+            ("dw_shadow_mean_abs_diff", {}, shadow.mean_abs_diff),
+        ]),
+    ]
+
+
+metrics.registry.register_collector(_cache_families)
+metrics.registry.register_collector(_coalescer_families)
+metrics.registry.register_collector(_model_families)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the booster before accepting traffic so the first request is warm.
+    models = ModelManager(
+        MODEL_PATH,
+        shadow_sample_rate=app.state.shadow_sample_rate,
+        auto_promote=app.state.auto_promote,
+    )
+    models.start()
+    if app.state.watch_interval > 0:
+        models.watch(app.state.watch_interval)
+    app.state.models = models
+    if app.state.batch_window_ms > 0:
+        app.state.coalescer = PredictionCoalescer(
+            predict_batch=models.predict,
+            max_batch_size=app.state.max_batch_size,
+            max_wait_ms=app.state.batch_window_ms,
+        )
+        await app.state.coalescer.start()
+    yield
+    if app.state.coalescer is not None:
+        await app.state.coalescer.close()
+        app.state.coalescer = None
+    models.close()
+    app.state.models = None
+
+
+app = FastAPI(title="Dimensional weight prediction service", lifespan=lifespan)
+app.state.batch_window_ms = DEFAULT_BATCH_WINDOW_MS
+app.state.max_batch_size = DEFAULT_MAX_BATCH_SIZE
+app.state.watch_interval = DEFAULT_WATCH_INTERVAL
+app.state.shadow_sample_rate = DEFAULT_SHADOW_SAMPLE_RATE
+app.state.auto_promote = True
+app.state.coalescer = None
+app.state.models = None
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "modelExists": MODEL_PATH.exists()}
+
+
+@app.get("/model/info")
+def model_info():
+    metadata = model_metadata(MODEL_PATH)
+    if not metadata["exists"]:
+        raise HTTPException(status_code=404, detail="model file not found")
+    return metadata
+
+
+@app.get("/model/versions")
+def model_versions():
+    return app.state.models.status()
+
+
+@app.post("/model/candidate")
+def load_candidate(request: CandidateRequest):
+    """Load a candidate (default: the serving model path) in the background."""
+    future = app.state.models.load_candidate(request.path)
+    if request.wait:
+        try:
+            future.result()
+        except Exception as error:
+            raise HTTPException(status_code=422, detail=f"candidate failed to load: {error}")
+    return app.state.models.status()
+
+
+@app.delete("/model/candidate")
+def discard_candidate():
+    if app.state.models.discard_candidate() is None:
+        raise HTTPException(status_code=404, detail="no candidate model loaded")
+    return app.state.models.status()
+
+
+@app.post("/model/promote")
+def promote_candidate():
+    if app.state.models.promote() is None:
+        raise HTTPException(status_code=409, detail="no candidate model to promote")
+    return app.state.models.status()
+
+
+@app.post("/model/rollback")
+def rollback_model():
+    if app.state.models.rollback() is None:
+        raise HTTPException(status_code=409, detail="no previous model to roll back to")
+    return app.state.models.status()
+
+
+@app.get("/batching/stats")
+def batching_stats():
+    coalescer = app.state.coalescer
+    if coalescer is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "maxBatchSize": coalescer.max_batch_size,
+        "maxWaitMs": coalescer.max_wait_ms,
+        **coalescer.metrics.snapshot(),
+    }
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+def debug_profile(sort: str = "cumulative", limit: int = 30):
+    if metrics.profile_sample_rate <= 0:
+        raise HTTPException(status_code=404, detail="profiling is off (start with --profile-sample-rate)")
+    if sort not in PROFILE_SORT_KEYS:
+        raise HTTPException(status_code=422, detail=f"sort must be one of {sorted(PROFILE_SORT_KEYS)}")
+    return metrics.profile_stats(sort, limit)
+
+
+@app.post("/predict")
+async def predict(request: PredictRequest):
+    if metrics.enabled:
+        REQUESTS.inc(endpoint="predict")
+    features = _validate_rows([request.features])[0]
+    models = app.state.models
+    # The serving version's fingerprint keys the cache, so a swap or rollback
+    # invalidates it. Read the generation first: if it is unchanged once the
+    # prediction is back, the version read here is the one that scored it.
+    generation = models.generation
+    fingerprint = models.active.fingerprint
+    if prediction_cache is not None:
+        cached = prediction_cache.get(MODEL_PATH, features, fingerprint)
+        if cached is not None:
+            return {"prediction": cached}
+
+    coalescer = app.state.coalescer
+    if coalescer is None:
+        prediction = float((await run_in_threadpool(models.predict, features[np.newaxis, :]))[0])
+    else:
+        prediction = await coalescer.predict(features)
+    if prediction_cache is not None and models.generation == generation:
+        prediction_cache.put(MODEL_PATH, features, fingerprint, prediction)
+    return {"prediction": prediction}
+
+
+@app.post("/predict/batch")
+def predict_batch(request: BatchPredictRequest):
+    if metrics.enabled:
+        REQUESTS.inc(endpoint="predict_batch")
+    if not request.items:
+        return {"predictions": []}
+    matrix = _validate_rows(request.items)
+    return {"predictions": app.state.models.predict(matrix).tolist()}
+
+
+def main() -> None:
+    """Serve the prediction API over TCP or a Unix domain socket."""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the dimensional weight prediction service.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind when serving over TCP")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on")
+    parser.add_argument("--uds", default=None, help="Serve on this Unix domain socket instead of TCP")
+    parser.add_argument(
+        "--batch-window-ms",
+        type=float,
+        default=DEFAULT_BATCH_WINDOW_MS,
+        help="Coalescing window for single-item predictions (0 disables batching)",
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=DEFAULT_MAX_BATCH_SIZE,
+        help="Flush a coalesced batch once it reaches this many requests",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=DEFAULT_WATCH_INTERVAL,
+        help="Seconds between checks of the model file for a retrained model (0 disables)",
+    )
+    parser.add_argument(
+        "--shadow-sample-rate",
+        type=float,
+        default=DEFAULT_SHADOW_SAMPLE_RATE,
+        help="Fraction of requests also scored by a candidate model before promotion",
+    )
+    parser.add_argument(
+        "--no-auto-promote",
+        action="store_true",
+        help="Keep loaded candidates until POST /model/promote",
+    )
+    parser.add_argument("--no-metrics", action="store_true", help="Do not collect prediction metrics")
+    parser.add_argument(
+        "--profile-sample-rate",
+        type=float,
+        default=metrics.profile_sample_rate,
+        help="Fraction of prediction calls run under cProfile (see /debug/profile)",
+    )
+    args = parser.parse_args()
+
+    metrics.enable(not args.no_metrics)
+    metrics.set_profile_sample_rate(args.profile_sample_rate)
+    app.state.batch_window_ms = args.batch_window_ms
+    app.state.max_batch_size = args.max_batch_size
+    app.state.watch_interval = args.watch_interval
+    app.state.shadow_sample_rate = args.shadow_sample_rate
+    app.state.auto_promote = not args.no_auto_promote
+
+    if args.uds:
+        uvicorn.run(app, uds=args.uds, log_level="warning")
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
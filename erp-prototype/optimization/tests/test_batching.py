@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from optimization.batching import PredictionCoalescer
+
+
+def double_first_column(matrix):
+    return matrix[:, 0] * 2
+
+
+async def predict_all(coalescer, values):
+    try:
+        return await asyncio.gather(*(coalescer.predict([value, 0.0, 0.0, 0.0]) for value in values))
+    finally:
+        await coalescer.close()
+
+
+def test_each_caller_gets_its_own_prediction():
+    coalescer = PredictionCoalescer(double_first_column, max_batch_size=4, max_wait_ms=50)
+    values = [float(value) for value in range(10)]
+
+    results = asyncio.run(predict_all(coalescer, values))
+
+    assert results == [value * 2 for value in values]
+    snapshot = coalescer.metrics.snapshot()
+    assert snapshot["items"] == 10
+    assert max(snapshot["batch_size_counts"]) <= 4
+
+
+def test_batch_error_reaches_every_caller_and_worker_keeps_running():
+    calls = []
+
+    def flaky(matrix):
+        calls.append(len(matrix))
+        if len(calls) == 1:
+            raise RuntimeError("model unavailable")
+        return double_first_column(matrix)
+
+    async def scenario():
+        coalescer = PredictionCoalescer(flaky, max_batch_size=8, max_wait_ms=20)
+        try:
+            first = await asyncio.gather(*(coalescer.predict([1.0, 0, 0, 0]) for _ in range(3)),
+                                         return_exceptions=True)
+            second = await coalescer.predict([3.0, 0, 0, 0])
+        finally:
+            await coalescer.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert all(isinstance(result, RuntimeError) for result in first)
+    assert second == 6.0
+
+
+def test_close_cancels_the_batch_being_scored():
+    release = threading.Event()
+    scoring = threading.Event()
+
+    def blocking(matrix):
+        scoring.set()
+        release.wait(5)
+        return double_first_column(matrix)
+
+    async def scenario():
+        coalescer = PredictionCoalescer(blocking, max_batch_size=2, max_wait_ms=0)
+        requests = [asyncio.create_task(coalescer.predict([1.0, 0, 0, 0])) for _ in range(2)]
+        while not scoring.is_set():
+            await asyncio.sleep(0.001)
+        await coalescer.close()
+        release.set()
+        return await asyncio.wait_for(asyncio.gather(*requests, return_exceptions=True), 1)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+
+
+def test_rejects_invalid_limits():
+    with pytest.raises(ValueError):
+        PredictionCoalescer(np.sum, max_batch_size=0)
+    with pytest.raises(ValueError):
+        PredictionCoalescer(np.sum, max_wait_ms=-1)
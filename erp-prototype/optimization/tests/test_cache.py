@@ -0,0 +1,64 @@
+import pytest
+
+from optimization.cache import PredictionCache
+
+ITEM = [10.0, 20.0, 30.0, 0.85]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_quantized_features_share_an_entry():
+    cache = PredictionCache()
+    cache.put("a.json", ITEM, "v1", 1.5)
+
+    assert cache.get("a.json", [10.04, 19.96, 30.0, 0.851], "v1") == 1.5
+    assert cache.get("a.json", [10.2, 20.0, 30.0, 0.85], "v1") is None
+
+
+def test_fingerprint_change_drops_only_that_models_entries():
+    cache = PredictionCache()
+    cache.put("a.json", ITEM, "a1", 1.0)
+    cache.put("b.json", ITEM, "b1", 2.0)
+
+    assert cache.get("a.json", ITEM, "a2") is None
+    assert cache.get("b.json", ITEM, "b1") == 2.0
+    assert cache.stats()["invalidations"] == 1
+
+    cache.put("a.json", ITEM, "a2", 3.0)
+    assert cache.get("a.json", ITEM, "a2") == 3.0
+    assert cache.get("b.json", ITEM, "b1") == 2.0
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = PredictionCache(max_size=2)
+    cache.put("a.json", [1, 1, 1, 1], "v1", 1.0)
+    cache.put("a.json", [2, 2, 2, 1], "v1", 2.0)
+    cache.get("a.json", [1, 1, 1, 1], "v1")
+    cache.put("a.json", [3, 3, 3, 1], "v1", 3.0)
+
+    assert cache.get("a.json", [1, 1, 1, 1], "v1") == 1.0
+    assert cache.get("a.json", [2, 2, 2, 1], "v1") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(ttl_seconds=5, clock=clock)
+    cache.put("a.json", ITEM, "v1", 1.0)
+
+    clock.now = 4.9
+    assert cache.get("a.json", ITEM, "v1") == 1.0
+    clock.now = 5.0
+    assert cache.get("a.json", ITEM, "v1") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_rejects_empty_cache():
+    with pytest.raises(ValueError):
+        PredictionCache(max_size=0)
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from optimization.compiled import CompiledForest
+from optimization.model import FEATURE_NAMES, MODEL_PATH
+
+SYNTHETIC_DATA = Path(__file__).resolve().parents[2] / "demo" / "synthetic_data.csv"
+
+
+@pytest.fixture(scope="module")
+def features():
+    X = pd.read_csv(SYNTHETIC_DATA)[FEATURE_NAMES].to_numpy(dtype=np.float32)
+    # Every single-column gap, plus rows with several or all features missing.
+    missing = np.repeat(X[:50], len(FEATURE_NAMES) + 2, axis=0)
+    for offset, column in enumerate(FEATURE_NAMES):
+        missing[offset::len(FEATURE_NAMES) + 2, FEATURE_NAMES.index(column)] = np.nan
+    missing[len(FEATURE_NAMES)::len(FEATURE_NAMES) + 2, :2] = np.nan
+    missing[len(FEATURE_NAMES) + 1::len(FEATURE_NAMES) + 2, :] = np.nan
+    return np.vstack([X, missing])
+
+
+def booster_predict(model_path, X):
+    booster = xgb.Booster(model_file=str(model_path))
+    return booster.predict(xgb.DMatrix(X, feature_names=FEATURE_NAMES, missing=np.nan))
+
+
+def test_matches_booster_on_synthetic_data(features):
+    compiled = CompiledForest.from_json(MODEL_PATH).predict(features)
+
+    np.testing.assert_array_equal(compiled, booster_predict(MODEL_PATH, features))
+
+
+def test_matches_booster_with_learned_missing_directions(tmp_path, features):
+    # A model trained with gaps learns default_left per split, which the
+    # shipped model may not exercise.
+    rng = np.random.default_rng(0)
+    X = features[rng.integers(0, len(features), 2000)].copy()
+    X[rng.random(X.shape) < 0.2] = np.nan
+    y = np.nan_to_num(X).sum(axis=1) + rng.normal(0, 1, len(X))
+    booster = xgb.train({"max_depth": 4, "eta": 0.3, "nthread": 1},
+                        xgb.DMatrix(X, label=y, feature_names=FEATURE_NAMES), num_boost_round=20)
+    model_path = tmp_path / "model.json"
+    booster.save_model(str(model_path))
+
+    compiled = CompiledForest.from_json(model_path)
+
+    assert compiled.has_default_left
+    np.testing.assert_array_equal(compiled.predict(features), booster_predict(model_path, features))
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from optimization import datastore
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(2)
+    n = 500
+    return pd.DataFrame({
+        "scenario": rng.choice(["baseline", "proposed"], n),
+        "L": rng.uniform(1, 120, n), "W": rng.uniform(1, 80, n), "H": rng.uniform(0.5, 60, n),
+        "DF": rng.uniform(0.7, 1.0, n),
+        "optimal_weight": rng.lognormal(2, 1, n),
+        "count": rng.integers(0, 100, n),
+    })
+
+
+@pytest.fixture(params=["csv", "parquet", "columns"])
+def stored(request, tmp_path, frame):
+    if request.param == "parquet":
+        pytest.importorskip("pyarrow")
+    path = tmp_path / {"csv": "data.csv", "parquet": "data.parquet", "columns": "data.cols"}[request.param]
+    with datastore.open_writer(path) as writer:
+        for start in range(0, len(frame), 120):
+            writer.write(frame.iloc[start:start + 120])
+    return path
+
+
+def test_round_trip_keeps_every_value(stored, frame):
+    assert datastore.count_rows(stored) == len(frame)
+    pd.testing.assert_frame_equal(datastore.read_frame(stored), frame, check_dtype=False, check_exact=False,
+                                  rtol=1e-15)
+    pd.testing.assert_frame_equal(pd.concat(datastore.iter_frames(stored, chunk_rows=77), ignore_index=True),
+                                  datastore.read_frame(stored))
+
+
+@pytest.mark.parametrize("start, stop", [(0, 10), (3, 4), (7, 300), (250, None), (499, None), (500, None),
+                                         (20, 10), (480, 900)])
+def test_slices_match_the_full_read(stored, monkeypatch, start, stop):
+    # A small stride makes the CSV slices seek past several index entries.
+    monkeypatch.setattr(datastore, "CSV_INDEX_STRIDE", 7)
+    monkeypatch.setattr(datastore, "_csv_indexes", {})
+    columns = ["L", "scenario"]
+    expected = datastore.read_frame(stored, columns=columns).iloc[start:stop].reset_index(drop=True)
+
+    sliced = datastore.read_frame(stored, columns=columns, start=start, stop=stop)
+
+    assert list(sliced.columns) == list(expected.columns)
+    if len(expected):
+        pd.testing.assert_frame_equal(sliced, expected)
+    else:
+        assert len(sliced) == 0
+
+
+def test_csv_index_follows_appended_rows(tmp_path, frame, monkeypatch):
+    monkeypatch.setattr(datastore, "CSV_INDEX_STRIDE", 16)
+    path = tmp_path / "data.csv"
+    frame.iloc[:100].to_csv(path, index=False)
+    assert len(datastore.read_frame(path, start=90, stop=200)) == 10
+
+    frame.iloc[100:].to_csv(path, mode="a", header=False, index=False)
+
+    sliced = datastore.read_frame(path, start=90, stop=200)
+    pd.testing.assert_frame_equal(sliced, pd.read_csv(path).iloc[90:200].reset_index(drop=True))
+
+
+def test_float32_column_store_hands_out_the_feature_block(tmp_path, frame):
+    path = tmp_path / "data.cols"
+    datastore.write_frame(path, frame, float_dtype="float32")
+
+    features, labels = datastore.read_features(path)
+
+    assert features.dtype == np.float32 and not features.flags.owndata and not features.flags.writeable
+    np.testing.assert_array_equal(features, frame[datastore.FEATURE_NAMES].to_numpy(dtype=np.float32))
+    np.testing.assert_allclose(labels, frame["optimal_weight"], rtol=1e-7)
+
+
+def test_rewriting_a_column_store_drops_old_blocks(tmp_path, frame):
+    path = tmp_path / "data.cols"
+    datastore.write_frame(path, frame)
+
+    datastore.write_frame(path, frame[["scenario", "count"]])
+
+    assert sorted(file.name for file in path.glob("*.bin")) == ["count.bin", "scenario.bin"]
+    pd.testing.assert_frame_equal(datastore.read_frame(path), frame[["scenario", "count"]], check_dtype=False)
@@ -0,0 +1,140 @@
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from optimization import train
+from optimization.model import MODEL_PATH
+from optimization.model_manager import PROBE_ROWS, ModelManager
+
+SYNTHETIC_DATA = Path(__file__).resolve().parents[2] / "demo" / "synthetic_data.csv"
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / "dw_model.json"
+    shutil.copy(MODEL_PATH, path)
+    return path
+
+
+@pytest.fixture
+def retrained(tmp_path):
+    """A different model to swap in, trained on a slice of the synthetic data."""
+    data_path = tmp_path / "measurements.csv"
+    pd.read_csv(SYNTHETIC_DATA).head(200).to_csv(data_path, index=False)
+    path = tmp_path / "retrained.json"
+    train.train_full(data_path, path, num_boost_round=3, nthread=1)
+    return path
+
+
+@pytest.fixture
+def manager_factory():
+    managers = []
+
+    def build(model_path, **kwargs):
+        manager = ModelManager(model_path, **kwargs)
+        manager.start()
+        managers.append(manager)
+        return manager
+
+    yield build
+    for manager in managers:
+        manager.close()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+@pytest.mark.parametrize("backend", ["xgboost", "numpy"])
+def test_backends_agree(model_path, manager_factory, backend):
+    reference = manager_factory(model_path, backend="xgboost").predict(PROBE_ROWS)
+
+    np.testing.assert_allclose(manager_factory(model_path, backend=backend).predict(PROBE_ROWS), reference,
+                               rtol=1e-6)
+
+
+def test_promote_then_rollback_restores_the_previous_version(model_path, retrained, manager_factory):
+    manager = manager_factory(model_path, auto_promote=False)
+    original = manager.active
+    original_predictions = manager.predict(PROBE_ROWS)
+
+    candidate = manager.load_candidate(retrained).result()
+    assert manager.active is original and manager.candidate is candidate
+
+    assert manager.promote() is candidate
+    assert manager.previous is original
+    assert not np.array_equal(manager.predict(PROBE_ROWS), original_predictions)
+
+    assert manager.rollback() is original
+    assert (manager.active, manager.previous) == (original, candidate)
+    np.testing.assert_array_equal(manager.predict(PROBE_ROWS), original_predictions)
+    assert manager.status()["swaps"] == {"promote": 1, "rollback": 1}
+    assert manager.status()["generation"] == 3
+
+
+def test_swaps_without_a_target_are_no_ops(model_path, manager_factory):
+    manager = manager_factory(model_path)
+
+    assert manager.promote() is None
+    assert manager.rollback() is None
+    assert manager.generation == 1
+
+
+def test_broken_model_file_never_serves(model_path, manager_factory):
+    manager = manager_factory(model_path, auto_promote=False)
+    original = manager.active
+    model_path.write_text('{"learner": ')
+
+    with pytest.raises(ValueError):
+        manager.check_for_update().result()
+
+    assert manager.active is original and manager.candidate is None
+    assert manager.load_errors == 1
+    # The failed fingerprint is not retried until the file changes again.
+    assert manager.check_for_update() is None
+
+
+def test_check_for_update_skips_versions_already_held(model_path, retrained, manager_factory):
+    manager = manager_factory(model_path)
+    assert manager.check_for_update() is None
+
+    shutil.copy(retrained, model_path)
+    manager.check_for_update().result()
+    assert manager.active.fingerprint != manager.previous.fingerprint
+
+    manager.rollback()
+    # The file still holds the rolled-back version, which must not be reloaded.
+    assert manager.check_for_update() is None
+
+
+def test_shadow_scoring_auto_promotes_after_enough_samples(model_path, retrained, manager_factory):
+    manager = manager_factory(model_path, shadow_sample_rate=1.0, min_shadow_samples=5)
+    candidate = manager.load_candidate(retrained).result()
+    assert manager.candidate is candidate
+
+    for _ in range(5):
+        manager.predict(PROBE_ROWS)
+        wait_until(lambda: manager._pending_shadow == 0)
+
+    assert manager.active is candidate
+    assert manager.shadow.requests >= 5 and manager.shadow.errors == 0
+
+
+def test_shadow_gate_holds_a_candidate_that_disagrees(model_path, retrained, manager_factory):
+    manager = manager_factory(model_path, shadow_sample_rate=1.0, min_shadow_samples=3, max_mean_abs_diff=1e-9)
+    candidate = manager.load_candidate(retrained).result()
+
+    for _ in range(5):
+        manager.predict(PROBE_ROWS)
+        wait_until(lambda: manager._pending_shadow == 0)
+
+    assert manager.candidate is candidate
+    assert manager.shadow.mean_abs_diff > 0
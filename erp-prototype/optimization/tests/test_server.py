@@ -0,0 +1,138 @@
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from optimization import metrics, server, train
+from optimization.model import MODEL_PATH, prediction_cache
+
+SYNTHETIC_DATA = Path(__file__).resolve().parents[2] / "demo" / "synthetic_data.csv"
+
+ITEMS = [[10.0, 20.0, 30.0, 0.85], [55.5, 12.0, 7.5, 0.9]]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server.app.state, "watch_interval", 0)
+    monkeypatch.setattr(server.app.state, "batch_window_ms", 0)
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def coalesced_client(monkeypatch):
+    monkeypatch.setattr(server.app.state, "watch_interval", 0)
+    monkeypatch.setattr(server.app.state, "batch_window_ms", 1.0)
+    monkeypatch.setattr(server.app.state, "auto_promote", False)
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def other_model(tmp_path):
+    data_path = tmp_path / "measurements.csv"
+    pd.read_csv(SYNTHETIC_DATA).head(200).to_csv(data_path, index=False)
+    model_path = tmp_path / "other_model.json"
+    train.train_full(data_path, model_path, num_boost_round=3, nthread=1)
+    return model_path
+
+
+@pytest.fixture
+def empty_cache():
+    if prediction_cache is None:
+        pytest.skip("prediction cache disabled (DW_PREDICTION_CACHE_SIZE=0)")
+    prediction_cache.clear()
+    yield prediction_cache
+    prediction_cache.clear()
+
+
+@pytest.fixture
+def profiling():
+    metrics.set_profile_sample_rate(1.0)
+    yield
+    metrics.set_profile_sample_rate(0.0)
+
+
+def sampled_calls(text):
+    return int(re.match(r"(\d+) sampled calls", text).group(1))
+
+
+def test_health_and_model_info(client):
+    assert client.get("/health").json() == {"status": "ok", "modelExists": True}
+
+    info = client.get("/model/info").json()
+    assert info["exists"] is True
+    assert info == server.model_metadata(MODEL_PATH)
+
+
+def test_predict_scores_one_item_like_the_batch_endpoint(client):
+    expected = client.app.state.models.predict(np.array(ITEMS))
+
+    single = [client.post("/predict", json={"features": item}).json()["prediction"] for item in ITEMS]
+    batch = client.post("/predict/batch", json={"items": ITEMS}).json()["predictions"]
+
+    np.testing.assert_allclose(single, expected, rtol=1e-6)
+    np.testing.assert_allclose(batch, expected, rtol=1e-6)
+    assert client.post("/predict/batch", json={"items": []}).json() == {"predictions": []}
+
+
+@pytest.mark.parametrize("items", [[[1.0, 2.0, 3.0]], [ITEMS[0], [1.0, 2.0]], [ITEMS[0] + [1.0]]])
+def test_predict_batch_rejects_rows_of_the_wrong_shape(client, items):
+    response = client.post("/predict/batch", json={"items": items})
+
+    assert response.status_code == 422
+    assert "4 features" in response.json()["detail"]
+
+
+def test_predict_rejects_the_wrong_number_of_features(client):
+    assert client.post("/predict", json={"features": ITEMS[0][:3]}).status_code == 422
+
+
+def test_debug_profile_is_off_by_default(client):
+    assert client.get("/debug/profile").status_code == 404
+
+
+def test_debug_profile_reports_sampled_server_predictions(client, profiling):
+    before = sampled_calls(client.get("/debug/profile").text)
+
+    assert client.post("/predict/batch", json={"items": ITEMS}).status_code == 200
+    response = client.get("/debug/profile")
+
+    assert response.status_code == 200
+    assert sampled_calls(response.text) == before + 1
+    assert "predict" in response.text
+
+
+def test_debug_profile_rejects_unknown_sort_keys(client, profiling):
+    assert client.get("/debug/profile", params={"sort": "tottime_desc"}).status_code == 422
+    assert client.get("/debug/profile", params={"sort": "time"}).status_code == 200
+
+
+def test_predict_caches_under_the_serving_fingerprint(coalesced_client, empty_cache):
+    response = coalesced_client.post("/predict", json={"features": ITEMS[0]})
+    fingerprint = coalesced_client.app.state.models.active.fingerprint
+
+    assert empty_cache.get(MODEL_PATH, ITEMS[0], fingerprint) == response.json()["prediction"]
+
+
+def test_predict_skips_the_cache_when_the_model_swaps_mid_request(coalesced_client, empty_cache, other_model):
+    models = coalesced_client.app.state.models
+    old_fingerprint = models.active.fingerprint
+    models.load_candidate(other_model).result()
+    coalescer = coalesced_client.app.state.coalescer
+    score = coalescer.predict_batch
+
+    def promote_then_score(matrix):
+        models.promote()
+        return score(matrix)
+
+    coalescer.predict_batch = promote_then_score
+    response = coalesced_client.post("/predict", json={"features": ITEMS[0]})
+
+    assert response.status_code == 200
+    assert models.active.path == str(other_model)
+    assert empty_cache.get(MODEL_PATH, ITEMS[0], old_fingerprint) is None
+    assert empty_cache.get(MODEL_PATH, ITEMS[0], models.active.fingerprint) is None
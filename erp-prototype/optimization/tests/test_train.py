@@ -0,0 +1,91 @@
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from optimization import train
+from optimization.compiled import CompiledForest
+
+SYNTHETIC_DATA = Path(__file__).resolve().parents[2] / "demo" / "synthetic_data.csv"
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    path = tmp_path / "measurements.csv"
+    pd.read_csv(SYNTHETIC_DATA).head(300).to_csv(path, index=False)
+    return path
+
+
+def append_rows(path, rows):
+    pd.read_csv(SYNTHETIC_DATA).iloc[300:300 + rows].to_csv(path, mode="a", header=False, index=False)
+
+
+def test_incremental_fallback_uses_requested_rounds(data_path, tmp_path):
+    model, rows = train.train_incremental(data_path, tmp_path / "model.json", num_boost_round=7, nthread=1)
+
+    assert rows == 300
+    assert model.num_boosted_rounds() == 7
+
+
+def test_incremental_fallback_defaults_to_a_full_retrain(data_path, tmp_path):
+    model, _ = train.train_incremental(data_path, tmp_path / "model.json", nthread=1)
+
+    assert model.num_boosted_rounds() == train.NUM_BOOST_ROUND
+
+
+def test_incremental_run_boosts_on_appended_rows_only(data_path, tmp_path):
+    model_path = tmp_path / "model.json"
+    train.train_full(data_path, model_path, num_boost_round=5, nthread=1)
+    append_rows(data_path, 40)
+
+    model, rows = train.train_incremental(data_path, model_path, nthread=1)
+
+    assert rows == 40
+    assert model.num_boosted_rounds() == 5 + train.INCREMENTAL_BOOST_ROUND
+    assert train.load_watermark(model_path)["rowsConsumed"] == 340
+    assert train.train_incremental(data_path, model_path, nthread=1) == (None, 0)
+
+
+SMALL_GRID = {"max_depth": [2, 3], "eta": [0.3], "rounds": [20]}
+
+
+def test_search_retrains_the_selected_candidate_on_all_rows(data_path, tmp_path):
+    model_path = tmp_path / "model.json"
+
+    report = train.search_hyperparameters(data_path, model_path, grid=SMALL_GRID, workers=1, nthread=1)
+
+    assert report["trainRows"] + report["validRows"] == report["finalRows"] == 300
+    booster = xgb.Booster(model_file=str(model_path))
+    assert booster.num_boosted_rounds() == report["finalRounds"] == report["selected"]["bestIteration"] + 1
+    assert CompiledForest.from_json(model_path).max_depth <= report["selected"]["max_depth"]
+    assert train.load_watermark(model_path)["rowsConsumed"] == 300
+
+
+def test_incremental_run_keeps_the_searched_parameters(data_path, tmp_path):
+    model_path = tmp_path / "model.json"
+    report = train.search_hyperparameters(data_path, model_path, grid={"max_depth": [1], "eta": [0.5], "rounds": [5]},
+                                          workers=1, nthread=1)
+    assert train.load_watermark(model_path)["params"] == {"max_depth": 1, "eta": 0.5}
+    append_rows(data_path, 40)
+
+    model, rows = train.train_incremental(data_path, model_path, nthread=1)
+
+    assert rows == 40
+    assert model.num_boosted_rounds() == report["finalRounds"] + train.INCREMENTAL_BOOST_ROUND
+    assert CompiledForest.from_json(model_path).max_depth == 1
+    assert train.load_watermark(model_path)["params"] == {"max_depth": 1, "eta": 0.5}
+
+
+def test_search_cli_passes_nthread_per_worker(data_path, tmp_path, monkeypatch):
+    model_path = tmp_path / "model.json"
+    monkeypatch.setattr(train, "SEARCH_GRID", SMALL_GRID)
+    monkeypatch.setattr(sys, "argv", ["train.py", "--search", "--data", str(data_path), "--model", str(model_path),
+                                      "--workers", "1", "--nthread", "2"])
+
+    train.main()
+
+    report = json.loads(model_path.with_name("model.search.json").read_text())
+    assert report["nthreadPerWorker"] == 2
@@ -1,3 +1,4 @@
+const http = require("http");
 const { MLService } = require("../backend/ml-service");
 
 jest.setTimeout(20000);
@@ -21,4 +22,86 @@ describe("MLService coverage", () => {
     expect(typeof predicted).toBe("number");
     expect(predicted).toBeGreaterThan(0);
   });
+
+  test("calls an externally managed prediction server over HTTP", async () => {
+    const server = http.createServer((req, res) => {
+      let body = "";
+      req.on("data", (chunk) => {
+        body += chunk;
+      });
+      req.on("end", () => {
+        res.setHeader("Content-Type", "application/json");
+        if (req.url === "/health") {
+          res.end(JSON.stringify({ status: "ok" }));
+        } else if (req.url === "/predict/batch") {
+          const { items } = JSON.parse(body);
+          res.end(JSON.stringify({ predictions: items.map((row) => row.reduce((a, b) => a + b, 0)) }));
+        } else {
+          const { features } = JSON.parse(body);
+          res.end(JSON.stringify({ prediction: features.reduce((a, b) => a + b, 0) }));
+        }
+      });
+    });
+    await new Promise((resolve) => server.listen(0, "127.0.0.1", resolve));
+
+    const mlService = new MLService();
+    mlService.fastTestMode = false;
+    mlService.manageServer = false;
+    mlService.servicePort = server.address().port;
+    jest.spyOn(mlService, "ensureModelExists").mockResolvedValue();
+
+    try {
+      const predicted = await mlService.predictWeight([1, 2, 3, 4]);
+      expect(predicted).toBe(10);
+
+      const batch = await mlService.predictWeights([[1, 2, 3, 4], [5, 6, 7, 8]]);
+      expect(batch).toEqual([10, 26]);
+    } finally {
+      await mlService.cleanup();
+      await new Promise((resolve) => server.close(resolve));
+    }
+  });
+
+  test("scores batches with the volume fallback when the server is unavailable", async () => {
+    const mlService = new MLService();
+    mlService.fastTestMode = false;
+
+    jest.spyOn(mlService, "ensureModelExists").mockResolvedValue();
+    jest.spyOn(mlService, "callPythonModelBatch").mockRejectedValue(new Error("server down"));
+
+    const predicted = await mlService.predictWeights([[10, 5, 4, 0.8], [1, 1, 1, 1]]);
+    expect(predicted).toHaveLength(2);
+    expect(predicted[0]).toBeGreaterThan(predicted[1]);
+    expect(mlService.counters).toMatchObject({ batchPredictions: 1, batchItems: 2, batchFallbacks: 1 });
+    expect(mlService.getMetricsText()).toContain('dw_node_prediction_fallbacks_total{kind="batch"} 1');
+  });
+  test("rejects the pending start when the prediction server cannot be spawned", async () => {
+    const mlService = new MLService();
+    mlService.servicePort = 1;
+    const pathEnv = process.env.PATH;
+    process.env.PATH = "";
+
+    try {
+      await expect(mlService.ensurePredictionServer()).rejects.toMatchObject({ code: "ENOENT" });
+      expect(mlService.serverProcess).toBeNull();
+      expect(mlService.serverReady).toBeNull();
+    } finally {
+      process.env.PATH = pathEnv;
+      await mlService.cleanup();
+    }
+  });
+
+  test("stops the prediction server when its health check times out", async () => {
+    const mlService = new MLService();
+    mlService.servicePort = 1;
+    mlService.serverStartTimeoutMs = 0;
+
+    try {
+      await expect(mlService.ensurePredictionServer()).rejects.toThrow("Prediction server not reachable");
+      expect(mlService.serverProcess).toBeNull();
+      expect(mlService.serverReady).toBeNull();
+    } finally {
+      await mlService.cleanup();
+    }
+  });
 });
@@ -56,6 +56,9 @@ describe("Route error and edge paths", () => {
       initialized: true,
       predictWeight: jest.fn(() => {
         throw new Error("prediction failed");
+      }),
+      predictWeights: jest.fn(() => {
+        throw new Error("prediction failed");
       })
     };
 
@@ -67,6 +70,46 @@ describe("Route error and edge paths", () => {
       .expect(500);
   });
 
+  test("optimize endpoint scores all items in one ML call", async () => {
+    const fabric = new FabricService();
+    await new Promise((resolve) => setTimeout(resolve, 100));
+    const ml = {
+      initialized: true,
+      predictWeight: jest.fn(),
+      predictWeights: jest.fn().mockResolvedValue([1.5, 2.5])
+    };
+
+    routes.__private.setServices({ fabricService: fabric, mlService: ml });
+
+    const res = await request(app)
+      .post("/api/warehouse/optimize")
+      .send({ items: [{ id: "a", length: 1, width: 2, height: 3 }, { length: "4", width: 5, height: 6, densityFactor: 0.9, weight: 7 }] })
+      .expect(200);
+
+    expect(ml.predictWeights).toHaveBeenCalledTimes(1);
+    expect(ml.predictWeights).toHaveBeenCalledWith([[1, 2, 3, 0.85], [4, 5, 6, 0.9]]);
+    expect(ml.predictWeight).not.toHaveBeenCalled();
+    expect(res.body.optimizationResults.map((result) => result.predictedWeight)).toEqual([1.5, 2.5]);
+    expect(res.body.optimizationResults[1]).toMatchObject({ itemId: "item_2", originalWeight: 7 });
+  });
+
+  test("optimize endpoint reports every invalid item", async () => {
+    const fabric = new FabricService();
+    await new Promise((resolve) => setTimeout(resolve, 100));
+    const ml = { initialized: true, predictWeights: jest.fn() };
+
+    routes.__private.setServices({ fabricService: fabric, mlService: ml });
+
+    const res = await request(app)
+      .post("/api/warehouse/optimize")
+      .send({ items: [{ id: "ok", length: 1, width: 1, height: 1 }, { id: "bad", length: "x", width: 1, height: 1 }, null] })
+      .expect(400);
+
+    expect(res.body).toHaveProperty("error", "Invalid item dimensions");
+    expect(res.body.invalidItems).toEqual([{ index: 1, itemId: "bad" }, { index: 2, itemId: null }]);
+    expect(ml.predictWeights).not.toHaveBeenCalled();
+  });
+
   test("health endpoint degrades when ML fails", async () => {
     const fabric = new FabricService();
     await new Promise((resolve) => setTimeout(resolve, 100));
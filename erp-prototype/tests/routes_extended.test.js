@@ -113,6 +113,8 @@ describe("Plot generation endpoints", () => {
       .expect(200);
 
     expect(res.body).toHaveProperty("success", true);
+    // The mocked script prints plain text, so there is no JSON timing report.
+    expect(res.body).toHaveProperty("report", null);
   });
 
   test("GET /api/warehouse/plots/generate returns success", async () => {
@@ -123,3 +125,15 @@ describe("Plot generation endpoints", () => {
     expect(res.body).toHaveProperty("success", true);
   });
 });
+
+describe("Metrics endpoint", () => {
+  test("GET /api/warehouse/metrics returns Prometheus counters", async () => {
+    const res = await request(app)
+      .get("/api/warehouse/metrics")
+      .expect(200);
+
+    expect(res.headers["content-type"]).toMatch(/^text\/plain/);
+    expect(res.text).toContain("# TYPE dw_node_predictions_total counter");
+    expect(res.text).toMatch(/dw_node_prediction_fallbacks_total\{kind="batch"\} \d+/);
+  });
+});